@@ -1,17 +1,50 @@
-import base64
-import binascii
+import asyncio
+import json
 import logging
+import time
 import uuid
-from typing import Optional
+from dataclasses import asdict
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Optional
 
 import httpx
-from enhancement_core.config import FeedbackSettings
-from enhancement_core.feedback import FeedbackError, request_feedback
+from enhancement_core.config import INPUT_MODES, FeedbackSettings
+from enhancement_core.feedback import (
+    BatchResult,
+    FeedbackError,
+    FeedbackRateLimitError,
+    FeedbackResponse,
+    PreparedInput,
+    batch_request_line,
+    collect_batch_results,
+    request_feedback,
+    retrieve_batch,
+    submit_batch,
+    write_batch_file,
+)
+from enhancement_core.feedback.batch import TERMINAL_BATCH_STATUSES
 from enhancement_core.logging import configure_logging, request_context
 from fastapi import Body, Depends, FastAPI, HTTPException, Request, status
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
-from .dependencies import get_feedback_settings, get_http_client, lifespan
+from .batches import BatchStore
+from .dependencies import (
+    get_batch_store,
+    get_feedback_settings,
+    get_fetch_cache,
+    get_http_client,
+    get_key_pool,
+    get_preprocessor,
+    get_rate_limiter,
+    get_singleflight,
+    lifespan,
+)
+from .fetch_cache import ScreenshotCache
+from .key_pool import ApiKeyPool
+from .limiter import RateLimitTimeout, ResponsesRateLimiter
+from .preprocess import TIMING_STAGES, PreprocessError, PreprocessJob, PreprocessPool, PreprocessUnavailable
+from .singleflight import SingleFlight, request_key
 
 logger = logging.getLogger(__name__)
 configure_logging("feedback_service")
@@ -32,10 +65,21 @@ async def add_request_id(request: Request, call_next):
     return response
 
 
+class ChangedRegion(BaseModel):
+    image_b64: str
+    top: int = Field(ge=0)
+    left: int = Field(default=0, ge=0)
+
+
 class FeedbackRequest(BaseModel):
     screenshot_b64: Optional[str] = None
     screenshot_url: Optional[str] = None
     text: Optional[str] = None
+    previous_response_id: Optional[str] = None
+    escalate: bool = True
+    dom_snapshot: Optional[dict[str, Any]] = None
+    input_mode: Optional[str] = None
+    regions: Optional[list[ChangedRegion]] = None
 
     @field_validator("text")
     @classmethod
@@ -55,36 +99,194 @@ class FeedbackRequest(BaseModel):
             raise ValueError("screenshot_url must be http or https")
         return parsed
 
+    @field_validator("input_mode")
+    @classmethod
+    def validate_input_mode(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        normalized = value.strip().lower()
+        if normalized not in INPUT_MODES:
+            raise ValueError(f"input_mode must be one of: {', '.join(sorted(INPUT_MODES))}")
+        return normalized
+
     @model_validator(mode="after")
     def validate_payload(self):
-        if not (self.screenshot_b64 or self.screenshot_url or self.text):
+        if not (self.screenshot_b64 or self.screenshot_url or self.text or self.dom_snapshot):
             raise ValueError("screenshot or text input required")
         return self
 
 
-def decode_payload(value: str) -> bytes:
-    try:
-        return base64.b64decode(value)
-    except binascii.Error as exc:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "screenshot_b64 is not valid base64"}
-        ) from exc
+class BatchItem(FeedbackRequest):
+    custom_id: str = Field(min_length=1, max_length=64)
+
+
+class BatchSubmission(BaseModel):
+    items: list[BatchItem] = Field(min_length=1)
+    metadata: Optional[dict[str, str]] = None
+
+    @model_validator(mode="after")
+    def validate_custom_ids(self):
+        custom_ids = [item.custom_id for item in self.items]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError("custom_id values must be unique within a batch")
+        return self
+
+
+def _download_failed(message: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_424_FAILED_DEPENDENCY, detail={"message": message})
 
 
-async def fetch_url(client: httpx.AsyncClient, url: str) -> bytes:
+async def _download(client: httpx.AsyncClient, url: str, cache: ScreenshotCache, max_bytes: int) -> bytes:
+    """Revalidate against the entry read up front, so an eviction while the request is in flight cannot lose the body.
+
+    A 304 with no entry to serve is retried once without validators.
+    """
+    cached = cache.get(url)
+    headers = cached.conditional_headers() if cached is not None else {}
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code != status.HTTP_304_NOT_MODIFIED:
+            return await _read_body(response, url, cache, max_bytes)
+        if cached is not None:
+            cache.hits += 1
+            return cached.body
+    async with client.stream("GET", url) as response:
+        return await _read_body(response, url, cache, max_bytes)
+
+
+async def _read_body(response: httpx.Response, url: str, cache: ScreenshotCache, max_bytes: int) -> bytes:
+    response.raise_for_status()
+    declared = response.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise _download_failed(f"screenshot exceeds {max_bytes} bytes")
+    chunks: list[bytes] = []
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if received > max_bytes:
+            raise _download_failed(f"screenshot exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    cache.misses += 1
+    cache.store(url, body, response.headers.get("etag"), response.headers.get("last-modified"))
+    return body
+
+
+async def fetch_url(client: httpx.AsyncClient, url: str, cache: ScreenshotCache, settings: FeedbackSettings) -> bytes:
     try:
-        response = await client.get(url)
-        response.raise_for_status()
+        return await asyncio.wait_for(_download(client, url, cache, settings.fetch_max_bytes), settings.fetch_timeout)
     except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_424_FAILED_DEPENDENCY,
-            detail={"message": f"unable to download screenshot: {exc.response.status_code}"},
-        ) from exc
+        raise _download_failed(f"unable to download screenshot: {exc.response.status_code}") from exc
     except httpx.RequestError as exc:
+        raise _download_failed(f"unable to download screenshot: {exc}") from exc
+    except asyncio.TimeoutError as exc:
+        raise _download_failed(f"screenshot download exceeded {settings.fetch_timeout}s") from exc
+
+
+async def capture_job(
+    payload: FeedbackRequest, client: httpx.AsyncClient, cache: ScreenshotCache, settings: FeedbackSettings
+) -> PreprocessJob:
+    """Collect the raw inputs on the loop; decoding and everything after it happens in the preprocessing pool."""
+    image_bytes = None
+    if not payload.screenshot_b64 and payload.screenshot_url:
+        image_bytes = await fetch_url(client, payload.screenshot_url, cache, settings)
+        logger.info("downloaded screenshot", extra={"bytes": len(image_bytes)})
+    return PreprocessJob(
+        settings=settings,
+        text=payload.text,
+        image_b64=payload.screenshot_b64,
+        image_bytes=image_bytes,
+        regions=[(region.image_b64, region.top, region.left) for region in payload.regions or []],
+        dom_snapshot=payload.dom_snapshot,
+        chained=bool(payload.previous_response_id),
+    )
+
+
+async def preprocess(preprocessor: PreprocessPool, job: PreprocessJob) -> PreparedInput:
+    try:
+        return await preprocessor.run(job)
+    except PreprocessError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"message": str(exc)}) from exc
+    except PreprocessUnavailable as exc:
+        logger.warning("preprocessing queue rejected capture", extra={"retry_after": exc.retry_after})
         raise HTTPException(
-            status_code=status.HTTP_424_FAILED_DEPENDENCY, detail={"message": f"unable to download screenshot: {exc}"}
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"message": str(exc)},
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
         ) from exc
-    return response.content
+
+
+def request_settings(payload: FeedbackRequest, settings: FeedbackSettings) -> FeedbackSettings:
+    if payload.input_mode and payload.input_mode != settings.input_mode:
+        return settings.model_copy(update={"input_mode": payload.input_mode})
+    return settings
+
+
+def estimate_request_tokens(prepared: PreparedInput, text: str | None, settings: FeedbackSettings) -> int:
+    """Tokens to reserve for a call; the preprocessed capture's image estimate is exact rather than a guess."""
+    tokens = settings.max_output_tokens + (len(settings.prompt) + len(text or settings.default_user_text)) // 4
+    if prepared.input_mode != "image":
+        tokens += settings.dom_summary_max_chars // 4
+    return tokens + (prepared.estimated_image_tokens or 0)
+
+
+async def call_with_limits(
+    prepared: PreparedInput,
+    text: str | None,
+    settings: FeedbackSettings,
+    limiter: ResponsesRateLimiter,
+    pool: ApiKeyPool,
+    previous_response_id: str | None = None,
+    escalate: bool = True,
+) -> tuple[FeedbackResponse, float]:
+    estimate = estimate_request_tokens(prepared, text, settings)
+    deadline = limiter.deadline()
+    loop = asyncio.get_running_loop()
+    waited = 0.0
+    admitted = False
+    while True:
+        if not admitted:
+            try:
+                waited += await limiter.acquire(estimate, deadline)
+            except RateLimitTimeout as exc:
+                logger.warning("feedback request timed out in rate limit queue", extra={"retry_after": exc.retry_after})
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail={"message": str(exc)},
+                    headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+                ) from exc
+            admitted = True
+        slot = pool.acquire()
+        try:
+            func = partial(
+                request_feedback,
+                None,
+                text,
+                settings,
+                previous_response_id=previous_response_id,
+                client=slot.client,
+                escalate=escalate,
+                prepared=prepared,
+            )
+            return await loop.run_in_executor(None, func), waited
+        except FeedbackRateLimitError as exc:
+            retry_after = exc.retry_after if exc.retry_after is not None else 1.0
+            logger.warning(
+                "upstream throttled feedback request; requeueing",
+                extra={"retry_after": retry_after, "key": slot.credential.label},
+            )
+            pool.throttle(slot, retry_after)
+            if not pool.all_throttled():
+                continue
+            admitted = False
+            limiter.pause(retry_after)
+            if time.monotonic() + retry_after > deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail={"message": str(exc)},
+                    headers={"Retry-After": str(max(1, round(retry_after)))},
+                ) from exc
+        finally:
+            pool.release(slot)
 
 
 @app.post("/feedback", summary="Generate UI feedback with optional metadata")
@@ -92,6 +294,11 @@ async def feedback_endpoint(
     payload: FeedbackRequest = Body(..., embed=False),
     settings: FeedbackSettings = Depends(get_feedback_settings),
     client: httpx.AsyncClient = Depends(get_http_client),
+    limiter: ResponsesRateLimiter = Depends(get_rate_limiter),
+    cache: ScreenshotCache = Depends(get_fetch_cache),
+    singleflight: SingleFlight = Depends(get_singleflight),
+    pool: ApiKeyPool = Depends(get_key_pool),
+    preprocessor: PreprocessPool = Depends(get_preprocessor),
 ):
     logger.info(
         "feedback request received",
@@ -99,31 +306,180 @@ async def feedback_endpoint(
             "has_b64": bool(payload.screenshot_b64),
             "has_url": bool(payload.screenshot_url),
             "has_text": bool(payload.text),
+            "has_dom": bool(payload.dom_snapshot),
+            "regions": len(payload.regions or []),
         },
     )
-    image_bytes = None
-    if payload.screenshot_b64:
-        image_bytes = decode_payload(payload.screenshot_b64)
-        logger.info("decoded screenshot payload", extra={"size": len(image_bytes)})
-    elif payload.screenshot_url:
-        image_bytes = await fetch_url(client, payload.screenshot_url)
-        logger.info("downloaded screenshot", extra={"bytes": len(image_bytes)})
+    settings = request_settings(payload, settings)
+    job = await capture_job(payload, client, cache, settings)
+    dom_key = json.dumps(payload.dom_snapshot, sort_keys=True) if payload.dom_snapshot else None
+    key = request_key(
+        job.image_bytes or job.image_b64,
+        payload.text,
+        settings.prompt,
+        settings.model_name,
+        payload.previous_response_id,
+        "escalate" if payload.escalate else "triage-only",
+        settings.input_mode,
+        dom_key,
+        *(f"{left},{top}:{data}" for data, top, left in job.regions),
+    )
+
+    async def run() -> tuple[tuple[FeedbackResponse, float], PreparedInput]:
+        prepared = await preprocess(preprocessor, job)
+        result = await call_with_limits(
+            prepared,
+            payload.text,
+            settings,
+            limiter,
+            pool,
+            previous_response_id=payload.previous_response_id,
+            escalate=payload.escalate,
+        )
+        return result, prepared
+
     try:
-        response = request_feedback(image_bytes, payload.text, settings)
+        ((response, queue_wait), prepared), deduplicated = await singleflight.do(key, run)
     except FeedbackError as exc:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"message": str(exc)}) from exc
     logger.info(
         "ui feedback ready",
-        extra={"response_id": response.response_id, "model": response.model, "tokens_used": response.total_tokens},
+        extra={
+            "response_id": response.response_id,
+            "model": response.model,
+            "tokens_used": response.total_tokens,
+            "input_mode": response.input_mode,
+            "deduplicated": deduplicated,
+        },
     )
     return {
         "feedback": response.feedback,
         "model": response.model,
         "tokens_used": response.total_tokens,
         "response_id": response.response_id,
+        "previous_response_id": response.previous_response_id,
+        "input_tokens": response.input_tokens,
+        "cached_tokens": response.cached_tokens,
+        "tier": response.tier,
+        "input_mode": response.input_mode,
+        "tiers": [asdict(tier) for tier in response.tiers],
+        "queue_wait_seconds": round(queue_wait, 3),
+        "timing": {
+            **{stage: prepared.timing.get(stage, 0.0) for stage in TIMING_STAGES},
+            "model_ms": round(sum(tier.latency_seconds for tier in response.tiers) * 1000, 3),
+        },
+        "deduplicated": deduplicated,
+    }
+
+
+def _batch_results(record: dict[str, Any], results: list[BatchResult]) -> list[dict[str, Any]]:
+    """One result per submitted item, in order; an expired or failed batch may not have written them all."""
+    by_id = {result.custom_id: result for result in results}
+    return [
+        asdict(by_id.get(custom_id) or BatchResult(custom_id, None, error=f"no result in batch ({record['status']})"))
+        for custom_id in record["items"]
+    ]
+
+
+@app.post("/batches", summary="Queue feedback for many captures as one offline batch", status_code=202)
+async def submit_batch_endpoint(
+    payload: BatchSubmission = Body(..., embed=False),
+    settings: FeedbackSettings = Depends(get_feedback_settings),
+    client: httpx.AsyncClient = Depends(get_http_client),
+    cache: ScreenshotCache = Depends(get_fetch_cache),
+    pool: ApiKeyPool = Depends(get_key_pool),
+    store: BatchStore = Depends(get_batch_store),
+    preprocessor: PreprocessPool = Depends(get_preprocessor),
+):
+    lines: list[dict[str, Any]] = []
+    for item in payload.items:
+        item_settings = request_settings(item, settings)
+        job = await capture_job(item, client, cache, item_settings)
+        try:
+            prepared = await preprocess(preprocessor, job)
+            line = batch_request_line(
+                item.custom_id,
+                None,
+                item.text,
+                item_settings,
+                previous_response_id=item.previous_response_id,
+                prepared=prepared,
+            )
+        except FeedbackError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail={"message": f"{item.custom_id}: {exc}"}
+            ) from exc
+        lines.append(line)
+    path = await asyncio.to_thread(write_batch_file, store.input_path(), lines)
+    slot = pool.acquire()
+    try:
+        batch = await asyncio.to_thread(submit_batch, slot.client, path, settings, payload.metadata)
+    except FeedbackError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"message": str(exc)}) from exc
+    finally:
+        pool.release(slot)
+    record = {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "key": slot.credential.label,
+        "input_file": str(path),
+        "submitted_at": datetime.now(timezone.utc).isoformat(),
+        "items": [item.custom_id for item in payload.items],
+        "request_counts": None,
+        "results": None,
     }
+    store.save(record)
+    logger.info("feedback batch queued", extra={"batch_id": batch.id, "items": len(lines)})
+    return record
+
+
+@app.get("/batches/{batch_id}", summary="Poll an offline batch and return its results once finished")
+async def batch_status_endpoint(
+    batch_id: str,
+    pool: ApiKeyPool = Depends(get_key_pool),
+    store: BatchStore = Depends(get_batch_store),
+):
+    record = store.load(batch_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"message": f"unknown batch {batch_id}"})
+    if record["status"] in TERMINAL_BATCH_STATUSES:
+        return record
+    slot = pool.slot_for(record["key"])
+    if slot is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": f"api key {record['key']} that submitted batch {batch_id} is no longer configured"},
+        )
+    try:
+        batch = await asyncio.to_thread(retrieve_batch, slot.client, batch_id)
+        record["status"] = batch.status
+        counts = getattr(batch, "request_counts", None)
+        record["request_counts"] = counts.model_dump() if counts is not None else None
+        if batch.status in TERMINAL_BATCH_STATUSES:
+            results = await asyncio.to_thread(collect_batch_results, slot.client, batch)
+            record["results"] = _batch_results(record, results)
+    except FeedbackError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"message": str(exc)}) from exc
+    store.save(record)
+    logger.info("feedback batch polled", extra={"batch_id": batch_id, "status": record["status"]})
+    return record
 
 
 @app.get("/health", summary="Service readiness probe")
-async def health(settings: FeedbackSettings = Depends(get_feedback_settings)):
-    return {"status": "ok", "model": settings.model_name}
+async def health(
+    settings: FeedbackSettings = Depends(get_feedback_settings),
+    limiter: ResponsesRateLimiter = Depends(get_rate_limiter),
+    cache: ScreenshotCache = Depends(get_fetch_cache),
+    singleflight: SingleFlight = Depends(get_singleflight),
+    pool: ApiKeyPool = Depends(get_key_pool),
+    preprocessor: PreprocessPool = Depends(get_preprocessor),
+):
+    return {
+        "status": "ok",
+        "model": settings.model_name,
+        "rate_limiter": limiter.snapshot(),
+        "fetch_cache": cache.snapshot(),
+        "singleflight": singleflight.snapshot(),
+        "api_keys": pool.snapshot(),
+        "preprocess": preprocessor.snapshot(),
+    }
@@ -0,0 +1,41 @@
+import json
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Any
+
+_BATCH_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+class BatchStore:
+    """Submitted batches on disk, one JSON record per batch id, so results can be collected after a restart."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def input_path(self) -> Path:
+        return self.root / "inputs" / f"{uuid.uuid4().hex}.jsonl"
+
+    def _record_path(self, batch_id: str) -> Path | None:
+        if not _BATCH_ID.match(batch_id):
+            return None
+        return self.root / f"{batch_id}.json"
+
+    def save(self, record: dict[str, Any]) -> None:
+        path = self._record_path(record["batch_id"])
+        if path is None:
+            raise ValueError(f"invalid batch id {record['batch_id']!r}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = path.with_suffix(".tmp")
+        staging.write_text(json.dumps(record, indent=2))
+        os.replace(staging, path)
+
+    def load(self, batch_id: str) -> dict[str, Any] | None:
+        path = self._record_path(batch_id)
+        if path is None or not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+
+__all__ = ["BatchStore"]
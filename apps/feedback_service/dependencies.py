@@ -4,11 +4,22 @@ from functools import lru_cache
 
 import httpx
 from enhancement_core.config import FeedbackSettings
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 
+from .batches import BatchStore
 from .config import FeedbackServiceConfig, get_config
+from .fetch_cache import ScreenshotCache
+from .key_pool import ApiKeyPool
+from .limiter import ResponsesRateLimiter
+from .preprocess import PreprocessPool
+from .singleflight import SingleFlight
 
 _client: httpx.AsyncClient | None = None
+_limiter: ResponsesRateLimiter | None = None
+_fetch_cache: ScreenshotCache | None = None
+_singleflight: SingleFlight | None = None
+_key_pool: ApiKeyPool | None = None
+_preprocessor: PreprocessPool | None = None
 
 
 @lru_cache
@@ -19,12 +30,26 @@ def get_feedback_settings(config: FeedbackServiceConfig | None = None) -> Feedba
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    global _client
+    global _client, _limiter, _fetch_cache, _singleflight, _key_pool, _preprocessor
     settings = get_feedback_settings()
     _client = httpx.AsyncClient(timeout=settings.request_timeout)
+    _limiter = ResponsesRateLimiter(settings.requests_per_minute, settings.tokens_per_minute, settings.queue_timeout)
+    _fetch_cache = ScreenshotCache(settings.fetch_cache_entries, settings.fetch_cache_max_bytes)
+    _singleflight = SingleFlight()
+    _key_pool = ApiKeyPool(settings.credentials(), settings.request_timeout)
+    _preprocessor = PreprocessPool(settings.preprocess_workers, settings.preprocess_queue)
     try:
         yield
     finally:
+        if _preprocessor is not None:
+            _preprocessor.close()
+            _preprocessor = None
+        _limiter = None
+        _fetch_cache = None
+        _singleflight = None
+        if _key_pool is not None:
+            _key_pool.close()
+            _key_pool = None
         if _client is not None:
             await _client.aclose()
             _client = None
@@ -36,4 +61,48 @@ def get_http_client() -> httpx.AsyncClient:
     return _client
 
 
-__all__ = ["get_feedback_settings", "get_http_client", "lifespan"]
+def get_rate_limiter() -> ResponsesRateLimiter:
+    if _limiter is None:
+        raise RuntimeError("rate limiter not initialized")
+    return _limiter
+
+
+def get_fetch_cache() -> ScreenshotCache:
+    if _fetch_cache is None:
+        raise RuntimeError("screenshot cache not initialized")
+    return _fetch_cache
+
+
+def get_key_pool() -> ApiKeyPool:
+    if _key_pool is None:
+        raise RuntimeError("api key pool not initialized")
+    return _key_pool
+
+
+def get_batch_store(settings: FeedbackSettings = Depends(get_feedback_settings)) -> BatchStore:
+    return BatchStore(settings.batch_dir)
+
+
+def get_preprocessor() -> PreprocessPool:
+    if _preprocessor is None:
+        raise RuntimeError("preprocessing pool not initialized")
+    return _preprocessor
+
+
+def get_singleflight() -> SingleFlight:
+    if _singleflight is None:
+        raise RuntimeError("request coalescer not initialized")
+    return _singleflight
+
+
+__all__ = [
+    "get_batch_store",
+    "get_feedback_settings",
+    "get_fetch_cache",
+    "get_http_client",
+    "get_key_pool",
+    "get_preprocessor",
+    "get_rate_limiter",
+    "get_singleflight",
+    "lifespan",
+]
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class CachedScreenshot:
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ScreenshotCache:
+    """Bounded LRU of downloaded screenshots keyed by URL, kept only when the origin sent validators."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedScreenshot] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> CachedScreenshot | None:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def store(self, url: str, body: bytes, etag: str | None, last_modified: str | None) -> None:
+        self.discard(url)
+        if not (etag or last_modified) or len(body) > self.max_bytes or self.max_entries == 0:
+            return
+        self._entries[url] = CachedScreenshot(body=body, etag=etag, last_modified=last_modified)
+        self._size += len(body)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+
+    def discard(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._size -= len(entry.body)
+
+    def snapshot(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+__all__ = ["CachedScreenshot", "ScreenshotCache"]
@@ -0,0 +1,139 @@
+import logging
+import re
+import time
+
+import httpx
+from enhancement_core.config import ApiCredential
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str | None) -> float | None:
+    """Parse rate-limit reset durations such as `1s`, `6m0s`, or `250ms` into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: httpx.Headers, name: str) -> int | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+class KeySlot:
+    """One API credential with its own client and the rate-limit state its responses report."""
+
+    def __init__(self, credential: ApiCredential, timeout: float):
+        self.credential = credential
+        self.in_flight = 0
+        self.dispatched = 0
+        self.throttle_count = 0
+        self.remaining_requests: int | None = None
+        self.remaining_tokens: int | None = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.throttled_until = 0.0
+        self.http_client = httpx.Client(timeout=timeout, event_hooks={"response": [self.observe]})
+        self.client = OpenAI(
+            api_key=credential.api_key,
+            organization=credential.organization,
+            project=credential.project,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+    def observe(self, response: httpx.Response) -> None:
+        """Record the rate-limit headers of every response sent with this key."""
+        now = time.monotonic()
+        headers = response.headers
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.requests_reset_at = now + (parse_reset(headers.get("x-ratelimit-reset-requests")) or 0.0)
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.tokens_reset_at = now + (parse_reset(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+
+    def headroom(self, now: float) -> tuple[float, float, int]:
+        """Sort key for routing; unknown or already-reset budgets count as unlimited until the next response."""
+        requests = self.remaining_requests if now < self.requests_reset_at else None
+        tokens = self.remaining_tokens if now < self.tokens_reset_at else None
+        return (
+            float("inf") if tokens is None else float(tokens),
+            float("inf") if requests is None else float(requests - self.in_flight),
+            -self.in_flight,
+        )
+
+
+class ApiKeyPool:
+    """Route Responses API calls to the key with the most rate-limit headroom."""
+
+    def __init__(self, credentials: list[ApiCredential], timeout: float):
+        if not credentials:
+            raise ValueError("at least one API credential is required")
+        self.slots = [KeySlot(credential, timeout) for credential in credentials]
+
+    def acquire(self) -> KeySlot:
+        now = time.monotonic()
+        available = [slot for slot in self.slots if slot.throttled_until <= now]
+        if available:
+            slot = max(available, key=lambda item: item.headroom(now))
+        else:
+            slot = min(self.slots, key=lambda item: item.throttled_until)
+        slot.in_flight += 1
+        slot.dispatched += 1
+        return slot
+
+    def slot_for(self, label: str) -> KeySlot | None:
+        """The slot for a specific key, for follow-up calls such as batch polling that must reuse it."""
+        return next((slot for slot in self.slots if slot.credential.label == label), None)
+
+    def release(self, slot: KeySlot) -> None:
+        slot.in_flight = max(0, slot.in_flight - 1)
+
+    def throttle(self, slot: KeySlot, seconds: float) -> None:
+        slot.throttle_count += 1
+        slot.throttled_until = max(slot.throttled_until, time.monotonic() + max(0.0, seconds))
+        logger.warning("api key throttled", extra={"key": slot.credential.label, "retry_after": seconds})
+
+    def all_throttled(self) -> bool:
+        now = time.monotonic()
+        return all(slot.throttled_until > now for slot in self.slots)
+
+    def close(self) -> None:
+        for slot in self.slots:
+            slot.http_client.close()
+
+    def snapshot(self) -> list[dict[str, object]]:
+        now = time.monotonic()
+        return [
+            {
+                "key": slot.credential.label,
+                "in_flight": slot.in_flight,
+                "dispatched": slot.dispatched,
+                "throttled": slot.throttled_until > now,
+                "throttle_count": slot.throttle_count,
+                "remaining_requests": slot.remaining_requests if now < slot.requests_reset_at else None,
+                "remaining_tokens": slot.remaining_tokens if now < slot.tokens_reset_at else None,
+            }
+            for slot in self.slots
+        ]
+
+
+__all__ = ["ApiKeyPool", "KeySlot", "parse_reset"]
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+
+class RateLimitTimeout(RuntimeError):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class TokenBucket:
+    capacity: float
+    refill_per_second: float
+    level: float = field(init=False)
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.level = self.capacity
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        deficit = min(amount, self.capacity) - self.level
+        if deficit <= 0:
+            return 0.0
+        return deficit / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class ResponsesRateLimiter:
+    """FIFO admission for Responses API calls bounded by requests/min and tokens/min.
+
+    Waiters queue behind a lock so earlier requests are admitted first; a request that cannot be
+    admitted before its deadline raises RateLimitTimeout instead of reaching the API.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, queue_timeout: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.queue_timeout = queue_timeout
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._queue_depth = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._throttled = 0
+        self._last_wait = 0.0
+        self._total_wait = 0.0
+
+    def deadline(self) -> float:
+        return time.monotonic() + self.queue_timeout
+
+    async def acquire(self, tokens: int, deadline: float | None = None) -> float:
+        started = time.monotonic()
+        deadline = deadline if deadline is not None else started + self.queue_timeout
+        self._queue_depth += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = max(
+                        self._paused_until - now,
+                        self.requests.delay_for(1),
+                        self.tokens.delay_for(tokens),
+                    )
+                    if delay <= 0:
+                        break
+                    if now + delay > deadline:
+                        self._rejected += 1
+                        raise RateLimitTimeout("rate limit queue deadline exceeded", retry_after=delay)
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+        finally:
+            self._queue_depth -= 1
+        waited = time.monotonic() - started
+        self._admitted += 1
+        self._last_wait = waited
+        self._total_wait += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        self._throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, seconds))
+
+    def snapshot(self) -> dict[str, float | int]:
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return {
+            "queue_depth": self._queue_depth,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "throttled": self._throttled,
+            "last_wait_seconds": round(self._last_wait, 3),
+            "avg_wait_seconds": round(self._total_wait / self._admitted, 3) if self._admitted else 0.0,
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 3),
+            "available_requests": int(self.requests.level),
+            "available_tokens": int(self.tokens.level),
+        }
+
+
+__all__ = ["RateLimitTimeout", "ResponsesRateLimiter", "TokenBucket"]
@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import binascii
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any
+
+from enhancement_core.config import FeedbackSettings
+from enhancement_core.feedback import PreparedInput, downscale_image, prepare_input, region_tile
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = ("PNG", "JPEG", "WEBP")
+TIMING_STAGES = ("queue_ms", "decode_ms", "validate_ms", "resize_ms", "tile_ms", "encode_ms")
+
+
+class PreprocessError(ValueError):
+    """The capture was rejected; the message is safe to return to the caller."""
+
+
+class PreprocessUnavailable(RuntimeError):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class PreprocessJob:
+    """One capture to prepare; each region is (base64 PNG, top, left)."""
+
+    settings: FeedbackSettings
+    text: str | None
+    image_b64: str | None = None
+    image_bytes: bytes | None = None
+    regions: list[tuple[str, int, int]] = field(default_factory=list)
+    dom_snapshot: dict[str, Any] | None = None
+    chained: bool = False
+
+    @property
+    def has_images(self) -> bool:
+        return bool(self.image_b64 or self.image_bytes or self.regions)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _decode(value: str, field_name: str) -> bytes:
+    try:
+        return base64.b64decode(value)
+    except binascii.Error as exc:
+        raise PreprocessError(f"{field_name} is not valid base64") from exc
+
+
+def _validate(data: bytes, settings: FeedbackSettings, label: str) -> tuple[int, int]:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError as exc:
+        raise PreprocessError(f"{label} exceeds {settings.max_image_pixels} pixels") from exc
+    except (UnidentifiedImageError, OSError) as exc:
+        raise PreprocessError(f"{label} is not a valid image") from exc
+    if image_format not in ALLOWED_FORMATS:
+        raise PreprocessError(f"{label} format {image_format} is not supported; send {', '.join(ALLOWED_FORMATS)}")
+    if width * height > settings.max_image_pixels:
+        raise PreprocessError(f"{label} exceeds {settings.max_image_pixels} pixels")
+    return width, height
+
+
+def preprocess_capture(job: PreprocessJob) -> PreparedInput:
+    """Decode, validate, resize, tile, and encode a capture; runs in a worker process."""
+    settings = job.settings
+    timing: dict[str, float] = {}
+    started = time.perf_counter()
+    image = _decode(job.image_b64, "screenshot_b64") if job.image_b64 else job.image_bytes
+    region_data = [(_decode(data, "changed region"), top, left) for data, top, left in job.regions]
+    timing["decode_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    width = _validate(image, settings, "screenshot")[0] if image else 0
+    regions = []
+    for data, top, left in region_data:
+        _validate(data, settings, "changed region")
+        regions.append(region_tile(data, top, left))
+    timing["validate_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    if image and width > settings.max_image_width:
+        image = downscale_image(image, settings.max_image_width)
+    timing["resize_ms"] = _elapsed_ms(started)
+
+    prepared = prepare_input(
+        image,
+        job.text,
+        settings,
+        chained=job.chained,
+        dom_snapshot=job.dom_snapshot,
+        regions=regions or None,
+    )
+    for stage, elapsed in prepared.timing.items():
+        timing[stage] = round(timing.get(stage, 0.0) + elapsed, 3)
+    prepared.timing = timing
+    return prepared
+
+
+class PreprocessPool:
+    """Run capture preprocessing in worker processes behind a bounded queue.
+
+    With zero workers the work runs on the default thread pool instead, which keeps it off the
+    event loop but shares the GIL with request handling.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = self._start() if workers else None
+
+    def _start(self) -> ProcessPoolExecutor:
+        """Spawn, not fork: a forked child of the running event loop and executor threads can deadlock."""
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace `broken` unless a concurrent failure has already done so."""
+        if self._executor is not broken:
+            return
+        logger.error("preprocessing worker died; restarting the pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._start()
+
+    async def run(self, job: PreprocessJob) -> PreparedInput:
+        """Prepare `job` in a worker, or inline when it has no images to decode.
+
+        `queue_ms` is whatever the worker's own stages do not account for: waiting for it and moving data.
+        """
+        if not job.has_images:
+            return preprocess_capture(job)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PreprocessUnavailable(f"preprocessing queue is full ({self.pending} captures pending)")
+        self.pending += 1
+        started = time.perf_counter()
+        executor = self._executor
+        try:
+            prepared = await asyncio.get_running_loop().run_in_executor(executor, preprocess_capture, job)
+        except BrokenProcessPool as exc:
+            if executor is not None:
+                self._restart(executor)
+            raise PreprocessUnavailable("preprocessing worker failed") from exc
+        finally:
+            self.pending -= 1
+        prepared.timing["queue_ms"] = round(max(0.0, _elapsed_ms(started) - sum(prepared.timing.values())), 3)
+        self.completed += 1
+        return prepared
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+__all__ = [
+    "ALLOWED_FORMATS",
+    "PreprocessError",
+    "PreprocessJob",
+    "PreprocessPool",
+    "PreprocessUnavailable",
+    "TIMING_STAGES",
+    "preprocess_capture",
+]
@@ -0,0 +1,49 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+
+def request_key(*parts: bytes | str | None) -> str:
+    """SHA-256 over length-prefixed parts, so ("ab", "c") and ("a", "bc") never collide."""
+    digest = hashlib.sha256()
+    for part in parts:
+        value = part.encode("utf-8") if isinstance(part, str) else (part or b"")
+        digest.update(len(value).to_bytes(8, "big"))
+        digest.update(value)
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls onto one shared task.
+
+    The shared task is not owned by any caller, so a disconnecting caller does not cancel the
+    upstream call for the others that joined it.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.saved_calls = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.saved_calls += 1
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict[str, int]:
+        return {"in_flight": len(self._inflight), "saved_calls": self.saved_calls}
+
+
+__all__ = ["SingleFlight", "request_key"]
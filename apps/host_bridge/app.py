@@ -1,17 +1,19 @@
 import asyncio
 import logging
+import re
 import uuid
-from functools import partial
+from typing import Literal
 
 from enhancement_core.codex import CodexOptions, CodexRunner, CodexRunnerError
 from enhancement_core.config import HostBridgeSettings
 from enhancement_core.logging import configure_logging, current_request_id, request_context
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field, field_validator
 
 from .dependencies import get_host_settings, get_runner
 
 logger = logging.getLogger(__name__)
+_RUN_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
 configure_logging("host_bridge")
 app = FastAPI(
     title="Host Bridge",
@@ -43,13 +45,23 @@ class HostPayload(BaseModel):
 
 
 @app.post("/apply-feedback", summary="Execute Codex with the provided feedback")
-async def apply_feedback(payload: HostPayload, runner: CodexRunner = Depends(get_runner)):
-    request_id = current_request_id() or str(uuid.uuid4())
+async def apply_feedback(
+    payload: HostPayload,
+    request: Request,
+    runner: CodexRunner = Depends(get_runner),
+):
+    """The run id is the caller's `x-request-id` when it is a valid one, so the caller can cancel the run by it.
+
+    The run is shielded from the handler's own cancellation and only stopped on client disconnect when that is enabled.
+    """
+    request_id = current_request_id() or ""
+    run_id = request_id if _RUN_ID.fullmatch(request_id) else None
     print("📨 Processing feedback request...")
-    loop = asyncio.get_running_loop()
+    run = asyncio.ensure_future(runner.run_async(payload.feedback, codex_options=payload.codex_options, run_id=run_id))
     try:
-        func = partial(runner.run, payload.feedback, codex_options=payload.codex_options)
-        result = await loop.run_in_executor(None, func)
+        if runner.settings.cancel_on_disconnect:
+            await _cancel_on_disconnect(request, run)
+        result = await asyncio.shield(run)
     except CodexRunnerError as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -59,12 +71,48 @@ async def apply_feedback(payload: HostPayload, runner: CodexRunner = Depends(get
                 "exit_code": exc.exit_code,
                 "stderr": exc.stderr,
                 "log_path": exc.log_path,
+                "merge": exc.merge,
             },
         ) from exc
     print("✅ Feedback applied successfully!")
     return result
 
 
+async def _cancel_on_disconnect(request: Request, run: asyncio.Future, poll_seconds: float = 1.0) -> None:
+    while not run.done():
+        if await request.is_disconnected():
+            logger.warning("client disconnected; cancelling codex run")
+            run.cancel()
+            return
+        await asyncio.wait({run}, timeout=poll_seconds)
+
+
+@app.get("/runs", summary="Codex runs in progress")
+async def list_runs(runner: CodexRunner = Depends(get_runner)):
+    return {"runs": runner.live_runs()}
+
+
+@app.get("/runs/{run_id}/log", summary="Output of a Codex run from a byte offset on")
+async def run_log(
+    run_id: str,
+    offset: int = Query(default=0, ge=0),
+    stream: Literal["stdout", "stderr"] = Query(default="stdout"),
+    limit: int = Query(default=65536, ge=1, le=1_048_576),
+    runner: CodexRunner = Depends(get_runner),
+):
+    chunk = runner.tail(run_id, stream, offset, limit)
+    if chunk is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"message": "Run not found"})
+    return chunk
+
+
+@app.delete("/runs/{run_id}", status_code=status.HTTP_202_ACCEPTED, summary="Stop a Codex run in progress")
+async def cancel_run(run_id: str, runner: CodexRunner = Depends(get_runner)):
+    if not runner.cancel(run_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"message": "Run not found"})
+    return {"run_id": run_id, "status": "cancelling"}
+
+
 @app.get("/health", summary="Service readiness probe")
 async def health(settings: HostBridgeSettings = Depends(get_host_settings)):
     return {"status": "ok", "repo": str(settings.next_path)}
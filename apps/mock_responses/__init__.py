@@ -0,0 +1,3 @@
+from apps.mock_responses.app import app
+
+__all__ = ["app"]
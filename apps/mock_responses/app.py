@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import httpx
+from enhancement_core.config import MockResponsesSettings
+from enhancement_core.logging import configure_logging, request_context
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, Response
+
+from .batches import BatchNotFoundError, MockBatchStore, parse_multipart
+from .cassettes import CassetteMissingError, CassetteStore, Recording, replayable_headers, request_key
+from .dependencies import (
+    get_batch_store,
+    get_cassette_store,
+    get_mock_settings,
+    get_simulator,
+    get_upstream_client,
+    lifespan,
+)
+from .simulator import ResponsesSimulator
+
+logger = logging.getLogger(__name__)
+configure_logging("mock_responses")
+app = FastAPI(
+    title="Mock Responses API",
+    version="0.1.0",
+    description="Hermetic stand-in for the OpenAI Responses API with fault injection and record/replay.",
+    lifespan=lifespan,
+)
+
+_FORWARDED_HEADERS = ("authorization", "openai-organization", "openai-project", "content-type")
+
+
+@app.middleware("http")
+async def add_request_id(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+    with request_context(request_id):
+        response = await call_next(request)
+    response.headers["x-request-id"] = request_id
+    return response
+
+
+def error_response(status_code: int, message: str, error_type: str, code: str | None, headers=None) -> JSONResponse:
+    body = {"error": {"message": message, "type": error_type, "param": None, "code": code}}
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
+
+
+async def simulate(body: dict, settings: MockResponsesSettings, simulator: ResponsesSimulator) -> Response:
+    fault = simulator.next_fault()
+    if fault == "throttle":
+        retry_after = settings.retry_after_seconds
+        logger.info("injecting rate limit response", extra={"request_count": simulator.request_count})
+        return error_response(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Rate limit reached for requests (mock)",
+            "requests",
+            "rate_limit_exceeded",
+            headers={"retry-after": f"{retry_after:g}", "retry-after-ms": str(int(retry_after * 1000))},
+        )
+    await asyncio.sleep(simulator.latency_seconds())
+    if fault == "error":
+        logger.info("injecting server error", extra={"request_count": simulator.request_count})
+        return error_response(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "The server had an error (mock)", "server_error", None
+        )
+    return JSONResponse(simulator.build_response(body))
+
+
+async def record(
+    request: Request,
+    raw: bytes,
+    key: str,
+    settings: MockResponsesSettings,
+    store: CassetteStore,
+    client: httpx.AsyncClient | None,
+) -> Response:
+    if client is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"message": "record mode disabled"})
+    headers = {name: value for name, value in request.headers.items() if name.lower() in _FORWARDED_HEADERS}
+    started = time.perf_counter()
+    try:
+        upstream = await client.post(f"{settings.upstream_url}/responses", content=raw, headers=headers)
+    except httpx.RequestError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail={"message": f"upstream unreachable: {exc}"}
+        ) from exc
+    recording = Recording(
+        status_code=upstream.status_code,
+        headers=replayable_headers(upstream.headers),
+        body=upstream.content,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+    store.save(key, recording)
+    logger.info("recorded upstream response", extra={"key": key, "status_code": upstream.status_code})
+    return replay_response(recording)
+
+
+def replay_response(recording: Recording) -> Response:
+    return Response(content=recording.body, status_code=recording.status_code, headers=recording.headers)
+
+
+@app.post("/v1/responses", summary="Create a model response")
+async def create_response(
+    request: Request,
+    settings: MockResponsesSettings = Depends(get_mock_settings),
+    simulator: ResponsesSimulator = Depends(get_simulator),
+    store: CassetteStore = Depends(get_cassette_store),
+    client: httpx.AsyncClient | None = Depends(get_upstream_client),
+):
+    raw = await request.body()
+    try:
+        body = json.loads(raw)
+    except ValueError:
+        return error_response(status.HTTP_400_BAD_REQUEST, "request body must be JSON", "invalid_request_error", None)
+    if body.get("stream"):
+        return error_response(
+            status.HTTP_400_BAD_REQUEST, "streaming is not supported by the mock", "invalid_request_error", None
+        )
+    if settings.mode == "mock":
+        return await simulate(body, settings, simulator)
+    key = request_key("POST", "/responses", raw)
+    if settings.mode == "record":
+        return await record(request, raw, key, settings, store, client)
+    try:
+        recording = store.load(key)
+    except CassetteMissingError:
+        logger.warning("no recording for request", extra={"key": key})
+        return error_response(
+            status.HTTP_404_NOT_FOUND, f"no recording for request {key}", "invalid_request_error", "cassette_missing"
+        )
+    if settings.replay_latency:
+        await asyncio.sleep(recording.elapsed_ms / 1000.0)
+    return replay_response(recording)
+
+
+def batch_runner(simulator: ResponsesSimulator):
+    def run(body: dict) -> tuple[int, dict]:
+        """Answer one batch line; batches queue against their own limits, so only server errors are injected."""
+        if simulator.next_fault() == "error":
+            error = {"message": "The server had an error (mock)", "type": "server_error", "param": None, "code": None}
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {"error": error}
+        return status.HTTP_200_OK, simulator.build_response(body)
+
+    return run
+
+
+def _require_mock_mode(settings: MockResponsesSettings) -> JSONResponse | None:
+    if settings.mode == "mock":
+        return None
+    return error_response(
+        status.HTTP_400_BAD_REQUEST, "batches are only simulated in mock mode", "invalid_request_error", None
+    )
+
+
+@app.post("/v1/files", summary="Upload a batch input file")
+async def upload_file(
+    request: Request,
+    settings: MockResponsesSettings = Depends(get_mock_settings),
+    batches: MockBatchStore = Depends(get_batch_store),
+):
+    if (rejected := _require_mock_mode(settings)) is not None:
+        return rejected
+    try:
+        fields = parse_multipart(request.headers.get("content-type", ""), await request.body())
+    except ValueError as exc:
+        return error_response(status.HTTP_400_BAD_REQUEST, str(exc), "invalid_request_error", None)
+    if "file" not in fields:
+        return error_response(status.HTTP_400_BAD_REQUEST, "file is required", "invalid_request_error", None)
+    filename, content = fields["file"]
+    purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+    stored = batches.add_file(filename or "upload.jsonl", purpose, content)
+    logger.info("stored uploaded file", extra={"file_id": stored.id, "bytes": len(content)})
+    return stored.describe()
+
+
+@app.get("/v1/files/{file_id}/content", summary="Download a file")
+async def file_content(file_id: str, batches: MockBatchStore = Depends(get_batch_store)):
+    try:
+        stored = batches.get_file(file_id)
+    except BatchNotFoundError:
+        return error_response(status.HTTP_404_NOT_FOUND, f"no file {file_id}", "invalid_request_error", None)
+    return Response(content=stored.content, media_type="application/octet-stream")
+
+
+@app.post("/v1/batches", summary="Create a batch")
+async def create_batch(
+    request: Request,
+    settings: MockResponsesSettings = Depends(get_mock_settings),
+    batches: MockBatchStore = Depends(get_batch_store),
+):
+    if (rejected := _require_mock_mode(settings)) is not None:
+        return rejected
+    try:
+        body = await request.json()
+        input_file_id, endpoint = body["input_file_id"], body["endpoint"]
+    except (ValueError, KeyError, TypeError):
+        return error_response(
+            status.HTTP_400_BAD_REQUEST, "input_file_id and endpoint are required", "invalid_request_error", None
+        )
+    if endpoint != "/v1/responses":
+        return error_response(
+            status.HTTP_400_BAD_REQUEST, "the mock only batches /v1/responses", "invalid_request_error", None
+        )
+    try:
+        batch = batches.create_batch(
+            input_file_id, endpoint, body.get("completion_window", "24h"), body.get("metadata")
+        )
+    except BatchNotFoundError:
+        return error_response(status.HTTP_404_NOT_FOUND, f"no file {input_file_id}", "invalid_request_error", None)
+    logger.info("created batch", extra={"batch_id": batch.id, "input_file_id": input_file_id})
+    return batch.describe()
+
+
+@app.get("/v1/batches/{batch_id}", summary="Retrieve a batch")
+async def retrieve_batch(
+    batch_id: str,
+    simulator: ResponsesSimulator = Depends(get_simulator),
+    batches: MockBatchStore = Depends(get_batch_store),
+):
+    try:
+        batch = batches.get_batch(batch_id, batch_runner(simulator))
+    except BatchNotFoundError:
+        return error_response(status.HTTP_404_NOT_FOUND, f"no batch {batch_id}", "invalid_request_error", None)
+    return batch.describe()
+
+
+@app.get("/health", summary="Service readiness probe")
+async def health(
+    settings: MockResponsesSettings = Depends(get_mock_settings),
+    simulator: ResponsesSimulator = Depends(get_simulator),
+):
+    return {"status": "ok", "mode": settings.mode, "requests": simulator.request_count}
@@ -0,0 +1,177 @@
+import json
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any
+
+RequestRunner = Callable[[dict[str, Any]], tuple[int, dict[str, Any]]]
+
+
+class BatchNotFoundError(LookupError):
+    pass
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict[str, tuple[str | None, bytes]]:
+    """Split a multipart/form-data body into `{field: (filename, data)}` without python-multipart."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    if not message.is_multipart():
+        raise ValueError("request body must be multipart/form-data")
+    fields: dict[str, tuple[str | None, bytes]] = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            payload = part.get_payload(decode=True)
+            fields[str(name)] = (part.get_filename(), payload if isinstance(payload, bytes) else b"")
+    return fields
+
+
+@dataclass
+class StoredFile:
+    id: str
+    filename: str
+    purpose: str
+    content: bytes
+    created_at: int = field(default_factory=lambda: int(time.time()))
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "file",
+            "bytes": len(self.content),
+            "created_at": self.created_at,
+            "filename": self.filename,
+            "purpose": self.purpose,
+            "status": "processed",
+        }
+
+
+@dataclass
+class StoredBatch:
+    id: str
+    input_file_id: str
+    endpoint: str
+    completion_window: str
+    metadata: dict[str, str] | None
+    ready_at: float
+    created_at: int = field(default_factory=lambda: int(time.time()))
+    status: str = "in_progress"
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+    completed_at: int | None = None
+    counts: dict[str, int] = field(default_factory=lambda: {"total": 0, "completed": 0, "failed": 0})
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": self.endpoint,
+            "errors": None,
+            "input_file_id": self.input_file_id,
+            "completion_window": self.completion_window,
+            "status": self.status,
+            "output_file_id": self.output_file_id,
+            "error_file_id": self.error_file_id,
+            "created_at": self.created_at,
+            "in_progress_at": self.created_at,
+            "completed_at": self.completed_at,
+            "request_counts": dict(self.counts),
+            "metadata": self.metadata,
+        }
+
+
+class MockBatchStore:
+    """In-memory files and batches; a batch runs every line through the simulator once its delay has passed."""
+
+    def __init__(self, delay_seconds: float):
+        self.delay_seconds = delay_seconds
+        self.files: dict[str, StoredFile] = {}
+        self.batches: dict[str, StoredBatch] = {}
+
+    def add_file(self, filename: str, purpose: str, content: bytes) -> StoredFile:
+        stored = StoredFile(id=f"file-mock{uuid.uuid4().hex[:24]}", filename=filename, purpose=purpose, content=content)
+        self.files[stored.id] = stored
+        return stored
+
+    def get_file(self, file_id: str) -> StoredFile:
+        try:
+            return self.files[file_id]
+        except KeyError as exc:
+            raise BatchNotFoundError(file_id) from exc
+
+    def create_batch(
+        self, input_file_id: str, endpoint: str, completion_window: str, metadata: dict[str, str] | None
+    ) -> StoredBatch:
+        self.get_file(input_file_id)
+        batch = StoredBatch(
+            id=f"batch_mock{uuid.uuid4().hex[:24]}",
+            input_file_id=input_file_id,
+            endpoint=endpoint,
+            completion_window=completion_window,
+            metadata=metadata,
+            ready_at=time.monotonic() + self.delay_seconds,
+        )
+        self.batches[batch.id] = batch
+        return batch
+
+    def get_batch(self, batch_id: str, run: RequestRunner) -> StoredBatch:
+        try:
+            batch = self.batches[batch_id]
+        except KeyError as exc:
+            raise BatchNotFoundError(batch_id) from exc
+        if batch.status == "in_progress" and time.monotonic() >= batch.ready_at:
+            self._complete(batch, run)
+        return batch
+
+    def _complete(self, batch: StoredBatch, run: RequestRunner) -> None:
+        outputs: list[dict[str, Any]] = []
+        errors: list[dict[str, Any]] = []
+        for raw in self.files[batch.input_file_id].content.decode("utf-8").splitlines():
+            if not raw.strip():
+                continue
+            line_id = f"batch_req_{uuid.uuid4().hex[:24]}"
+            try:
+                line = json.loads(raw)
+                custom_id, body = line["custom_id"], line["body"]
+            except (ValueError, KeyError, TypeError):
+                errors.append(
+                    {
+                        "id": line_id,
+                        "custom_id": None,
+                        "response": None,
+                        "error": {
+                            "code": "invalid_request",
+                            "message": "batch line must be JSON with custom_id and body",
+                        },
+                    }
+                )
+                continue
+            status_code, response_body = run(body)
+            outputs.append(
+                {
+                    "id": line_id,
+                    "custom_id": custom_id,
+                    "response": {"status_code": status_code, "request_id": uuid.uuid4().hex, "body": response_body},
+                    "error": None,
+                }
+            )
+        batch.counts = {
+            "total": len(outputs) + len(errors),
+            "completed": sum(1 for item in outputs if item["response"]["status_code"] == 200),
+            "failed": len(errors) + sum(1 for item in outputs if item["response"]["status_code"] != 200),
+        }
+        batch.output_file_id = self._write_results(batch, "output", outputs)
+        batch.error_file_id = self._write_results(batch, "errors", errors)
+        batch.status = "completed"
+        batch.completed_at = int(time.time())
+
+    def _write_results(self, batch: StoredBatch, kind: str, lines: list[dict[str, Any]]) -> str | None:
+        if not lines:
+            return None
+        content = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        return self.add_file(f"{batch.id}_{kind}.jsonl", "batch_output", content).id
+
+
+__all__ = ["BatchNotFoundError", "MockBatchStore", "StoredBatch", "StoredFile", "parse_multipart"]
@@ -0,0 +1,67 @@
+import hashlib
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+_REPLAYED_HEADERS = ("content-type", "retry-after", "retry-after-ms", "x-request-id")
+
+
+def replayable_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    """Headers worth replaying; transport headers such as content-length and content-encoding are left out."""
+    return {name: value for name, value in headers.items() if name.lower() in _REPLAYED_HEADERS}
+
+
+class CassetteMissingError(LookupError):
+    pass
+
+
+@dataclass
+class Recording:
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    elapsed_ms: float
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Stable key for a request; JSON bodies are canonicalized so key order does not matter."""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        canonical = body
+    digest = hashlib.sha256()
+    digest.update(f"{method.upper()} {path}\n".encode())
+    digest.update(canonical)
+    return digest.hexdigest()
+
+
+class CassetteStore:
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.root / f"{key}.json", self.root / f"{key}.body"
+
+    def save(self, key: str, recording: Recording) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path, body_path = self._paths(key)
+        headers = replayable_headers(recording.headers)
+        body_path.write_bytes(recording.body)
+        meta = {"status_code": recording.status_code, "headers": headers, "elapsed_ms": recording.elapsed_ms}
+        meta_path.write_text(json.dumps(meta, indent=2))
+
+    def load(self, key: str) -> Recording:
+        meta_path, body_path = self._paths(key)
+        if not meta_path.exists() or not body_path.exists():
+            raise CassetteMissingError(key)
+        meta = json.loads(meta_path.read_text())
+        return Recording(
+            status_code=int(meta["status_code"]),
+            headers=dict(meta.get("headers", {})),
+            body=body_path.read_bytes(),
+            elapsed_ms=float(meta.get("elapsed_ms", 0.0)),
+        )
+
+
+__all__ = ["CassetteMissingError", "CassetteStore", "Recording", "replayable_headers", "request_key"]
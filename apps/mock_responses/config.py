@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from enhancement_core.config import MockResponsesSettings
+
+
+@dataclass
+class MockResponsesConfig:
+    settings: MockResponsesSettings
+
+
+def get_config() -> MockResponsesConfig:
+    return MockResponsesConfig(settings=MockResponsesSettings())
+
+
+__all__ = ["MockResponsesConfig", "get_config"]
@@ -0,0 +1,70 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import httpx
+from enhancement_core.config import MockResponsesSettings
+from fastapi import FastAPI
+
+from .batches import MockBatchStore
+from .cassettes import CassetteStore
+from .config import get_config
+from .simulator import ResponsesSimulator
+
+_client: httpx.AsyncClient | None = None
+_simulator: ResponsesSimulator | None = None
+_batches: MockBatchStore | None = None
+
+
+@lru_cache
+def get_mock_settings() -> MockResponsesSettings:
+    cfg = get_config()
+    return cfg.settings
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    global _client, _simulator, _batches
+    settings = get_mock_settings()
+    _simulator = ResponsesSimulator(settings)
+    _batches = MockBatchStore(settings.batch_delay_seconds)
+    if settings.mode == "record":
+        _client = httpx.AsyncClient(timeout=settings.request_timeout)
+    try:
+        yield
+    finally:
+        _simulator = None
+        _batches = None
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+
+def get_simulator() -> ResponsesSimulator:
+    if _simulator is None:
+        raise RuntimeError("responses simulator not initialized")
+    return _simulator
+
+
+def get_batch_store() -> MockBatchStore:
+    if _batches is None:
+        raise RuntimeError("batch store not initialized")
+    return _batches
+
+
+def get_upstream_client() -> httpx.AsyncClient | None:
+    return _client
+
+
+def get_cassette_store() -> CassetteStore:
+    return CassetteStore(get_mock_settings().cassette_dir)
+
+
+__all__ = [
+    "get_batch_store",
+    "get_cassette_store",
+    "get_mock_settings",
+    "get_simulator",
+    "get_upstream_client",
+    "lifespan",
+]
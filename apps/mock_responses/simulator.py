@@ -0,0 +1,135 @@
+import json
+import math
+import random
+import time
+from typing import Any
+
+from enhancement_core.config import MockResponsesSettings
+
+_HIGH_DETAIL_CAPTURE_TOKENS = 765
+
+
+def sample_from_schema(schema: dict[str, Any], text: str) -> Any:
+    """Build a minimal instance that satisfies the structured output schema."""
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((item for item in kind if item != "null"), "null")
+    if kind == "object" or "properties" in schema:
+        properties = schema.get("properties", {})
+        required = schema.get("required", list(properties))
+        return {name: sample_from_schema(properties[name], text) for name in required if name in properties}
+    if kind == "array":
+        count = max(1, int(schema.get("minItems", 1)))
+        return [sample_from_schema(schema.get("items", {}), text) for _ in range(count)]
+    if kind == "string":
+        return text
+    if kind == "integer":
+        return int(schema.get("minimum", 0))
+    if kind == "number":
+        return float(schema.get("minimum", 0))
+    if kind == "boolean":
+        return False
+    return None
+
+
+def estimate_input_tokens(body: dict[str, Any]) -> int:
+    tokens = len(str(body.get("instructions") or "")) // 4
+    items = body.get("input")
+    if isinstance(items, str):
+        return tokens + len(items) // 4
+    for item in items or []:
+        content = item.get("content") if isinstance(item, dict) else None
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "input_image":
+                tokens += 85 if part.get("detail") == "low" else _HIGH_DETAIL_CAPTURE_TOKENS
+            else:
+                tokens += len(str(part.get("text") or "")) // 4
+    return tokens
+
+
+class ResponsesSimulator:
+    def __init__(self, settings: MockResponsesSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.request_count = 0
+
+    def latency_seconds(self) -> float:
+        mean = self.settings.latency_ms
+        jitter = self.settings.latency_jitter_ms
+        distribution = self.settings.latency_distribution
+        if distribution == "fixed" or mean == 0:
+            value = mean
+        elif distribution == "uniform":
+            value = self.random.uniform(mean - jitter, mean + jitter)
+        elif distribution == "normal":
+            value = self.random.gauss(mean, jitter)
+        else:
+            sigma_sq = math.log(1 + (jitter / mean) ** 2)
+            mu = math.log(mean) - sigma_sq / 2
+            value = self.random.lognormvariate(mu, math.sqrt(sigma_sq))
+        return max(0.0, value) / 1000.0
+
+    def next_fault(self) -> str | None:
+        """Return "throttle", "error", or None for the next request."""
+        self.request_count += 1
+        every = self.settings.throttle_every
+        if every and (self.request_count - 1) % every < self.settings.throttle_burst and self.request_count > every:
+            return "throttle"
+        if self.settings.error_rate and self.random.random() < self.settings.error_rate:
+            return "error"
+        return None
+
+    def build_response(self, body: dict[str, Any]) -> dict[str, Any]:
+        text_format = (body.get("text") or {}).get("format") or {}
+        schema = text_format.get("schema")
+        if text_format.get("type") == "json_schema" and isinstance(schema, dict):
+            output_text = json.dumps(sample_from_schema(schema, self.settings.feedback_text))
+        else:
+            output_text = self.settings.feedback_text
+        input_tokens = estimate_input_tokens(body)
+        output_tokens = min(
+            self.settings.output_tokens, int(body.get("max_output_tokens") or self.settings.output_tokens)
+        )
+        return {
+            "id": f"resp_mock_{self.random.getrandbits(96):024x}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model") or "mock-model",
+            "instructions": body.get("instructions"),
+            "previous_response_id": body.get("previous_response_id"),
+            "max_output_tokens": body.get("max_output_tokens"),
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_mock_{self.random.getrandbits(96):024x}",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": output_text, "annotations": []}],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "text": body.get("text") or {"format": {"type": "text"}},
+            "error": None,
+            "incomplete_details": None,
+            "metadata": {},
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0, "cache_write_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+
+__all__ = ["ResponsesSimulator", "estimate_input_tokens", "sample_from_schema"]
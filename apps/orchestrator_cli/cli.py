@@ -2,6 +2,9 @@ import enhancement_core.cli.app as cli_impl
 
 app = cli_impl.app
 pipeline_app = cli_impl.pipeline_app
+crawl_app = cli_impl.crawl_app
+crawl_submit = cli_impl.crawl_submit
+crawl_collect = cli_impl.crawl_collect
 doctor = cli_impl.doctor
 pipeline_run = cli_impl.pipeline_run
 sample_feedback = cli_impl.sample_feedback
@@ -17,6 +20,9 @@ main = cli_impl.main
 __all__ = [
     "app",
     "pipeline_app",
+    "crawl_app",
+    "crawl_submit",
+    "crawl_collect",
     "doctor",
     "pipeline_run",
     "sample_feedback",
@@ -0,0 +1,54 @@
+import time
+from typing import Any
+
+
+class AimdLimit:
+    """Additive-increase, multiplicative-decrease concurrency limit for bridge calls.
+
+    Each healthy call (no fault, latency under target) made while at least half the limit is in use
+    adds `1 / limit`, so the limit grows by about one per full window. A timeout or bridge fault
+    multiplies it by `backoff`. Faults from calls that started before the last cut are ignored, so a
+    single overload event does not collapse the limit to the minimum.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, backoff: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(min(maximum, max(minimum, initial)))
+        self.increases = 0
+        self.decreases = 0
+        self._last_cut = float("-inf")
+
+    @property
+    def current(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def observe(self, started: float, latency: float, fault: bool, in_flight: int) -> None:
+        if fault:
+            if started < self._last_cut:
+                return
+            self.limit = max(float(self.minimum), self.limit * self.backoff)
+            self._last_cut = time.monotonic()
+            self.decreases += 1
+            return
+        if latency > self.latency_target or in_flight * 2 < self.current:
+            return
+        grown = min(float(self.maximum), self.limit + 1 / self.current)
+        if grown > self.limit:
+            self.limit = grown
+            self.increases += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "limit": self.current,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "latency_target_seconds": self.latency_target,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+__all__ = ["AimdLimit"]
@@ -1,16 +1,36 @@
 import asyncio
+import json
 import logging
 import uuid
-from typing import Any
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, Literal
 
 import httpx
 from enhancement_core.codex.options import CodexOptions
 from enhancement_core.config import RouterSettings
 from enhancement_core.logging import configure_logging, request_context
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
-from .dependencies import get_http_client, get_router_settings, lifespan
+from .bridge import submit_feedback
+from .bridge_pool import BridgePool
+from .coalesce import Coalescer, group_key
+from .dependencies import (
+    get_bridge_pool,
+    get_coalescer,
+    get_http_client,
+    get_idempotency_store,
+    get_job_queue,
+    get_retry_policy,
+    get_router_settings,
+    get_scheduler,
+    lifespan,
+)
+from .idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+from .jobs import Job, JobQueue
+from .retry import RetryPolicy
+from .scheduler import Scheduler, SchedulerFull
 
 logger = logging.getLogger(__name__)
 configure_logging("router_service")
@@ -46,11 +66,13 @@ class FeedbackOutput(BaseModel):
 class FeedbackEnvelope(BaseModel):
     output: FeedbackOutput
     codex_options: CodexOptions | None = None
+    idempotency_key: str | None = Field(default=None, min_length=1, max_length=200)
 
 
 class DirectFeedback(BaseModel):
     feedback: str = Field(min_length=1)
     codex_options: CodexOptions | None = None
+    idempotency_key: str | None = Field(default=None, min_length=1, max_length=200)
 
     @field_validator("feedback")
     @classmethod
@@ -70,51 +92,6 @@ def extract_feedback(entry: Payload) -> tuple[str, CodexOptions | None]:
     return entry.feedback, entry.codex_options
 
 
-async def submit_feedback(
-    index: int,
-    text: str,
-    codex_options: CodexOptions | None,
-    client: httpx.AsyncClient,
-    settings: RouterSettings,
-    semaphore: asyncio.Semaphore,
-) -> dict[str, Any]:
-    url = f"{settings.bridge_url}/apply-feedback"
-    data: dict[str, Any] = {"feedback": text}
-    if codex_options:
-        data["codex_options"] = codex_options.model_dump(exclude_none=True)
-    async with semaphore:
-        try:
-            response = await client.post(url, json=data)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logger.error(
-                "codex bridge error",
-                extra={"index": index, "status_code": exc.response.status_code, "body": exc.response.text},
-            )
-            return {
-                "index": index,
-                "status": "error",
-                "error": {
-                    "message": "codex bridge error",
-                    "status_code": exc.response.status_code,
-                    "body": exc.response.text,
-                },
-            }
-        except httpx.RequestError as exc:
-            logger.error("codex bridge unreachable", extra={"index": index, "error": str(exc)})
-            return {
-                "index": index,
-                "status": "error",
-                "error": {"message": "unable to reach codex bridge", "detail": str(exc)},
-            }
-    try:
-        payload = response.json()
-    except ValueError:
-        logger.error("bridge returned invalid json", extra={"index": index})
-        return {"index": index, "status": "error", "error": {"message": "invalid bridge response"}}
-    return {"index": index, "status": "ok", "result": payload}
-
-
 def normalize_payload(payload: Payload | list[Payload] | tuple[Payload, ...]) -> list[Payload]:
     if isinstance(payload, list):
         return payload
@@ -123,28 +100,236 @@ def normalize_payload(payload: Payload | list[Payload] | tuple[Payload, ...]) ->
     return [payload]
 
 
+def caller_id(request: Request) -> str:
+    """Who to share the scheduler fairly with: an explicit `x-caller-id`, else the client address."""
+    return request.headers.get("x-caller-id") or (request.client.host if request.client else "anonymous")
+
+
+def item_keys(request: Request, entries: list[Payload]) -> list[str | None]:
+    """Each item's idempotency key: its own field, else the `Idempotency-Key` header (suffixed per item)."""
+    header = request.headers.get("idempotency-key")
+    keys: list[str | None] = []
+    for index, entry in enumerate(entries):
+        if entry.idempotency_key:
+            keys.append(entry.idempotency_key)
+        elif header:
+            keys.append(header if len(entries) == 1 else f"{header}:{index}")
+        else:
+            keys.append(None)
+    return keys
+
+
+async def _submit_once(
+    index: int,
+    key: str | None,
+    digest: str,
+    submit: Callable[[], Awaitable[dict[str, Any]]],
+    store: IdempotencyStore,
+) -> dict[str, Any]:
+    if key is None:
+        return await submit()
+    try:
+        result = await store.run(key, digest, submit)
+    except IdempotencyConflict as exc:
+        return {"index": index, "status": "error", "error": {"message": str(exc)}}
+    return {**result, "index": index}
+
+
+async def _copy_result(index: int, primary: int, task: asyncio.Task) -> dict[str, Any]:
+    """A duplicate's copy of the first run's result; shielded so a duplicate giving up never cancels that run."""
+    result = await asyncio.shield(task)
+    return {**result, "index": index, "duplicate_of": primary}
+
+
+def _batch_status(results: list[dict[str, Any]]) -> str:
+    return "partial-error" if any(result["status"] == "error" for result in results) else "submitted"
+
+
+def _ndjson(event: dict[str, Any]) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def _stream_results(tasks: list[asyncio.Task], keepalive: float) -> AsyncIterator[str]:
+    """Yield each result as an NDJSON line as soon as it finishes, then one summary line.
+
+    A blank line goes out after every `keepalive` seconds without a result, so a long Codex run never looks idle.
+    """
+    results: list[dict[str, Any]] = []
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                yield "\n"
+            for task in done:
+                result = task.result()
+                results.append(result)
+                yield _ndjson({"type": "result", "result": result})
+        yield _ndjson(
+            {
+                "type": "summary",
+                "status": _batch_status(results),
+                "total": len(results),
+                "errors": sum(result["status"] == "error" for result in results),
+            }
+        )
+    finally:
+        if pending:
+            logger.warning("stream client went away; cancelling unfinished items", extra={"count": len(pending)})
+            for task in pending:
+                task.cancel()
+
+
 @app.post("/apply-feedback", summary="Forward feedback entries to the host bridge")
 async def apply_feedback(
-    payload: Payload | list[Payload],
+    request: Request,
+    payload: Payload | list[Payload] = Body(..., embed=True),
+    priority: Literal["interactive", "batch"] = Query(default="interactive"),
+    stream: bool = Query(default=False),
     client: httpx.AsyncClient = Depends(get_http_client),
+    bridges: BridgePool = Depends(get_bridge_pool),
+    scheduler: Scheduler = Depends(get_scheduler),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    coalescer: Coalescer = Depends(get_coalescer),
+    retry: RetryPolicy = Depends(get_retry_policy),
     settings: RouterSettings = Depends(get_router_settings),
 ):
     entries = normalize_payload(payload)
     if not entries:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "payload cannot be empty"})
-    semaphore = asyncio.Semaphore(settings.max_concurrency)
-    logger.info("dispatching feedback batch", extra={"count": len(entries)})
-    tasks = [
-        asyncio.create_task(
-            submit_feedback(index, *extract_feedback(entry), client, settings, semaphore)
+    items = [extract_feedback(entry) for entry in entries]
+    digests = [fingerprint(text, codex_options) for text, codex_options in items]
+    first_seen: dict[str, int] = {}
+    for index, digest in enumerate(digests):
+        first_seen.setdefault(digest, index)
+    try:
+        scheduler.admit(len(first_seen))
+    except SchedulerFull as exc:
+        logger.warning("router queue full; rejecting batch", extra={"count": len(entries)})
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={"message": str(exc)},
+            headers={"Retry-After": str(round(exc.retry_after))},
+        ) from exc
+    caller = caller_id(request)
+    logger.info(
+        "dispatching feedback batch",
+        extra={"count": len(entries), "unique": len(first_seen), "caller": caller, "priority": priority},
+    )
+
+    def submitter(index: int, text: str, codex_options: CodexOptions | None):
+        async def send(lead: int, prompt: str) -> dict[str, Any]:
+            slot = scheduler.slot(caller, priority)
+            return await submit_feedback(lead, prompt, codex_options, client, bridges, slot, retry)
+
+        return lambda: coalescer.submit(group_key(codex_options), index, text, send)
+
+    tasks: list[asyncio.Task] = []
+    for index, ((text, codex_options), digest, key) in enumerate(
+        zip(items, digests, item_keys(request, entries), strict=True)
+    ):
+        primary = first_seen[digest]
+        if primary != index:
+            tasks.append(asyncio.create_task(_copy_result(index, primary, tasks[primary])))
+            continue
+        submit = submitter(index, text, codex_options)
+        tasks.append(asyncio.create_task(_submit_once(index, key, digest, submit, idempotency)))
+    if stream:
+        return StreamingResponse(
+            _stream_results(tasks, settings.stream_keepalive),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache"},
         )
-        for index, entry in enumerate(entries)
-    ]
     results = await asyncio.gather(*tasks)
-    status_label = "partial-error" if any(result["status"] == "error" for result in results) else "submitted"
-    return {"status": status_label, "results": results}
+    return {"status": _batch_status(results), "results": results}
+
+
+@app.post("/jobs", summary="Queue feedback entries as jobs and return without waiting for Codex", status_code=202)
+async def submit_jobs(
+    request: Request,
+    payload: Payload | list[Payload] = Body(..., embed=True),
+    queue: JobQueue = Depends(get_job_queue),
+):
+    entries = normalize_payload(payload)
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "payload cannot be empty"})
+    queued = []
+    keys: list[tuple[str, str] | None] = []
+    for entry, key in zip(entries, item_keys(request, entries), strict=True):
+        text, codex_options = extract_feedback(entry)
+        queued.append((text, codex_options.model_dump(exclude_none=True) if codex_options else None))
+        keys.append((key, fingerprint(text, codex_options)) if key else None)
+    try:
+        jobs = queue.submit(queued, keys)
+    except IdempotencyConflict as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(exc)}) from exc
+    logger.info("queued feedback jobs", extra={"batch_id": jobs[0].batch_id, "count": len(jobs)})
+    return {
+        "batch_id": jobs[0].batch_id,
+        "jobs": [{"job_id": job.job_id, "index": job.index, "status": job.status} for job in jobs],
+    }
+
+
+def _find_job(queue: JobQueue, job_id: str) -> Job:
+    job = queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"message": f"unknown job {job_id}"})
+    return job
+
+
+@app.get("/jobs/{job_id}", summary="Job status; pass wait to long-poll until the status changes")
+async def job_status(
+    job_id: str,
+    wait: float = Query(default=0, ge=0),
+    queue: JobQueue = Depends(get_job_queue),
+    settings: RouterSettings = Depends(get_router_settings),
+):
+    job = _find_job(queue, job_id)
+    if wait and not job.done:
+        job = await queue.wait(job_id, min(wait, settings.job_long_poll_max), job.status) or job
+    return job.describe()
+
+
+def _sse(job: Job) -> str:
+    return f"event: {job.status}\ndata: {json.dumps(job.describe())}\n\n"
+
+
+@app.get("/jobs/{job_id}/events", summary="Stream job status changes as server-sent events")
+async def job_events(
+    job_id: str,
+    queue: JobQueue = Depends(get_job_queue),
+    settings: RouterSettings = Depends(get_router_settings),
+):
+    job = _find_job(queue, job_id)
+
+    async def stream() -> AsyncIterator[str]:
+        current = job
+        yield _sse(current)
+        while not current.done:
+            latest = await queue.wait(job_id, settings.job_long_poll_max, current.status)
+            if latest is None:
+                return
+            yield ": keep-alive\n\n" if latest.status == current.status else _sse(latest)
+            current = latest
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 @app.get("/health", summary="Service readiness probe")
-async def health(settings: RouterSettings = Depends(get_router_settings)):
-    return {"status": "ok", "bridge": settings.bridge_url}
+async def health(
+    settings: RouterSettings = Depends(get_router_settings),
+    queue: JobQueue = Depends(get_job_queue),
+    scheduler: Scheduler = Depends(get_scheduler),
+    bridges: BridgePool = Depends(get_bridge_pool),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    coalescer: Coalescer = Depends(get_coalescer),
+):
+    return {
+        "status": "ok",
+        "bridge": settings.bridge_url,
+        "bridges": bridges.snapshot(),
+        "jobs": queue.snapshot(),
+        "scheduler": scheduler.snapshot(),
+        "idempotency": idempotency.snapshot(),
+        "coalescing": coalescer.snapshot(),
+    }
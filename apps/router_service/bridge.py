@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from contextlib import AbstractAsyncContextManager
+from typing import Any
+
+import httpx
+from enhancement_core.codex.options import CodexOptions
+
+from .bridge_pool import BridgePool, is_bridge_fault
+from .retry import RETRYABLE_ERRORS, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def _unreachable(index: int, bridge: str, attempt: int, exc: httpx.RequestError) -> dict[str, Any]:
+    logger.error("codex bridge unreachable", extra={"index": index, "bridge": bridge, "error": str(exc)})
+    return {
+        "index": index,
+        "status": "error",
+        "bridge": bridge,
+        "attempts": attempt,
+        "error": {"message": "unable to reach codex bridge", "detail": str(exc)},
+    }
+
+
+def _bridge_result(index: int, bridge: str, attempt: int, response: httpx.Response) -> dict[str, Any]:
+    try:
+        payload = response.json()
+    except ValueError:
+        logger.error("bridge returned invalid json", extra={"index": index, "bridge": bridge})
+        return {
+            "index": index,
+            "status": "error",
+            "bridge": bridge,
+            "error": {"message": "invalid bridge response"},
+        }
+    return {"index": index, "status": "ok", "bridge": bridge, "attempts": attempt, "result": payload}
+
+
+async def submit_feedback(
+    index: int,
+    text: str,
+    codex_options: CodexOptions | None,
+    client: httpx.AsyncClient,
+    bridges: BridgePool,
+    slot: AbstractAsyncContextManager,
+    retry: RetryPolicy | None = None,
+) -> dict[str, Any]:
+    """POST one entry to a bridge once `slot` (a scheduler slot) is granted; errors come back as results.
+
+    Connection failures are retried per `retry`, each time on whichever bridge the pool picks next.
+    """
+    retry = retry or RetryPolicy()
+    data: dict[str, Any] = {"feedback": text}
+    if codex_options:
+        data["codex_options"] = codex_options.model_dump(exclude_none=True)
+    async with slot as ticket:
+        bridge = None
+        attempt = 0
+        while True:
+            attempt += 1
+            bridge = bridges.acquire(avoid=bridge)
+            if bridge is None:
+                logger.error("no codex bridge available", extra={"index": index})
+                return {"index": index, "status": "error", "error": {"message": "no healthy codex bridge available"}}
+            started = time.monotonic()
+            status_code: int | None = None
+            retry_in: float | None = None
+            try:
+                response = await client.post(f"{bridge.url}/apply-feedback", json=data)
+                status_code = response.status_code
+                response.raise_for_status()
+            except httpx.HTTPStatusError as exc:
+                logger.error(
+                    "codex bridge error",
+                    extra={
+                        "index": index,
+                        "bridge": bridge.url,
+                        "status_code": exc.response.status_code,
+                        "body": exc.response.text,
+                    },
+                )
+                return {
+                    "index": index,
+                    "status": "error",
+                    "bridge": bridge.url,
+                    "attempts": attempt,
+                    "error": {
+                        "message": "codex bridge error",
+                        "status_code": exc.response.status_code,
+                        "body": exc.response.text,
+                    },
+                }
+            except RETRYABLE_ERRORS as exc:
+                if attempt < retry.attempts:
+                    retry_in = retry.backoff(attempt - 1)
+                    logger.warning(
+                        "codex bridge connection failed; retrying",
+                        extra={"index": index, "bridge": bridge.url, "attempt": attempt, "retry_in": retry_in},
+                    )
+                else:
+                    return _unreachable(index, bridge.url, attempt, exc)
+            except httpx.RequestError as exc:
+                return _unreachable(index, bridge.url, attempt, exc)
+            finally:
+                bridges.release(bridge, time.monotonic() - started, status_code)
+                if ticket is not None:
+                    ticket.fault = is_bridge_fault(status_code)
+            if retry_in is None:
+                return _bridge_result(index, bridge.url, attempt, response)
+            await asyncio.sleep(retry_in)
+
+
+__all__ = ["submit_feedback"]
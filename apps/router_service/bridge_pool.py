@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+import httpx
+
+from .retry import Hedger
+
+logger = logging.getLogger(__name__)
+
+CODEX_FAILURE_STATUS = 502
+
+
+def is_bridge_fault(status_code: int | None) -> bool:
+    """Whether a call outcome should count against the bridge's circuit breaker; a 502 is only a failed Codex run."""
+    return status_code is None or (status_code >= 500 and status_code != CODEX_FAILURE_STATUS)
+
+
+class Bridge:
+    """One host bridge with its load, observed latency, health, and circuit breaker state."""
+
+    def __init__(self, url: str, hedge_percentile: float = 0.0):
+        self.url = url
+        self.probe = Hedger(hedge_percentile)
+        self.in_flight = 0
+        self.handled = 0
+        self.faults = 0
+        self.latency: float | None = None
+        self.healthy = True
+        self.consecutive_faults = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def state(self, now: float) -> str:
+        if self.consecutive_faults and self.open_until:
+            return "open" if now < self.open_until else "half-open"
+        return "closed"
+
+    def available(self, now: float) -> bool:
+        """Healthy and closed, or half-open with its single trial call not yet taken."""
+        if not self.healthy:
+            return False
+        state = self.state(now)
+        return state == "closed" or (state == "half-open" and not self.trial_in_flight)
+
+    def load(self, fallback_latency: float) -> float:
+        return (self.in_flight + 1) * (self.latency if self.latency is not None else fallback_latency)
+
+
+class BridgePool:
+    """Spread Codex runs across host bridges, least-loaded first, skipping unhealthy or tripped ones."""
+
+    def __init__(self, urls: list[str], failure_threshold: int, cooldown: float, hedge_percentile: float = 0.0):
+        if not urls:
+            raise ValueError("at least one bridge url is required")
+        self.bridges = [Bridge(url, hedge_percentile) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    def acquire(self, avoid: Bridge | None = None) -> Bridge | None:
+        """The least-loaded available bridge, preferring any other than `avoid` (one a retry just failed on)."""
+        now = time.monotonic()
+        candidates = [bridge for bridge in self.bridges if bridge.available(now)]
+        if not candidates:
+            return None
+        if avoid is not None and len(candidates) > 1:
+            candidates = [bridge for bridge in candidates if bridge is not avoid]
+        observed = [bridge.latency for bridge in candidates if bridge.latency is not None]
+        fastest_observed = min(observed) if observed else 1.0
+        bridge = min(candidates, key=lambda candidate: candidate.load(fastest_observed))
+        if bridge.state(now) == "half-open":
+            bridge.trial_in_flight = True
+        bridge.in_flight += 1
+        return bridge
+
+    def release(self, bridge: Bridge, latency: float, status_code: int | None) -> None:
+        bridge.in_flight -= 1
+        bridge.handled += 1
+        bridge.trial_in_flight = False
+        if is_bridge_fault(status_code):
+            bridge.faults += 1
+            bridge.consecutive_faults += 1
+            if bridge.consecutive_faults >= self.failure_threshold:
+                bridge.open_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    "codex bridge circuit opened",
+                    extra={"bridge": bridge.url, "consecutive_faults": bridge.consecutive_faults},
+                )
+            return
+        bridge.consecutive_faults = 0
+        bridge.open_until = 0.0
+        bridge.latency = latency if bridge.latency is None else 0.8 * bridge.latency + 0.2 * latency
+
+    async def check(self, client: httpx.AsyncClient, timeout: float) -> None:
+        """Probe every bridge's `/health` and take failing ones out of rotation until they pass again."""
+
+        async def probe(bridge: Bridge) -> None:
+            try:
+                response = await bridge.probe.get(client, f"{bridge.url}/health", timeout=timeout)
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+            if healthy != bridge.healthy:
+                logger.warning("codex bridge health changed", extra={"bridge": bridge.url, "healthy": healthy})
+            bridge.healthy = healthy
+
+        await asyncio.gather(*(probe(bridge) for bridge in self.bridges))
+
+    async def monitor(self, client: httpx.AsyncClient, interval: float, timeout: float) -> None:
+        """Re-check every `interval`; bridges are trusted until the first check, one interval after startup."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.check(client, timeout)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": bridge.url,
+                "healthy": bridge.healthy,
+                "circuit": bridge.state(now),
+                "in_flight": bridge.in_flight,
+                "handled": bridge.handled,
+                "faults": bridge.faults,
+                "latency_ms": round(bridge.latency * 1000, 1) if bridge.latency is not None else None,
+                "hedged_probes": bridge.probe.hedged,
+            }
+            for bridge in self.bridges
+        ]
+
+
+__all__ = ["Bridge", "BridgePool", "is_bridge_fault"]
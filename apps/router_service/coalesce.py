@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from enhancement_core.codex.options import CodexOptions
+
+logger = logging.getLogger(__name__)
+
+Send = Callable[[int, str], Awaitable[dict[str, Any]]]
+
+
+def group_key(codex_options: CodexOptions | None) -> str:
+    """Items only merge with others that run under the same Codex options."""
+    return json.dumps(codex_options.model_dump(exclude_none=True), sort_keys=True) if codex_options else ""
+
+
+def merge_prompt(texts: list[str]) -> str:
+    """One Codex instruction carrying several feedback items as a numbered task list.
+
+    Continuation lines are indented so a multi-line item stays under its number.
+    """
+    tasks = []
+    for number, text in enumerate(texts, 1):
+        body = text.strip().replace("\n", "\n   ")
+        tasks.append(f"{number}. {body}")
+    return (
+        f"Apply the following {len(texts)} independent feedback items in order. "
+        "Keep each change scoped to its own item.\n\n" + "\n".join(tasks)
+    )
+
+
+@dataclass
+class _Item:
+    index: int
+    text: str
+    send: Send
+    future: asyncio.Future
+
+
+class Coalescer:
+    """Merge small feedback items that arrive close together into a single Codex run.
+
+    Items no longer than `max_chars` wait up to `window` seconds for company; items sharing a group key
+    (the same Codex options) are sent as one numbered prompt once the window closes or `max_items` have
+    gathered. Every merged item gets the shared run's result under its own index. Larger items go
+    straight through.
+    """
+
+    def __init__(self, window: float, max_chars: int, max_items: int):
+        self.window = window
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.runs = 0
+        self.merged = 0
+        self._groups: dict[str, list[_Item]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, key: str, index: int, text: str, send: Send) -> dict[str, Any]:
+        """Result of the run carrying item `index`; `send` delivers one (possibly merged) text to a bridge.
+
+        A caller that gives up does not cancel a merged run, which carries other callers' items too.
+        """
+        if len(text) > self.max_chars or self.max_items < 2:
+            return await send(index, text)
+        item = _Item(index, text, send, asyncio.get_running_loop().create_future())
+        group = self._groups.setdefault(key, [])
+        group.append(item)
+        if len(group) >= self.max_items:
+            self._flush(key)
+        elif len(group) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        return await asyncio.shield(item.future)
+
+    def _flush(self, key: str) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._groups.pop(key, [])
+        if items:
+            task = asyncio.create_task(self._run(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: list[_Item]) -> None:
+        lead = items[0]
+        text = lead.text if len(items) == 1 else merge_prompt([item.text for item in items])
+        if len(items) > 1:
+            logger.info("coalesced feedback items", extra={"indexes": [item.index for item in items]})
+        try:
+            result = await lead.send(lead.index, text)
+        except asyncio.CancelledError:
+            for item in items:
+                item.future.cancel()
+            raise
+        except Exception as exc:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        self.runs += 1
+        if len(items) == 1:
+            if not lead.future.done():
+                lead.future.set_result(result)
+            return
+        self.merged += len(items)
+        for task, item in enumerate(items, 1):
+            if not item.future.done():
+                item.future.set_result(
+                    {**result, "index": item.index, "coalesced": {"items": len(items), "task": task}}
+                )
+
+    async def close(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        for items in self._groups.values():
+            for item in items:
+                item.future.cancel()
+        self._timers.clear()
+        self._groups.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "enabled": self.max_items > 1,
+            "window_seconds": self.window,
+            "max_chars": self.max_chars,
+            "max_items": self.max_items,
+            "waiting": sum(len(items) for items in self._groups.values()),
+            "runs": self.runs,
+            "merged_items": self.merged,
+        }
+
+
+__all__ = ["Coalescer", "group_key", "merge_prompt"]
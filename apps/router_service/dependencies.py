@@ -1,14 +1,33 @@
+import asyncio
+import contextlib
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from functools import lru_cache
+from typing import Any
 
 import httpx
+from enhancement_core.codex.options import CodexOptions
 from enhancement_core.config import RouterSettings
 from fastapi import FastAPI
 
+from .aimd import AimdLimit
+from .bridge import submit_feedback
+from .bridge_pool import BridgePool
+from .coalesce import Coalescer, group_key
 from .config import RouterServiceConfig, get_config
+from .idempotency import IdempotencyStore
+from .jobs import Job, JobQueue, JobStore
+from .retry import RetryPolicy
+from .scheduler import Scheduler
 
 _client: httpx.AsyncClient | None = None
+_job_queue: JobQueue | None = None
+_scheduler: Scheduler | None = None
+_bridge_pool: BridgePool | None = None
+_monitor: asyncio.Task | None = None
+_idempotency: IdempotencyStore | None = None
+_coalescer: Coalescer | None = None
+_retry: RetryPolicy | None = None
 
 
 @lru_cache
@@ -17,14 +36,83 @@ def get_router_settings(config: RouterServiceConfig | None = None) -> RouterSett
     return cfg.settings
 
 
+def job_handler(
+    client: httpx.AsyncClient,
+    bridges: BridgePool,
+    scheduler: Scheduler,
+    coalescer: Coalescer | None = None,
+    retry: RetryPolicy | None = None,
+):
+    async def run(job: Job) -> dict[str, Any]:
+        options = CodexOptions(**job.codex_options) if job.codex_options else None
+
+        async def send(index: int, text: str) -> dict[str, Any]:
+            slot = scheduler.slot(job.batch_id, "batch")
+            return await submit_feedback(index, text, options, client, bridges, slot, retry)
+
+        if coalescer is None:
+            return await send(job.index, job.feedback)
+        return await coalescer.submit(group_key(options), job.index, job.feedback, send)
+
+    return run
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    global _client
+    global _client, _job_queue, _scheduler, _bridge_pool, _monitor, _idempotency, _coalescer, _retry
     settings = get_router_settings()
     _client = httpx.AsyncClient(timeout=settings.request_timeout)
+    adaptive = None
+    if settings.adaptive_concurrency:
+        adaptive = AimdLimit(
+            settings.max_concurrency,
+            settings.adaptive_min,
+            settings.adaptive_max,
+            settings.adaptive_latency_target,
+            settings.adaptive_backoff,
+        )
+    _scheduler = Scheduler(settings.max_concurrency, settings.max_queue, settings.interactive_weight, adaptive)
+    _bridge_pool = BridgePool(
+        settings.bridges(),
+        settings.bridge_failure_threshold,
+        settings.bridge_cooldown,
+        settings.bridge_hedge_percentile,
+    )
+    _retry = RetryPolicy(settings.bridge_attempts, settings.bridge_retry_base, settings.bridge_retry_max)
+    _idempotency = IdempotencyStore(settings.idempotency_ttl, settings.idempotency_max_keys)
+    _coalescer = Coalescer(
+        settings.coalesce_window,
+        settings.coalesce_max_chars,
+        settings.coalesce_max_items if settings.coalesce else 1,
+    )
+    _monitor = asyncio.create_task(
+        _bridge_pool.monitor(_client, settings.bridge_health_interval, min(5.0, settings.request_timeout))
+    )
+    _job_queue = JobQueue(
+        JobStore(settings.job_db_path),
+        job_handler(_client, _bridge_pool, _scheduler, _coalescer, _retry),
+        settings.adaptive_max if adaptive else settings.max_concurrency,
+    )
+    _job_queue.start()
     try:
         yield
     finally:
+        if _job_queue is not None:
+            await _job_queue.stop()
+            _job_queue.store.close()
+            _job_queue = None
+        if _coalescer is not None:
+            await _coalescer.close()
+            _coalescer = None
+        if _monitor is not None:
+            _monitor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await _monitor
+            _monitor = None
+        _scheduler = None
+        _bridge_pool = None
+        _idempotency = None
+        _retry = None
         if _client is not None:
             await _client.aclose()
             _client = None
@@ -36,4 +124,51 @@ def get_http_client() -> httpx.AsyncClient:
     return _client
 
 
-__all__ = ["get_http_client", "get_router_settings", "lifespan"]
+def get_job_queue() -> JobQueue:
+    if _job_queue is None:
+        raise RuntimeError("job queue not initialized")
+    return _job_queue
+
+
+def get_bridge_pool() -> BridgePool:
+    if _bridge_pool is None:
+        raise RuntimeError("bridge pool not initialized")
+    return _bridge_pool
+
+
+def get_scheduler() -> Scheduler:
+    if _scheduler is None:
+        raise RuntimeError("scheduler not initialized")
+    return _scheduler
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    if _idempotency is None:
+        raise RuntimeError("idempotency store not initialized")
+    return _idempotency
+
+
+def get_coalescer() -> Coalescer:
+    if _coalescer is None:
+        raise RuntimeError("coalescer not initialized")
+    return _coalescer
+
+
+def get_retry_policy() -> RetryPolicy:
+    if _retry is None:
+        raise RuntimeError("retry policy not initialized")
+    return _retry
+
+
+__all__ = [
+    "get_bridge_pool",
+    "get_coalescer",
+    "get_http_client",
+    "get_idempotency_store",
+    "get_job_queue",
+    "get_retry_policy",
+    "get_router_settings",
+    "get_scheduler",
+    "job_handler",
+    "lifespan",
+]
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from enhancement_core.codex.options import CodexOptions
+
+
+def fingerprint(text: str, codex_options: CodexOptions | None) -> str:
+    """Identity of one feedback item: whitespace-normalized text plus the Codex options it runs with."""
+    options = codex_options.model_dump(exclude_none=True) if codex_options else {}
+    material = json.dumps({"feedback": " ".join(text.split()), "codex_options": options}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key came back with different feedback than it was first used for."""
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    future: asyncio.Future
+    expires_at: float = float("inf")
+
+
+class IdempotencyStore:
+    """Recent bridge results by idempotency key, so a retried item is answered without running Codex again.
+
+    Only successful results are kept, for `ttl` seconds; a failed run drops its key so the caller can retry
+    it. A retry that arrives while the first run is still in flight waits for that run instead of starting
+    another one, and takes over if the first caller gives up.
+    """
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.replayed = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+    def _prune(self) -> None:
+        """Drop expired keys, then the oldest finished ones past `max_keys`; in-flight runs are never evicted."""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_keys:
+            evictable = next((key for key, entry in self._entries.items() if entry.future.done()), None)
+            if evictable is None:
+                return
+            del self._entries[evictable]
+
+    async def run(self, key: str, digest: str, call: Callable[[], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        while True:
+            self._prune()
+            entry = self._entries.get(key)
+            if entry is None:
+                break
+            if entry.fingerprint != digest:
+                raise IdempotencyConflict(f"idempotency key {key} was already used for different feedback")
+            try:
+                result = await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if entry.future.cancelled():
+                    continue
+                raise
+            self.replayed += 1
+            return {**result, "replayed": True}
+        entry = _Entry(digest, asyncio.get_running_loop().create_future())
+        self._entries[key] = entry
+        try:
+            result = await call()
+        except BaseException:
+            self._entries.pop(key, None)
+            entry.future.cancel()
+            raise
+        entry.future.set_result(result)
+        if result.get("status") == "ok":
+            entry.expires_at = time.monotonic() + self.ttl
+        else:
+            self._entries.pop(key, None)
+        return result
+
+    def snapshot(self) -> dict[str, Any]:
+        self._prune()
+        return {"keys": len(self._entries), "ttl_seconds": self.ttl, "replayed": self.replayed}
+
+
+__all__ = ["IdempotencyConflict", "IdempotencyStore", "fingerprint"]
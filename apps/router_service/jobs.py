@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from .idempotency import IdempotencyConflict
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_JOB_STATUSES = ("succeeded", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    feedback TEXT NOT NULL,
+    codex_options TEXT,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    idempotency_key TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, batch_id);
+"""
+_ADDED_COLUMNS = ("idempotency_key", "fingerprint")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    job_id: str
+    batch_id: str
+    index: int
+    status: str
+    feedback: str
+    codex_options: dict[str, Any] | None
+    result: dict[str, Any] | None
+    created_at: str
+    started_at: str | None
+    finished_at: str | None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            job_id=row["id"],
+            batch_id=row["batch_id"],
+            index=row["position"],
+            status=row["status"],
+            feedback=row["feedback"],
+            codex_options=json.loads(row["codex_options"]) if row["codex_options"] else None,
+            result=json.loads(row["result"]) if row["result"] else None,
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_JOB_STATUSES
+
+    def describe(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class JobStore:
+    """Router jobs in a local SQLite file, so queued work outlives the process that accepted it."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        if str(path) != ":memory:":
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in _ADDED_COLUMNS:
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_idempotency_key ON jobs (idempotency_key)")
+
+    def _keyed_job_id(self, key: str, digest: str) -> str | None:
+        row = self._conn.execute(
+            "SELECT id, fingerprint FROM jobs WHERE idempotency_key = ? AND status != 'failed' "
+            "ORDER BY rowid DESC LIMIT 1",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        if row["fingerprint"] != digest:
+            raise IdempotencyConflict(f"idempotency key {key} was already used for different feedback")
+        return row["id"]
+
+    def enqueue(
+        self,
+        entries: list[tuple[str, dict[str, Any] | None]],
+        keys: list[tuple[str, str] | None] | None = None,
+    ) -> list[Job]:
+        """Queue `entries` as one batch and return a job per entry.
+
+        `keys` gives entries an (idempotency key, fingerprint). An entry whose key already names a job that has
+        not failed gets that job back instead of a new one; a key reused for different feedback raises
+        `IdempotencyConflict` and queues nothing.
+        """
+        batch_id = uuid.uuid4().hex
+        created_at = _now()
+        job_ids: list[str] = []
+        rows: list[tuple[Any, ...]] = []
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            claimed: dict[str, str] = {}
+            for index, (text, options) in enumerate(entries):
+                key, digest = (keys[index] if keys else None) or (None, None)
+                job_id = (claimed.get(key) or self._keyed_job_id(key, digest)) if key and digest else None
+                if job_id is None:
+                    job_id = uuid.uuid4().hex
+                    options_json = json.dumps(options) if options else None
+                    rows.append((job_id, batch_id, index, text, options_json, created_at, key, digest))
+                if key:
+                    claimed[key] = job_id
+                job_ids.append(job_id)
+            self._conn.executemany(
+                "INSERT INTO jobs (id, batch_id, position, status, feedback, codex_options, created_at, "
+                "idempotency_key, fingerprint) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return [job for job in (self.get(job_id) for job_id in job_ids) if job is not None]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(self) -> Job | None:
+        """Mark the next queued job as running and return it.
+
+        Jobs come from the batch with the fewest running jobs first, oldest first within a batch, so a
+        large batch shares the router with batches submitted after it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ("
+                "SELECT queued.id FROM jobs AS queued WHERE queued.status = 'queued' ORDER BY ("
+                "SELECT COUNT(*) FROM jobs AS running "
+                "WHERE running.batch_id = queued.batch_id AND running.status = 'running'"
+                "), queued.rowid LIMIT 1) RETURNING *",
+                (_now(),),
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def finish(self, job_id: str, status: str, result: dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result), _now(), job_id),
+            )
+
+    def recover(self) -> int:
+        """Fail jobs a previous process left running; queued jobs are picked up again as they are.
+
+        The bridge may already have applied an interrupted run, so it is not safe to replay it.
+        """
+        result = json.dumps({"status": "error", "error": {"message": "router restarted while the job was running"}})
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', result = ?, finished_at = ? WHERE status = 'running'",
+                (result, _now()),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+JobHandler = Callable[[Job], Awaitable[dict[str, Any]]]
+
+
+class JobQueue:
+    """Dispatch stored jobs to a handler with bounded concurrency and let callers wait for status changes."""
+
+    def __init__(self, store: JobStore, handler: JobHandler, concurrency: int):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.interrupted = store.recover()
+        if self.interrupted:
+            logger.warning("failed jobs interrupted by a restart", extra={"jobs": self.interrupted})
+        self._running: set[asyncio.Task] = set()
+        self._dispatcher: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    def start(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wake = asyncio.Event()
+            self._changed = asyncio.Condition()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._dispatcher, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+
+    def submit(
+        self,
+        entries: list[tuple[str, dict[str, Any] | None]],
+        keys: list[tuple[str, str] | None] | None = None,
+    ) -> list[Job]:
+        jobs = self.store.enqueue(entries, keys)
+        self.start()
+        self._wake.set()
+        return jobs
+
+    async def wait(self, job_id: str, timeout: float, seen_status: str | None = None) -> Job | None:
+        """Return the job once its status differs from `seen_status` (or is final), or when `timeout` passes."""
+        self.start()
+        deadline = time.monotonic() + timeout
+        async with self._changed:
+            while True:
+                job = self.store.get(job_id)
+                if job is None or job.done or job.status != seen_status:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return self.store.get(job_id)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wake.clear()
+            while len(self._running) < self.concurrency:
+                job = self.store.claim()
+                if job is None:
+                    break
+                task = asyncio.create_task(self._run(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            if self._running:
+                await self._notify()
+            await self._wake.wait()
+
+    async def _run(self, job: Job) -> None:
+        """Run one job to a final status, even if the handler crashes, then free its slot and wake the dispatcher.
+
+        The slot is freed here rather than left to the done callback, which would only run after the dispatcher looked.
+        """
+        try:
+            result = await self.handler(job)
+        except Exception as exc:
+            logger.exception("router job crashed", extra={"job_id": job.job_id})
+            result = {"index": job.index, "status": "error", "error": {"message": str(exc)}}
+        self.store.finish(job.job_id, "succeeded" if result.get("status") == "ok" else "failed", result)
+        logger.info("router job finished", extra={"job_id": job.job_id, "status": result.get("status")})
+        self._running.discard(asyncio.current_task())
+        await self._notify()
+        self._wake.set()
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"running": len(self._running), "concurrency": self.concurrency, "jobs": self.store.counts()}
+
+
+__all__ = ["Job", "JobQueue", "JobStore", "TERMINAL_JOB_STATUSES"]
@@ -0,0 +1,83 @@
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass
+class RetryPolicy:
+    """How many times to try a bridge call and how long to back off between connection failures.
+
+    Only `RETRYABLE_ERRORS`, which happen before the request reaches the bridge, are retried. Once the
+    request was sent (read timeouts, resets mid-response) Codex may already be running.
+    """
+
+    attempts: int = 1
+    base_delay: float = 0.5
+    max_delay: float = 5.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay, so routers that lost the same bridge do not reconnect in lockstep."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class Hedger:
+    """Send a backup copy of a read-only request when the first one runs slower than most recent ones.
+
+    The hedge fires once the first request has taken longer than the `percentile` of the last `window`
+    latencies; whichever copy answers first wins and the other is cancelled. If every copy fails, the
+    first copy's error is raised. Until `min_samples` latencies are known, requests go out once.
+    """
+
+    def __init__(self, percentile: float, window: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.hedged = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def delay(self) -> float | None:
+        if not self.percentile or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    async def get(self, client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+        started = time.monotonic()
+        delay = self.delay()
+        first = asyncio.ensure_future(client.get(url, **kwargs))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedged += 1
+                pending.add(asyncio.ensure_future(client.get(url, **kwargs)))
+            while True:
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+        if winner is None:
+            return first.result()
+        response = winner.result()
+        self._latencies.append(time.monotonic() - started)
+        return response
+
+    def snapshot(self) -> dict[str, Any]:
+        delay = self.delay()
+        return {
+            "percentile": self.percentile,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "hedged": self.hedged,
+        }
+
+
+__all__ = ["Hedger", "RETRYABLE_ERRORS", "RetryPolicy"]
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from .aimd import AimdLimit
+
+PRIORITIES = ("interactive", "batch")
+
+
+class SchedulerFull(RuntimeError):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class SlotTicket:
+    """Handed to the slot holder so it can report whether its bridge call faulted."""
+
+    fault: bool | None = None
+
+
+class _Waiters:
+    """Waiters of one priority class, grouped by caller and served round-robin between callers."""
+
+    def __init__(self) -> None:
+        self.callers: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self.count = 0
+
+    def push(self, caller: str, waiter: asyncio.Future) -> None:
+        self.callers.setdefault(caller, deque()).append(waiter)
+        self.count += 1
+
+    def pop(self) -> asyncio.Future | None:
+        while self.callers:
+            caller, queue = next(iter(self.callers.items()))
+            waiter = queue.popleft()
+            self.count -= 1
+            if queue:
+                self.callers.move_to_end(caller)
+            else:
+                del self.callers[caller]
+            if not waiter.done():
+                return waiter
+        return None
+
+    def remove(self, caller: str, waiter: asyncio.Future) -> None:
+        queue = self.callers.get(caller)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.count -= 1
+        if not queue:
+            del self.callers[caller]
+
+
+class _WaitStats:
+    def __init__(self) -> None:
+        self.granted = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, waited: float) -> None:
+        self.granted += 1
+        self.total += waited
+        self.max = max(self.max, waited)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "granted": self.granted,
+            "avg_wait_ms": round(self.total / self.granted * 1000, 1) if self.granted else 0.0,
+            "max_wait_ms": round(self.max * 1000, 1),
+        }
+
+
+class Scheduler:
+    """Process-wide admission control for bridge calls.
+
+    At most `concurrency` calls run at once across every request and job; with an `AimdLimit`
+    that number follows the limit instead of staying fixed. Waiting calls are ordered by priority
+    class (interactive pipelines waiting on the result, then batch jobs and crawls), then round-robin
+    across callers. Interactive waiters win `interactive_weight` grants in
+    a row before a waiting batch call gets one, so batch work keeps moving under steady
+    interactive load.
+    """
+
+    def __init__(
+        self, concurrency: int, max_queue: int, interactive_weight: int = 4, adaptive: AimdLimit | None = None
+    ):
+        self._concurrency = concurrency
+        self.adaptive = adaptive
+        self.max_queue = max_queue
+        self.interactive_weight = interactive_weight
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters = {priority: _Waiters() for priority in PRIORITIES}
+        self._stats = {priority: _WaitStats() for priority in PRIORITIES}
+        self._interactive_streak = 0
+        self._avg_hold = 0.0
+
+    @property
+    def concurrency(self) -> int:
+        return self.adaptive.current if self.adaptive is not None else self._concurrency
+
+    @property
+    def queued(self) -> int:
+        return sum(waiters.count for waiters in self._waiters.values())
+
+    def retry_after(self) -> float:
+        """Seconds until a slot is likely free, from the moving average of how long calls hold one."""
+        if not self._avg_hold:
+            return 1.0
+        return max(1.0, math.ceil(self._avg_hold * (self.queued + 1) / self.concurrency))
+
+    def admit(self, count: int) -> None:
+        """Accept `count` new calls or raise `SchedulerFull` when they would overflow the queue."""
+        backlog = self.queued + max(0, count - (self.concurrency - self.in_flight))
+        if backlog > self.max_queue:
+            self.rejected += 1
+            raise SchedulerFull(
+                f"router queue is full ({self.queued} waiting, limit {self.max_queue})", self.retry_after()
+            )
+        self.admitted += 1
+
+    @asynccontextmanager
+    async def slot(self, caller: str, priority: str = "interactive") -> AsyncIterator[SlotTicket]:
+        if priority not in self._waiters:
+            raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+        started = time.monotonic()
+        await self._acquire(caller, priority)
+        self._stats[priority].observe(time.monotonic() - started)
+        held = time.monotonic()
+        ticket = SlotTicket()
+        try:
+            yield ticket
+        finally:
+            elapsed = time.monotonic() - held
+            self._avg_hold = elapsed if not self._avg_hold else 0.8 * self._avg_hold + 0.2 * elapsed
+            if self.adaptive is not None and ticket.fault is not None:
+                self.adaptive.observe(held, elapsed, ticket.fault, self.in_flight)
+            self._release()
+
+    async def _acquire(self, caller: str, priority: str) -> None:
+        """Wait for a slot; one granted just as the caller is cancelled passes to the next waiter."""
+        if self.in_flight < self.concurrency and not self.queued:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].push(caller, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self._waiters[priority].remove(caller, waiter)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._grant()
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        """Prefer interactive waiters, counting the streak only while batch work is waiting behind it."""
+        interactive, batch = self._waiters["interactive"], self._waiters["batch"]
+        if interactive.count and (not batch.count or self._interactive_streak < self.interactive_weight):
+            self._interactive_streak = self._interactive_streak + 1 if batch.count else 0
+            return interactive.pop()
+        self._interactive_streak = 0
+        return batch.pop() or interactive.pop()
+
+    def _grant(self) -> None:
+        while self.in_flight < self.concurrency and self.queued:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": {priority: waiters.count for priority, waiters in self._waiters.items()},
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait": {priority: stats.snapshot() for priority, stats in self._stats.items()},
+            "adaptive": self.adaptive.snapshot() if self.adaptive is not None else None,
+        }
+
+
+__all__ = ["PRIORITIES", "Scheduler", "SchedulerFull", "SlotTicket"]
@@ -3,11 +3,12 @@ import shutil
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import urljoin, urlparse
 
 from enhancement_core.config import ScreenshotSettings
 from enhancement_core.logging import configure_logging, request_context
 from enhancement_core.screenshots.capture import ScreenshotError
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
 
 from .dependencies import ScreenshotCaptureRunner, get_capture_runner, get_settings, lifespan
 
@@ -43,6 +44,19 @@ def _cleanup(path: Path | None) -> None:
         pass
 
 
+def _route_url(settings: ScreenshotSettings, route: str | None) -> str | None:
+    """Resolve a crawl route against the configured target; other origins are rejected."""
+    if not route:
+        return None
+    url = urljoin(settings.target_url, route)
+    target, resolved = urlparse(settings.target_url), urlparse(url)
+    if (resolved.scheme, resolved.netloc) != (target.scheme, target.netloc):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "path must stay on the configured target"}
+        )
+    return url
+
+
 def _serialize(path: Path) -> dict:
     timestamp = datetime.now(timezone.utc).isoformat()
     payload = path.read_bytes()
@@ -58,11 +72,22 @@ def _serialize(path: Path) -> dict:
 
 
 @app.post("/capture", summary="Capture and stitch the configured URL")
-async def capture(runner: ScreenshotCaptureRunner = Depends(get_capture_runner)):
+async def capture(
+    include_dom: bool = Query(False, description="Also return a DOM/accessibility snapshot for local checks"),
+    route: str | None = Query(None, alias="path", description="Capture this path of the target instead of its root"),
+    runner: ScreenshotCaptureRunner = Depends(get_capture_runner),
+    settings: ScreenshotSettings = Depends(get_settings),
+):
+    target_url = _route_url(settings, route)
     path: Path | None = None
     try:
-        path = await runner.capture()
-        return _serialize(path)
+        path = await runner.capture(target_url)
+        payload = _serialize(path)
+        if target_url:
+            payload["url"] = target_url
+        if include_dom:
+            payload["dom_snapshot"] = await runner.snapshot(target_url)
+        return payload
     except ScreenshotError as exc:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"message": str(exc)}) from exc
     finally:
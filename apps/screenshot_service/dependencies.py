@@ -6,29 +6,41 @@ from functools import lru_cache
 from enhancement_core.config import ScreenshotSettings
 from enhancement_core.screenshots.capture import capture_full_page
 from fastapi import FastAPI
-from playwright.async_api import Browser, async_playwright
+from playwright.async_api import Browser, Playwright, async_playwright
 
 from .config import get_config
+from .dom_snapshot import collect_dom_snapshot
 
 
 class ScreenshotCaptureRunner:
     def __init__(self, settings: ScreenshotSettings):
         self.settings = settings
-        self._playwright = None
+        self._playwright: Playwright | None = None
         self._browser: Browser | None = None
         self._lock = asyncio.Lock()
 
-    async def start(self):
+    async def start(self) -> Browser:
         if self._playwright is None:
             self._playwright = await async_playwright().start()
         if self._browser is None:
             self._browser = await self._playwright.chromium.launch(headless=True)
+        return self._browser
 
-    async def capture(self):
+    def _settings_for(self, target_url: str | None) -> ScreenshotSettings:
+        if target_url is None or target_url == self.settings.target_url:
+            return self.settings
+        return self.settings.model_copy(update={"target_url": target_url})
+
+    async def capture(self, target_url: str | None = None):
         async with self._lock:
             if self._browser is None:
                 await self.start()
-            return await capture_full_page(self.settings, browser=self._browser)
+            return await capture_full_page(self._settings_for(target_url), browser=self._browser)
+
+    async def snapshot(self, target_url: str | None = None) -> dict:
+        async with self._lock:
+            browser = await self.start()
+            return await collect_dom_snapshot(browser, self._settings_for(target_url))
 
     async def stop(self):
         if self._browser is not None:
@@ -0,0 +1,95 @@
+import logging
+from typing import Any
+
+from enhancement_core.config import ScreenshotSettings
+from enhancement_core.screenshots.capture import ScreenshotError
+from playwright.async_api import Browser
+from playwright.async_api import Error as PlaywrightError
+
+logger = logging.getLogger(__name__)
+
+_COLLECT_SCRIPT = """
+(maxElements) => {
+  const transparent = (color) => !color || color === "transparent" || /rgba\\(.*,\\s*0\\)$/.test(color);
+  const background = (element) => {
+    for (let node = element; node; node = node.parentElement) {
+      const color = getComputedStyle(node).backgroundColor;
+      if (!transparent(color)) return color;
+    }
+    return "rgb(255, 255, 255)";
+  };
+  const selector = (element) => {
+    if (element.id) return `${element.tagName.toLowerCase()}#${element.id}`;
+    const name = element.tagName.toLowerCase();
+    const klass = typeof element.className === "string" ? element.className.trim().split(/\\s+/)[0] : "";
+    const parent = element.parentElement;
+    const siblings = parent ? Array.from(parent.children).filter((child) => child.tagName === element.tagName) : [];
+    const index = siblings.indexOf(element) + 1 || 1;
+    return `${name}${klass ? "." + klass : ""}:nth-of-type(${index})`;
+  };
+  const elements = [];
+  let truncated = false;
+  for (const element of document.body ? document.body.querySelectorAll("*") : []) {
+    const style = getComputedStyle(element);
+    if (style.display === "none" || style.visibility === "hidden" || parseFloat(style.opacity) === 0) continue;
+    const rect = element.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0) continue;
+    const isImage = element.tagName === "IMG";
+    const text = Array.from(element.childNodes)
+      .filter((node) => node.nodeType === Node.TEXT_NODE)
+      .map((node) => node.textContent)
+      .join(" ")
+      .trim();
+    if (!isImage && !text) continue;
+    if (elements.length >= maxElements) {
+      truncated = true;
+      break;
+    }
+    const item = {
+      selector: selector(element),
+      tag: element.tagName.toLowerCase(),
+      rect: [rect.left + scrollX, rect.top + scrollY, rect.width, rect.height],
+      role: element.getAttribute("role"),
+      aria_label: element.getAttribute("aria-label"),
+    };
+    if (isImage) {
+      item.alt = element.getAttribute("alt");
+      item.natural = [element.naturalWidth, element.naturalHeight];
+    } else {
+      item.text = text.slice(0, 80);
+      item.color = style.color;
+      item.background = background(element);
+      item.font_size = parseFloat(style.fontSize);
+      item.font_weight = parseInt(style.fontWeight, 10) || 400;
+    }
+    elements.push(item);
+  }
+  return {
+    url: location.href,
+    viewport: { width: innerWidth, height: innerHeight },
+    device_pixel_ratio: devicePixelRatio,
+    elements,
+    truncated,
+  };
+}
+"""
+
+
+async def collect_dom_snapshot(browser: Browser, settings: ScreenshotSettings) -> dict[str, Any]:
+    """Visible text and images with only the computed styles the local pre-screen needs, a few kilobytes per page."""
+    page = await browser.new_page(viewport={"width": settings.viewport_width, "height": settings.viewport_height})
+    try:
+        await page.goto(settings.target_url, wait_until="networkidle", timeout=settings.nav_timeout_ms)
+        snapshot = await page.evaluate(_COLLECT_SCRIPT, settings.dom_snapshot_max_elements)
+    except PlaywrightError as exc:
+        raise ScreenshotError(f"unable to collect DOM snapshot: {exc}") from exc
+    finally:
+        await page.close()
+    logger.info(
+        "collected dom snapshot",
+        extra={"elements": len(snapshot.get("elements", [])), "truncated": snapshot.get("truncated")},
+    )
+    return snapshot
+
+
+__all__ = ["collect_dom_snapshot"]
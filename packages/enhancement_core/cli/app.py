@@ -1,5 +1,6 @@
 import io
 import json
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -15,12 +16,17 @@ from enhancement_core.config_store import (
     PipelineOverridesStore,
 )
 from enhancement_core.logging import configure_logging
+from enhancement_core.orchestration.crawl import collect_crawl, enqueue_crawl
 from enhancement_core.orchestration.pipeline import PipelineError, run_pipeline, run_pipeline_iterations
 from pydantic import ValidationError
 
 app = typer.Typer(add_completion=False, help="Toolkit orchestration utilities")
 pipeline_app = typer.Typer(help="Full pipeline commands")
 app.add_typer(pipeline_app, name="pipeline")
+crawl_app = typer.Typer(help="Offline batch feedback for many routes")
+app.add_typer(crawl_app, name="crawl")
+runs_app = typer.Typer(help="Codex runs on the host bridge")
+app.add_typer(runs_app, name="runs")
 _overrides_store = PipelineOverridesStore()
 
 
@@ -136,6 +142,11 @@ def pipeline_run(
     model_reasoning_effort: Optional[str] = typer.Option(
         None, "--model-reasoning-effort", help="Override the Codex reasoning effort for this run (low, medium, high)"
     ),
+    chain: Optional[bool] = typer.Option(
+        None,
+        "--chain/--no-chain",
+        help="Chain feedback requests across iterations with previous_response_id",
+    ),
 ) -> None:
     _ensure_logging()
     env_file = ctx.obj.get("env_file")
@@ -178,6 +189,7 @@ def pipeline_run(
                     demo=effective_demo,
                     artifacts_dir=effective_artifacts_dir,
                     codex_options=codex_options,
+                    chain=chain,
                 )
     except (PipelineError, ValueError) as exc:
         typer.echo(f"pipeline failed: {exc}", err=True)
@@ -234,11 +246,89 @@ def sample_feedback(
         typer.echo(json.dumps(body, indent=2))
 
 
+@crawl_app.command("submit")
+def crawl_submit(
+    ctx: typer.Context,
+    routes: list[str] = typer.Option(..., "--route", "-r", help="Path of the target to capture; repeat per route"),
+    artifacts_dir: Optional[Path] = typer.Option(
+        None, "--artifacts-dir", help="Override the root directory for crawl artifacts"
+    ),
+) -> None:
+    _ensure_logging()
+    try:
+        settings = _get_pipeline_settings(ctx.obj.get("env_file"))
+    except ValidationError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+    try:
+        with redirect_stdout(_StderrTee()):
+            result = enqueue_crawl(routes, settings, artifacts_dir=artifacts_dir)
+    except (PipelineError, ValueError) as exc:
+        typer.echo(f"crawl failed: {exc}", err=True)
+        raise typer.Exit(code=1) from exc
+    typer.echo(json.dumps(result))
+
+
+@crawl_app.command("collect")
+def crawl_collect(
+    ctx: typer.Context,
+    crawl_dir: Path = typer.Argument(..., help="Crawl directory printed by `crawl submit`"),
+    wait: bool = typer.Option(False, "--wait/--no-wait", help="Poll until the batch finishes"),
+) -> None:
+    _ensure_logging()
+    try:
+        settings = _get_pipeline_settings(ctx.obj.get("env_file"))
+    except ValidationError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+    try:
+        with redirect_stdout(_StderrTee()):
+            result = collect_crawl(crawl_dir, settings, wait=wait)
+    except PipelineError as exc:
+        typer.echo(f"crawl collection failed: {exc}", err=True)
+        raise typer.Exit(code=1) from exc
+    typer.echo(json.dumps(result))
+
+
+@runs_app.command("tail")
+def runs_tail(
+    run_id: str = typer.Argument(..., help="Run id: the x-request-id sent with the run, or one listed by GET /runs"),
+    bridge_url: str = typer.Option("http://localhost:5600", "--bridge-url", help="Base URL of the host bridge"),
+    stream: str = typer.Option("stdout", "--stream", help="Which output to show: stdout or stderr"),
+    follow: bool = typer.Option(True, "--follow/--no-follow", help="Keep polling until the run finishes"),
+    interval: float = typer.Option(1.0, "--interval", min=0.1, help="Seconds between polls while following"),
+) -> None:
+    _ensure_logging()
+    url = f"{bridge_url.rstrip('/')}/runs/{run_id}/log"
+    offset = 0
+    with httpx.Client(timeout=30.0) as client:
+        while True:
+            try:
+                response = client.get(url, params={"offset": offset, "stream": stream})
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                typer.echo(f"log request failed: {exc}", err=True)
+                raise typer.Exit(code=1) from exc
+            chunk = response.json()
+            offset = chunk["next_offset"]
+            if chunk["data"]:
+                typer.echo(chunk["data"], nl=False)
+                continue
+            if not follow or not chunk["running"]:
+                return
+            time.sleep(interval)
+
+
 __all__ = [
     "app",
+    "crawl_app",
+    "crawl_collect",
+    "crawl_submit",
     "pipeline_app",
     "doctor",
     "pipeline_run",
+    "runs_app",
+    "runs_tail",
     "sample_feedback",
     "_get_pipeline_settings",
 ]
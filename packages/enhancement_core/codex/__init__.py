@@ -1,4 +1,5 @@
 from enhancement_core.codex.options import CodexOptions
 from enhancement_core.codex.runner import CodexRunner, CodexRunnerError
+from enhancement_core.codex.worktrees import MergeOutcome, WorktreeError, WorktreePool
 
-__all__ = ["CodexRunner", "CodexRunnerError", "CodexOptions"]
+__all__ = ["CodexRunner", "CodexRunnerError", "CodexOptions", "MergeOutcome", "WorktreeError", "WorktreePool"]
@@ -0,0 +1,128 @@
+import json
+import time
+from typing import Any
+
+_ITEM_PHASES = {
+    "reasoning": "planning",
+    "todo_list": "planning",
+    "command_execution": "tools",
+    "mcp_tool_call": "tools",
+    "web_search": "tools",
+    "file_change": "editing",
+    "agent_message": "responding",
+}
+_TOOL_ITEMS = {"command_execution", "mcp_tool_call", "web_search"}
+_TOKEN_FIELDS = ("input_tokens", "cached_input_tokens", "output_tokens", "reasoning_output_tokens")
+_MAX_TOOL_CALLS = 200
+_MAX_ERRORS = 20
+
+
+class EventTracker:
+    """Metrics gathered from the JSONL event stream `codex exec --json` prints on stdout.
+
+    The time between two events is counted towards the phase of the later one: "planning" before a tool
+    starts or while reasoning, "tools" while a command or tool call runs, "editing" for file changes and
+    "responding" for the final message. Time before the first event is "startup". Lines that are not
+    JSON events are ignored.
+    """
+
+    def __init__(self, started: float | None = None):
+        self.started = time.monotonic() if started is None else started
+        self.events = 0
+        self.phases: dict[str, float] = {}
+        self.tool_calls: list[dict[str, Any]] = []
+        self.tool_call_count = 0
+        self.files: list[str] = []
+        self.tokens: dict[str, int] = {}
+        self.errors: list[str] = []
+        self.final_message: str | None = None
+        self._last = self.started
+        self._item_started: dict[str, float] = {}
+
+    def feed(self, line: bytes, now: float | None = None) -> None:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(event, dict) or not isinstance(event.get("type"), str):
+            return
+        now = time.monotonic() if now is None else now
+        self.events += 1
+        kind = event["type"]
+        raw_item = event.get("item")
+        item: dict[str, Any] = raw_item if isinstance(raw_item, dict) else {}
+        if self.events == 1:
+            phase = "startup"
+        elif kind == "item.started":
+            phase = "planning"
+        elif kind == "item.completed":
+            phase = _ITEM_PHASES.get(str(item.get("type")), "other")
+        else:
+            phase = "other"
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+        if kind == "item.started" and item.get("id"):
+            self._item_started[item["id"]] = now
+        elif kind == "item.completed":
+            self._complete_item(item, now)
+        elif kind == "turn.completed":
+            for name in _TOKEN_FIELDS:
+                value = (event.get("usage") or {}).get(name)
+                if isinstance(value, int):
+                    self.tokens[name] = self.tokens.get(name, 0) + value
+        elif kind in {"turn.failed", "error"}:
+            raw_error = event.get("error")
+            error: dict[str, Any] = raw_error if isinstance(raw_error, dict) else event
+            self._error(str(error.get("message") or kind))
+
+    def _complete_item(self, item: dict[str, Any], now: float) -> None:
+        item_type = item.get("type")
+        item_id = item.get("id")
+        started = self._item_started.pop(item_id, None) if isinstance(item_id, str) else None
+        if item_type in _TOOL_ITEMS:
+            self.tool_call_count += 1
+            if len(self.tool_calls) < _MAX_TOOL_CALLS:
+                call: dict[str, Any] = {"type": item_type, "status": item.get("status")}
+                for name in ("command", "exit_code", "server", "tool", "query"):
+                    if item.get(name) is not None:
+                        call[name] = item[name]
+                if started is not None:
+                    call["duration_ms"] = round((now - started) * 1000)
+                self.tool_calls.append(call)
+        elif item_type == "file_change":
+            for change in item.get("changes") or []:
+                path = change.get("path") if isinstance(change, dict) else None
+                if path and path not in self.files:
+                    self.files.append(path)
+        elif item_type == "agent_message" and isinstance(item.get("text"), str):
+            self.final_message = item["text"]
+        elif item_type == "error":
+            self._error(str(item.get("message") or "error"))
+
+    def _error(self, message: str) -> None:
+        if len(self.errors) < _MAX_ERRORS:
+            self.errors.append(message)
+
+    def summary(self) -> dict[str, Any]:
+        """The compact form returned with a run's result."""
+        return {
+            "duration_ms": round((self._last - self.started) * 1000),
+            "phases_ms": {phase: round(seconds * 1000) for phase, seconds in self.phases.items()},
+            "tool_calls": self.tool_call_count,
+            "files": list(self.files),
+            "tokens": dict(self.tokens),
+            "errors": len(self.errors),
+        }
+
+    def describe(self) -> dict[str, Any]:
+        """Everything gathered, as recorded in metadata.json; tool calls and errors are capped per run."""
+        return {
+            **self.summary(),
+            "events": self.events,
+            "tool_call_log": list(self.tool_calls),
+            "error_messages": list(self.errors),
+            "final_message": self.final_message,
+        }
+
+
+__all__ = ["EventTracker"]
@@ -0,0 +1,103 @@
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+
+
+class RotatingLog:
+    """One output stream of a Codex run, written to disk as it arrives.
+
+    The stream goes to `<path>`; once that file would pass `max_bytes` it is rotated to `<path>.1` (older
+    files shift to `.2` and so on, keeping `backups` of them), so a chatty run holds at most
+    `(backups + 1) * max_bytes` on disk. Offsets count bytes from the start of the stream across rotations,
+    which lets a reader keep tailing while files rotate under it.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.written = 0
+        self.rotations = 0
+        self._start = 0
+        self._starts: deque[int] = deque()
+        self._file = path.open("wb")
+
+    def _rotated(self, number: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{number}")
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backups:
+            self._rotated(self.backups).unlink(missing_ok=True)
+            for number in range(self.backups - 1, 0, -1):
+                if self._rotated(number).exists():
+                    self._rotated(number).rename(self._rotated(number + 1))
+            self.path.rename(self._rotated(1))
+            self._starts.appendleft(self._start)
+            while len(self._starts) > self.backups:
+                self._starts.pop()
+        self.rotations += 1
+        self._start = self.written
+        self._file = self.path.open("wb")
+
+    def write(self, data: bytes) -> None:
+        """Append `data`, flushed at once so a tailing reader sees it as soon as Codex prints it."""
+        size = self.written - self._start
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self.written += len(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def read(self, offset: int, limit: int) -> tuple[int, bytes]:
+        """Up to `limit` bytes of the stream from `offset`, and where they start.
+
+        An offset that was already rotated away starts at the oldest byte still on disk instead.
+        """
+        segments = [(start, self._rotated(number)) for number, start in enumerate(self._starts, 1)][::-1]
+        segments.append((self._start, self.path))
+        offset = min(max(offset, segments[0][0]), self.written)
+        begin = offset
+        chunks: list[bytes] = []
+        for position, (start, path) in enumerate(segments):
+            end = segments[position + 1][0] if position + 1 < len(segments) else self.written
+            if offset >= end or limit <= 0:
+                continue
+            with path.open("rb") as handle:
+                handle.seek(offset - start)
+                chunk = handle.read(min(end - offset, limit))
+            chunks.append(chunk)
+            offset += len(chunk)
+            limit -= len(chunk)
+        return begin, b"".join(chunks)
+
+    def text(self) -> str:
+        """Everything still on disk, decoded."""
+        _, data = self.read(0, self.written)
+        return data.decode("utf-8", errors="replace")
+
+
+async def pump(stream: asyncio.StreamReader, log: RotatingLog, on_line: Callable[[bytes], None] | None = None) -> None:
+    """Copy a subprocess pipe into `log` line by line until it closes, handing each line to `on_line` too.
+
+    A last line without a newline is still copied, and a line longer than the reader's buffer goes in pieces.
+    """
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as exc:
+            line = exc.partial
+        except asyncio.LimitOverrunError as exc:
+            line = await stream.read(exc.consumed)
+        if not line:
+            return
+        log.write(line)
+        if on_line is not None:
+            on_line(line)
+
+
+__all__ = ["RotatingLog", "pump"]
@@ -1,19 +1,34 @@
+import asyncio
+import contextvars
 import json
 import logging
 import os
 import shlex
 import shutil
 import signal
-import subprocess
 import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
+from typing import Any
 
+from enhancement_core.codex.events import EventTracker
+from enhancement_core.codex.logs import RotatingLog, pump
 from enhancement_core.codex.options import CodexOptions
+from enhancement_core.codex.worktrees import Lease, WorktreeError, WorktreePool
 from enhancement_core.config import HostBridgeSettings
 
 logger = logging.getLogger(__name__)
 
+_KILL_GRACE_SECONDS = 5.0
+_RECENT_RUNS = 32
+_LINE_LIMIT = 4 * 1024 * 1024
+
 
 class CodexRunnerError(RuntimeError):
     def __init__(
@@ -24,6 +39,7 @@ class CodexRunnerError(RuntimeError):
         stdout: str | None = None,
         stderr: str | None = None,
         log_path: str | None = None,
+        merge: dict[str, Any] | None = None,
     ):
         super().__init__(message)
         self.run_id = run_id
@@ -31,6 +47,29 @@ class CodexRunnerError(RuntimeError):
         self.stdout = stdout
         self.stderr = stderr
         self.log_path = log_path
+        self.merge = merge
+
+
+@dataclass
+class LiveRun:
+    """A Codex run started by `CodexRunner.run_async`, with the log files its output streams into."""
+
+    run_id: str
+    started_at: str
+    logs: dict[str, RotatingLog] = field(default_factory=dict)
+    process: asyncio.subprocess.Process | None = None
+    events: EventTracker | None = None
+    cancelled: bool = False
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "pid": self.process.pid if self.process else None,
+            "cancelled": self.cancelled,
+            "output_bytes": {name: log.written for name, log in self.logs.items()},
+            "events": self.events.summary() if self.events else None,
+        }
 
 
 class CodexRunner:
@@ -47,6 +86,21 @@ class CodexRunner:
             self.logs_root.mkdir(parents=True, exist_ok=True)
         except OSError as exc:
             raise CodexRunnerError("Unable to prepare codex log directory") from exc
+        self.live: dict[str, LiveRun] = {}
+        self._recent: OrderedDict[str, LiveRun] = OrderedDict()
+        self.worktrees: WorktreePool | None = None
+        self._leases: asyncio.Semaphore | None = None
+        self._git_threads: ThreadPoolExecutor | None = None
+        if self.settings.worktrees:
+            self._leases = asyncio.Semaphore(self.settings.worktrees)
+            self._git_threads = ThreadPoolExecutor(self.settings.worktrees, thread_name_prefix="codex-git")
+            worktree_root = self.settings.worktree_root
+            self.worktrees = WorktreePool(
+                self.repo_path,
+                worktree_root if worktree_root.is_absolute() else base_dir / worktree_root,
+                self.settings.worktrees,
+                self.settings.branch_prefix,
+            )
 
     def ensure_repo(self) -> Path:
         if not self.repo_path.exists():
@@ -67,87 +121,298 @@ class CodexRunner:
             raise CodexRunnerError("Feedback is empty")
         return f"{self.prompt_prefix}\n\nFeedback:\n{body}"
 
-    def run(self, feedback: str, *, codex_options: CodexOptions | None = None) -> dict[str, str | int]:
+    def run(self, feedback: str, *, codex_options: CodexOptions | None = None) -> dict[str, Any]:
+        """Blocking `run_async`; Ctrl+C stops Codex's whole process group before the interrupt propagates."""
+        return asyncio.run(self.run_async(feedback, codex_options=codex_options))
+
+    async def run_async(
+        self,
+        feedback: str,
+        *,
+        codex_options: CodexOptions | None = None,
+        run_id: str | None = None,
+    ) -> dict[str, Any]:
+        """Run Codex as an asyncio subprocess, streaming its output into the run's log files.
+
+        The run is listed in `live` until it ends and can be stopped early with `cancel`. Cancelling the
+        awaiting task (a client that went away, a shutdown) also stops Codex's whole process group.
+        """
         repo = self.ensure_repo()
         binary = self.resolve_binary()
         prompt = self.build_prompt(feedback)
-        run_id = str(uuid.uuid4())
+        if not run_id or run_id in self.live:
+            run_id = str(uuid.uuid4())
         log_dir, created_at = self._prepare_log_dir(run_id)
-        command = [binary, "exec", "--skip-git-repo-check", "--cd", str(repo)]
-        if codex_options:
-            command.extend(codex_options.as_command_args())
-        command.append(prompt)
-        print("🔧 Running Codex to apply changes...")
+        live = LiveRun(run_id=run_id, started_at=created_at, logs=self._open_logs(log_dir))
+        self.live[run_id] = live
+        try:
+            async with self._async_workspace() as lease:
+                return await self._execute(live, lease, repo, binary, prompt, log_dir, created_at, codex_options)
+        except WorktreeError as exc:
+            raise CodexRunnerError(f"Worktree error: {exc}", run_id=run_id, log_path=str(log_dir)) from exc
+        finally:
+            for log in live.logs.values():
+                log.close()
+            self.live.pop(run_id, None)
+            self._recent[run_id] = live
+            while len(self._recent) > _RECENT_RUNS:
+                self._recent.popitem(last=False)
+
+    def cancel(self, run_id: str) -> bool:
+        """Stop a live run: SIGTERM to its process group, then SIGKILL if it is still there after the grace period.
+
+        A run still waiting for a worktree or starting up sees the flag before Codex gets going.
+        """
+        live = self.live.get(run_id)
+        if live is None:
+            return False
+        live.cancelled = True
+        if live.process is not None and live.process.returncode is None:
+            self._signal(live.process, signal.SIGTERM)
+            asyncio.get_running_loop().call_later(_KILL_GRACE_SECONDS, self._signal, live.process, signal.SIGKILL)
+        return True
 
-        # Use Popen instead of run for better process control
-        process = None
+    def tail(self, run_id: str, stream: str, offset: int, limit: int) -> dict[str, Any] | None:
+        """Output of a live or recently finished run from `offset` on, or None for an unknown run."""
+        live = self.live.get(run_id) or self._recent.get(run_id)
+        if live is None:
+            return None
+        start, data = live.logs[stream].read(offset, limit)
+        return {
+            "run_id": run_id,
+            "stream": stream,
+            "offset": start,
+            "next_offset": start + len(data),
+            "data": data.decode("utf-8", errors="replace"),
+            "running": run_id in self.live,
+        }
+
+    def _open_logs(self, log_dir: Path) -> dict[str, RotatingLog]:
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                preexec_fn=os.setsid  # Create new process group for better signal handling
-            )
+            return {
+                name: RotatingLog(log_dir / f"{name}.log", self.settings.log_max_bytes, self.settings.log_backups)
+                for name in ("stdout", "stderr")
+            }
+        except OSError as exc:
+            raise CodexRunnerError("Unable to open codex log files", log_path=str(log_dir)) from exc
+
+    def _offload(self, func: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Run blocking git work on the worktree pool's own threads (the default executor without a pool)."""
+        call = partial(contextvars.copy_context().run, func, *args)
+        return asyncio.get_running_loop().run_in_executor(self._git_threads, call)
+
+    @asynccontextmanager
+    async def _async_workspace(self) -> AsyncIterator[Lease | None]:
+        """A leased worktree when the pool is enabled, otherwise nothing (runs edit the repo in place).
+
+        Runs queue for a worktree on `_leases` rather than in a thread, so a lease is only requested once one
+        is free and each lease needs at most one of the pool's `worktrees` git threads at a time. A run cancelled while
+        its lease is being prepared hands the lease back as soon as it arrives.
+        """
+        if self.worktrees is None or self._leases is None:
+            yield None
+            return
+        leases = self._leases
+        await leases.acquire()
+        workspace = self.worktrees.lease()
+
+        def give_back() -> asyncio.Future:
+            exiting = self._offload(workspace.__exit__, None, None, None)
+            exiting.add_done_callback(lambda _: leases.release())
+            return exiting
+
+        entering = self._offload(workspace.__enter__)
+        try:
+            lease = await asyncio.shield(entering)
+        except asyncio.CancelledError:
 
-            try:
-                # Wait for process to complete with timeout to allow for interrupts
-                stdout, stderr = process.communicate(timeout=self.exec_timeout)
-            except subprocess.TimeoutExpired:
-                print("\n⏰ Codex process timed out, terminating...")
-                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                try:
-                    process.wait(timeout=5.0)
-                except subprocess.TimeoutExpired:
-                    os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                raise CodexRunnerError("Codex process timed out")
-
-        except KeyboardInterrupt:
-            # If user interrupts with Ctrl+C, kill the entire process group
-            print("\n🛑 Received interrupt signal, terminating Codex process...")
-            if process and process.poll() is None:  # Process is still running
-                try:
-                    # Kill the process group to ensure all child processes are terminated
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    # Give it a moment to terminate gracefully, then force kill if needed
-                    try:
-                        process.wait(timeout=2.0)
-                    except subprocess.TimeoutExpired:
-                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                except (ProcessLookupError, OSError):
-                    pass  # Process already exited
+            def release(done: asyncio.Future) -> None:
+                if done.cancelled() or done.exception() is not None:
+                    leases.release()
+                else:
+                    give_back()
+
+            entering.add_done_callback(release)
+            raise
+        except BaseException:
+            leases.release()
             raise
+        try:
+            yield lease
+        finally:
+            await asyncio.shield(give_back())
+
+    async def _execute(
+        self,
+        live: LiveRun,
+        lease: Lease | None,
+        repo: Path,
+        binary: str,
+        prompt: str,
+        log_dir: Path,
+        created_at: str,
+        codex_options: CodexOptions | None,
+    ) -> dict[str, Any]:
+        run_id = live.run_id
+        command = self._command(binary, lease.workdir if lease else repo, prompt, codex_options)
+        complete = partial(
+            self._complete,
+            live=live,
+            lease=lease,
+            command=command,
+            prompt=prompt,
+            log_dir=log_dir,
+            created_at=created_at,
+            codex_options=codex_options,
+        )
+        if live.cancelled:
+            return complete(exit_code=None)
+        print("🔧 Running Codex to apply changes...")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+                limit=_LINE_LIMIT,
+            )
         except FileNotFoundError as exc:
-            raise CodexRunnerError("Codex executable missing") from exc
+            raise CodexRunnerError("Codex executable missing", run_id=run_id, log_path=str(log_dir)) from exc
+        live.process = process
+        if self.settings.json_events:
+            live.events = EventTracker()
+        if live.cancelled:
+            self._signal(process, signal.SIGTERM)
+        streaming = asyncio.gather(
+            pump(process.stdout, live.logs["stdout"], live.events.feed if live.events else None),
+            pump(process.stderr, live.logs["stderr"]),
+            process.wait(),
+        )
+        try:
+            await asyncio.wait_for(streaming, self.exec_timeout)
+        except asyncio.TimeoutError:
+            print("\n⏰ Codex process timed out, terminating...")
+            await self._terminate(process)
+            raise CodexRunnerError("Codex process timed out", run_id=run_id, log_path=str(log_dir)) from None
+        except asyncio.CancelledError:
+            print("\n🛑 Codex run abandoned, terminating Codex process...")
+            await self._terminate(process)
+            live.cancelled = True
+            self._persist_logs(
+                live=live,
+                command=command,
+                prompt=prompt,
+                exit_code=process.returncode,
+                created_at=created_at,
+                log_dir=log_dir,
+                codex_options=codex_options,
+            )
+            raise
+        return await self._offload(partial(complete, exit_code=process.returncode))
+
+    async def _terminate(self, process: asyncio.subprocess.Process) -> None:
+        self._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), _KILL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            self._signal(process, signal.SIGKILL)
+            await process.wait()
+
+    @staticmethod
+    def _signal(process: asyncio.subprocess.Process, signum: int) -> None:
+        """Signal Codex's process group, whose id is its pid since it runs in its own session."""
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _command(self, binary: str, workdir: Path, prompt: str, codex_options: CodexOptions | None) -> list[str]:
+        command = [binary, "exec", "--skip-git-repo-check", "--cd", str(workdir)]
+        if self.settings.json_events:
+            command.append("--json")
+        if codex_options:
+            command.extend(codex_options.as_command_args())
+        command.append(prompt)
+        return command
+
+    def _complete(
+        self,
+        *,
+        live: LiveRun,
+        lease: Lease | None,
+        command: list[str],
+        prompt: str,
+        exit_code: int | None,
+        log_dir: Path,
+        created_at: str,
+        codex_options: CodexOptions | None,
+    ) -> dict[str, Any]:
+        run_id = live.run_id
+        merge = None
+        if lease is not None and exit_code == 0 and not live.cancelled:
+            assert self.worktrees is not None
+            merge = self.worktrees.merge(lease, run_id, f"Apply Codex run {run_id}").describe()
         self._persist_logs(
-            log_dir=log_dir,
+            live=live,
             command=command,
             prompt=prompt,
-            stdout=stdout,
-            stderr=stderr,
-            exit_code=process.returncode,
+            exit_code=exit_code,
             created_at=created_at,
-            run_id=run_id,
+            log_dir=log_dir,
             codex_options=codex_options,
+            merge=merge,
         )
-        if process.returncode != 0:
-            print(f"❌ Codex run failed with exit code {process.returncode}")
+        stdout = live.logs["stdout"].text()
+        stderr = live.logs["stderr"].text()
+        if live.cancelled:
+            print("🛑 Codex run cancelled")
+            raise CodexRunnerError(
+                "Codex run cancelled",
+                run_id=run_id,
+                exit_code=exit_code,
+                stdout=stdout,
+                stderr=stderr,
+                log_path=str(log_dir),
+            )
+        if exit_code != 0:
+            print(f"❌ Codex run failed with exit code {exit_code}")
             raise CodexRunnerError(
                 "Codex run failed",
                 run_id=run_id,
-                exit_code=process.returncode,
+                exit_code=exit_code,
                 stdout=stdout,
                 stderr=stderr,
                 log_path=str(log_dir),
             )
+        if merge and merge["status"] == "conflict":
+            print(f"⚠️ Codex changes conflict with the target branch; left on {merge['branch']}")
+            raise CodexRunnerError(
+                "Codex changes conflict with the target branch",
+                run_id=run_id,
+                exit_code=exit_code,
+                stdout=stdout,
+                stderr=stderr,
+                log_path=str(log_dir),
+                merge=merge,
+            )
         print("✨ Codex completed successfully!")
-        return {
+        result: dict[str, Any] = {
             "run_id": run_id,
             "stdout": stdout,
             "stderr": stderr,
-            "exit_code": process.returncode,
+            "exit_code": exit_code,
             "log_path": str(log_dir),
         }
+        if merge:
+            result["merge"] = merge
+        if live.events:
+            result["events"] = live.events.summary()
+        return result
+
+    def live_runs(self) -> list[dict[str, Any]]:
+        return [live.describe() for live in self.live.values()]
 
     def _prepare_log_dir(self, run_id: str) -> tuple[Path, str]:
         timestamp = datetime.now(timezone.utc)
@@ -162,32 +427,36 @@ class CodexRunner:
     def _persist_logs(
         self,
         *,
-        log_dir: Path,
+        live: LiveRun,
         command: list[str],
         prompt: str,
-        stdout: str,
-        stderr: str,
-        exit_code: int,
+        exit_code: int | None,
         created_at: str,
-        run_id: str,
+        log_dir: Path,
         codex_options: CodexOptions | None = None,
+        merge: dict[str, Any] | None = None,
     ) -> None:
         try:
             (log_dir / "prompt.txt").write_text(prompt)
             (log_dir / "command.txt").write_text(shlex.join(command))
-            (log_dir / "stdout.log").write_text(stdout or "")
-            (log_dir / "stderr.log").write_text(stderr or "")
             metadata = {
-                "run_id": run_id,
+                "run_id": live.run_id,
                 "created_at": created_at,
                 "exit_code": exit_code,
                 "command": command,
+                "output": {name: {"bytes": log.written, "rotations": log.rotations} for name, log in live.logs.items()},
             }
             if codex_options:
                 metadata["codex_options"] = codex_options.model_dump(exclude_none=True)
+            if merge:
+                metadata["merge"] = merge
+            if live.cancelled:
+                metadata["cancelled"] = True
+            if live.events:
+                metadata["events"] = live.events.describe()
             (log_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
         except OSError as exc:
             raise CodexRunnerError("Unable to persist codex logs", log_path=str(log_dir)) from exc
 
 
-__all__ = ["CodexRunner", "CodexRunnerError"]
+__all__ = ["CodexRunner", "CodexRunnerError", "LiveRun"]
@@ -0,0 +1,159 @@
+import logging
+import subprocess
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_COMMIT_IDENTITY = ("-c", "user.name=Codex", "-c", "user.email=codex@localhost")
+
+
+class WorktreeError(RuntimeError):
+    pass
+
+
+@dataclass
+class Lease:
+    """A leased worktree; `workdir` is the subdirectory of it that TARGET_REPO_PATH is of its repository."""
+
+    path: Path
+    seq: int
+    base: str
+    workdir: Path
+    merged: bool = False
+
+
+@dataclass
+class MergeOutcome:
+    """How a run's changes landed on the target branch: "merged", "unchanged", or "conflict"."""
+
+    status: str
+    branch: str | None = None
+    commit: str | None = None
+    strategy: str | None = None
+    conflicts: list[str] = field(default_factory=list)
+
+    def describe(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class WorktreePool:
+    """A fixed set of `git worktree`s of the target repo, so Codex runs can edit files in parallel.
+
+    Each run leases a worktree reset to the target branch's current head, commits what Codex changed to
+    its own branch, and merges that branch back into the target repo. Merges happen in the order runs
+    started, fast-forward when possible and as a merge commit otherwise; a conflicting run is left
+    unmerged on its branch and reported.
+    """
+
+    def __init__(self, repo: Path, root: Path, size: int, branch_prefix: str):
+        self.repo = repo
+        self.root = root
+        self.size = size
+        self.branch_prefix = branch_prefix
+        self._free: list[Path] = []
+        self._prefix = ""
+        self._ready = False
+        self._issued = 0
+        self._next_merge = 0
+        self._finished: set[int] = set()
+        self._cond = threading.Condition()
+
+    def _git(self, cwd: Path, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        completed = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+        if check and completed.returncode != 0:
+            raise WorktreeError(f"git {' '.join(args)} failed: {completed.stderr.strip() or completed.stdout.strip()}")
+        return completed
+
+    def _prepare(self) -> None:
+        """Register the pool's worktrees, first pruning any whose directories were deleted since the last start."""
+        if self._git(self.repo, "rev-parse", "--is-inside-work-tree", check=False).returncode != 0:
+            raise WorktreeError(f"{self.repo} is not a git repository")
+        self._prefix = self._git(self.repo, "rev-parse", "--show-prefix").stdout.strip()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._git(self.repo, "worktree", "prune")
+        registered = self._git(self.repo, "worktree", "list", "--porcelain").stdout
+        for slot in range(self.size):
+            path = (self.root / f"slot-{slot}").resolve()
+            if f"worktree {path}\n" not in registered:
+                self._git(self.repo, "worktree", "add", "--detach", str(path), "HEAD")
+            self._free.append(path)
+        self._ready = True
+
+    @contextmanager
+    def lease(self) -> Iterator[Lease]:
+        """Borrow a free worktree, force-reset so no earlier run's leftovers (even a conflicting one's) leak in."""
+        with self._cond:
+            if not self._ready:
+                self._prepare()
+            self._cond.wait_for(lambda: bool(self._free))
+            path = self._free.pop()
+            seq = self._issued
+            self._issued += 1
+        lease: Lease | None = None
+        try:
+            base = self._git(self.repo, "rev-parse", "HEAD").stdout.strip()
+            self._git(path, "checkout", "--detach", "--force", base)
+            self._git(path, "clean", "-fd")
+            lease = Lease(path, seq, base, path / self._prefix)
+            yield lease
+        finally:
+            with self._cond:
+                if lease is None or not lease.merged:
+                    self._finish(seq)
+                self._free.append(path)
+                self._cond.notify_all()
+
+    def _finish(self, seq: int) -> None:
+        self._finished.add(seq)
+        while self._next_merge in self._finished:
+            self._finished.discard(self._next_merge)
+            self._next_merge += 1
+
+    def merge(self, lease: Lease, run_id: str, message: str) -> MergeOutcome:
+        """Commit the lease's changes to a per-run branch and merge it into the target repo once it is its turn.
+
+        Commits use a fixed identity, so a host without a git user configured can still merge.
+        """
+        path = lease.path
+        self._git(path, "add", "-A")
+        if self._git(path, "diff", "--cached", "--quiet", check=False).returncode != 0:
+            self._git(path, *_COMMIT_IDENTITY, "commit", "--no-verify", "-m", message)
+        head = self._git(path, "rev-parse", "HEAD").stdout.strip()
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_merge == lease.seq)
+            try:
+                if head == lease.base:
+                    return MergeOutcome(status="unchanged")
+                return self._merge_branch(head, run_id)
+            finally:
+                lease.merged = True
+                self._finish(lease.seq)
+                self._cond.notify_all()
+
+    def _merge_branch(self, head: str, run_id: str) -> MergeOutcome:
+        branch = f"{self.branch_prefix}{run_id}"
+        self._git(self.repo, "branch", "--force", branch, head)
+        if self._git(self.repo, "merge", "--ff-only", branch, check=False).returncode == 0:
+            strategy = "fast-forward"
+        elif self._git(self.repo, *_COMMIT_IDENTITY, "merge", "--no-edit", branch, check=False).returncode == 0:
+            strategy = "three-way"
+        else:
+            conflicts = self._git(self.repo, "diff", "--name-only", "--diff-filter=U").stdout.split()
+            self._git(self.repo, "merge", "--abort", check=False)
+            logger.warning("codex run conflicts with target branch", extra={"branch": branch, "conflicts": conflicts})
+            return MergeOutcome(status="conflict", branch=branch, commit=head, conflicts=conflicts)
+        commit = self._git(self.repo, "rev-parse", "HEAD").stdout.strip()
+        self._git(self.repo, "branch", "-D", branch)
+        return MergeOutcome(status="merged", branch=branch, commit=commit, strategy=strategy)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            return {"size": self.size, "free": len(self._free) if self._ready else self.size, "root": str(self.root)}
+
+
+__all__ = ["Lease", "MergeOutcome", "WorktreeError", "WorktreePool"]
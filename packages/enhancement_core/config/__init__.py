@@ -3,8 +3,11 @@ from pathlib import Path
 
 from enhancement_core.config.runtime import (
     DEFAULT_FEEDBACK_PROMPT,
+    INPUT_MODES,
+    ApiCredential,
     FeedbackSettings,
     HostBridgeSettings,
+    MockResponsesSettings,
     PipelineSettings,
     RouterSettings,
     ScreenshotSettings,
@@ -29,9 +32,12 @@ def load_environment_file(path: Path | None = None) -> None:
 
 
 __all__ = [
+    "ApiCredential",
     "DEFAULT_FEEDBACK_PROMPT",
     "FeedbackSettings",
     "HostBridgeSettings",
+    "INPUT_MODES",
+    "MockResponsesSettings",
     "PipelineSettings",
     "RouterSettings",
     "ScreenshotSettings",
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -6,6 +7,8 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 DEFAULT_FEEDBACK_PROMPT = """You are a focused UI reviewer. Inspect the landing page screenshot and return exactly one concrete change that would most improve clarity, conversion, or overall UX. Be specific and actionable."""
 
+INPUT_MODES = ("image", "hybrid", "dom")
+
 
 class RuntimeSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
@@ -32,6 +35,7 @@ class ScreenshotSettings(RuntimeSettings):
     scroll_delay_ms: int = Field(default=400, ge=100, le=2000, alias="FRONTEND_SCREENSHOT_SCROLL_DELAY_MS")
     max_captures: int = Field(default=100, ge=1, le=250, alias="FRONTEND_SCREENSHOT_MAX_CAPTURES")
     nav_timeout_ms: int = Field(default=45000, ge=1000, alias="FRONTEND_SCREENSHOT_NAV_TIMEOUT_MS")
+    dom_snapshot_max_elements: int = Field(default=400, ge=1, le=5000, alias="FRONTEND_SCREENSHOT_DOM_MAX_ELEMENTS")
 
     @field_validator("target_url")
     @classmethod
@@ -44,39 +48,182 @@ class ScreenshotSettings(RuntimeSettings):
         return cls._normalize_path(value)
 
 
+@dataclass(frozen=True)
+class ApiCredential:
+    api_key: str
+    organization: str | None = None
+    project: str | None = None
+
+    @property
+    def label(self) -> str:
+        return f"...{self.api_key[-4:]}"
+
+
 class FeedbackSettings(RuntimeSettings):
     schema_path: Path = Field(default=Path("config") / "ui_feedback_schema.json", alias="UI_FEEDBACK_SCHEMA_PATH")
     model_name: str = Field(default="gpt-5.1", alias="UI_FEEDBACK_MODEL_NAME")
     max_output_tokens: int = Field(default=2000, ge=256, le=4096, alias="UI_FEEDBACK_MAX_OUTPUT_TOKENS")
     default_user_text: str = Field(default="Here's the landing page screenshot to analyze.", alias="UI_FEEDBACK_DEFAULT_TEXT")
     prompt: str = Field(default=DEFAULT_FEEDBACK_PROMPT, alias="UI_FEEDBACK_PROMPT")
-    api_key: str = Field(alias="OPENAI_API_KEY")
+    api_key: str = Field(default="", alias="OPENAI_API_KEY")
+    api_keys: str = Field(default="", alias="OPENAI_API_KEYS")
     request_timeout: float = Field(default=120.0, gt=0, alias="UI_FEEDBACK_HTTP_TIMEOUT")
+    tiling_enabled: bool = Field(default=True, alias="UI_FEEDBACK_TILING_ENABLED")
+    tile_height: int = Field(default=1536, ge=256, le=8192, alias="UI_FEEDBACK_TILE_HEIGHT")
+    tile_overlap: int = Field(default=64, ge=0, le=1024, alias="UI_FEEDBACK_TILE_OVERLAP")
+    tile_max_high_detail: int = Field(default=8, ge=0, alias="UI_FEEDBACK_TILE_MAX_HIGH_DETAIL")
+    tile_low_detail_stddev: float = Field(default=4.0, ge=0, alias="UI_FEEDBACK_TILE_LOW_DETAIL_STDDEV")
+    tile_dedup_threshold: float = Field(default=1.5, ge=0, alias="UI_FEEDBACK_TILE_DEDUP_THRESHOLD")
+    requests_per_minute: int = Field(default=500, ge=1, alias="UI_FEEDBACK_REQUESTS_PER_MINUTE")
+    tokens_per_minute: int = Field(default=200000, ge=1, alias="UI_FEEDBACK_TOKENS_PER_MINUTE")
+    queue_timeout: float = Field(default=60.0, gt=0, alias="UI_FEEDBACK_QUEUE_TIMEOUT")
+    fetch_max_bytes: int = Field(default=25 * 1024 * 1024, ge=1024, alias="UI_FEEDBACK_FETCH_MAX_BYTES")
+    fetch_timeout: float = Field(default=30.0, gt=0, alias="UI_FEEDBACK_FETCH_TIMEOUT")
+    fetch_cache_entries: int = Field(default=32, ge=0, alias="UI_FEEDBACK_FETCH_CACHE_ENTRIES")
+    fetch_cache_max_bytes: int = Field(default=128 * 1024 * 1024, ge=0, alias="UI_FEEDBACK_FETCH_CACHE_MAX_BYTES")
+    preprocess_workers: int = Field(default=2, ge=0, le=64, alias="UI_FEEDBACK_PREPROCESS_WORKERS")
+    preprocess_queue: int = Field(default=32, ge=1, alias="UI_FEEDBACK_PREPROCESS_QUEUE")
+    max_image_width: int = Field(default=2048, ge=256, le=8192, alias="UI_FEEDBACK_MAX_IMAGE_WIDTH")
+    max_image_pixels: int = Field(default=64_000_000, ge=1_000_000, alias="UI_FEEDBACK_MAX_IMAGE_PIXELS")
+    chained_user_text: str = Field(
+        default="This capture shows the page after your earlier suggestions were applied. "
+        "Do not repeat them; propose the next most valuable change.",
+        alias="UI_FEEDBACK_CHAINED_TEXT",
+    )
+    regions_user_text: str = Field(
+        default="Only the regions below changed since the previous capture. The first image is a low-detail "
+        "thumbnail of the whole page for context; focus your review on the changed regions.",
+        alias="UI_FEEDBACK_REGIONS_TEXT",
+    )
+    input_mode: str = Field(default="image", alias="UI_FEEDBACK_INPUT_MODE")
+    dom_summary_max_chars: int = Field(default=12000, ge=500, alias="UI_FEEDBACK_DOM_MAX_CHARS")
+    dom_image_max_width: int = Field(default=640, ge=128, le=2048, alias="UI_FEEDBACK_DOM_IMAGE_MAX_WIDTH")
+    triage_model_name: str = Field(default="", alias="UI_FEEDBACK_TRIAGE_MODEL_NAME")
+    triage_min_confidence: float = Field(default=0.7, ge=0, le=1, alias="UI_FEEDBACK_TRIAGE_MIN_CONFIDENCE")
+    triage_prompt: str = Field(
+        default="Also rate your confidence from 0 to 1 that this is the most valuable next change, and the "
+        "severity of the worst issue you found: none, minor, or major.",
+        alias="UI_FEEDBACK_TRIAGE_PROMPT",
+    )
+    batch_dir: Path = Field(default=Path("run_logs") / "feedback_batches", alias="UI_FEEDBACK_BATCH_DIR")
+    batch_completion_window: str = Field(default="24h", alias="UI_FEEDBACK_BATCH_COMPLETION_WINDOW")
 
     @field_validator("schema_path", mode="before")
     @classmethod
     def normalize_schema_path(cls, value: Path | str) -> Path:
         return cls._normalize_path(value)
 
+    @field_validator("batch_dir", mode="before")
+    @classmethod
+    def normalize_batch_dir(cls, value: Path | str) -> Path:
+        return cls._normalize_path(value)
+
+    @field_validator("input_mode")
+    @classmethod
+    def validate_input_mode(cls, value: str) -> str:
+        normalized = value.strip().lower()
+        if normalized not in INPUT_MODES:
+            raise ValueError("UI_FEEDBACK_INPUT_MODE must be one of: dom, hybrid, image")
+        return normalized
+
     @field_validator("api_key")
     @classmethod
     def validate_api_key(cls, value: str) -> str:
-        stripped = value.strip()
-        if not stripped:
+        return value.strip()
+
+    @field_validator("api_keys")
+    @classmethod
+    def validate_api_keys(cls, value: str) -> str:
+        for entry in value.split(","):
+            if entry.strip() and not entry.split(":", 1)[0].strip():
+                raise ValueError("OPENAI_API_KEYS entries must start with an API key")
+        return value.strip()
+
+    def credentials(self) -> list[ApiCredential]:
+        """Primary OPENAI_API_KEY followed by each `key[:organization[:project]]` entry in OPENAI_API_KEYS."""
+        found: list[ApiCredential] = []
+        if self.api_key:
+            found.append(ApiCredential(self.api_key))
+        for entry in self.api_keys.split(","):
+            parts = [part.strip() or None for part in entry.strip().split(":")]
+            if not parts[0]:
+                continue
+            credential = ApiCredential(parts[0], *parts[1:3])
+            if all(existing.api_key != credential.api_key for existing in found):
+                found.append(credential)
+        return found
+
+    @model_validator(mode="after")
+    def validate_settings(self):
+        if not self.credentials():
             raise ValueError("OPENAI_API_KEY is required")
-        return stripped
+        if self.tile_overlap >= self.tile_height:
+            raise ValueError("UI_FEEDBACK_TILE_OVERLAP must be smaller than UI_FEEDBACK_TILE_HEIGHT")
+        return self
 
 
 class RouterSettings(RuntimeSettings):
     bridge_url: str = Field(default="http://host.docker.internal:5600", alias="FRONTEND_ENHANCEMENT_BRIDGE_URL")
+    bridge_urls: str = Field(default="", alias="FRONTEND_ENHANCEMENT_BRIDGE_URLS")
+    bridge_health_interval: float = Field(default=15.0, gt=0, alias="ROUTER_BRIDGE_HEALTH_INTERVAL")
+    bridge_failure_threshold: int = Field(default=3, ge=1, alias="ROUTER_BRIDGE_FAILURE_THRESHOLD")
+    bridge_cooldown: float = Field(default=30.0, gt=0, alias="ROUTER_BRIDGE_COOLDOWN")
+    bridge_attempts: int = Field(default=3, ge=1, alias="ROUTER_BRIDGE_ATTEMPTS")
+    bridge_retry_base: float = Field(default=0.5, gt=0, alias="ROUTER_BRIDGE_RETRY_BASE")
+    bridge_retry_max: float = Field(default=5.0, gt=0, alias="ROUTER_BRIDGE_RETRY_MAX")
+    bridge_hedge_percentile: float = Field(default=0.0, ge=0, lt=100, alias="ROUTER_BRIDGE_HEDGE_PERCENTILE")
     request_timeout: float = Field(default=240.0, gt=0, alias="FRONTEND_ENHANCEMENT_HOST_TIMEOUT")
     max_concurrency: int = Field(default=4, ge=1, alias="ROUTER_MAX_CONCURRENCY")
+    max_queue: int = Field(default=64, ge=0, alias="ROUTER_MAX_QUEUE")
+    interactive_weight: int = Field(default=4, ge=1, alias="ROUTER_INTERACTIVE_WEIGHT")
+    adaptive_concurrency: bool = Field(default=False, alias="ROUTER_ADAPTIVE_CONCURRENCY")
+    adaptive_min: int = Field(default=1, ge=1, alias="ROUTER_ADAPTIVE_MIN")
+    adaptive_max: int = Field(default=16, ge=1, alias="ROUTER_ADAPTIVE_MAX")
+    adaptive_latency_target: float = Field(default=180.0, gt=0, alias="ROUTER_ADAPTIVE_LATENCY_TARGET")
+    adaptive_backoff: float = Field(default=0.5, gt=0, lt=1, alias="ROUTER_ADAPTIVE_BACKOFF")
+    job_db_path: Path = Field(default=Path("run_logs") / "router_jobs" / "jobs.sqlite3", alias="ROUTER_JOB_DB")
+    job_long_poll_max: float = Field(default=30.0, gt=0, le=300, alias="ROUTER_JOB_LONG_POLL_MAX")
+    stream_keepalive: float = Field(default=15.0, gt=0, alias="ROUTER_STREAM_KEEPALIVE")
+    idempotency_ttl: float = Field(default=3600.0, gt=0, alias="ROUTER_IDEMPOTENCY_TTL")
+    idempotency_max_keys: int = Field(default=10000, ge=1, alias="ROUTER_IDEMPOTENCY_MAX_KEYS")
+    coalesce: bool = Field(default=False, alias="ROUTER_COALESCE")
+    coalesce_window: float = Field(default=1.0, ge=0, alias="ROUTER_COALESCE_WINDOW")
+    coalesce_max_chars: int = Field(default=400, ge=1, alias="ROUTER_COALESCE_MAX_CHARS")
+    coalesce_max_items: int = Field(default=8, ge=2, alias="ROUTER_COALESCE_MAX_ITEMS")
 
     @field_validator("bridge_url")
     @classmethod
     def validate_bridge_url(cls, value: str) -> str:
         return cls._validate_url(value, "FRONTEND_ENHANCEMENT_BRIDGE_URL")
 
+    @field_validator("bridge_urls")
+    @classmethod
+    def validate_bridge_urls(cls, value: str) -> str:
+        for entry in value.split(","):
+            if entry.strip():
+                cls._validate_url(entry, "FRONTEND_ENHANCEMENT_BRIDGE_URLS")
+        return value.strip()
+
+    def bridges(self) -> list[str]:
+        """FRONTEND_ENHANCEMENT_BRIDGE_URL followed by each extra bridge in FRONTEND_ENHANCEMENT_BRIDGE_URLS."""
+        found: list[str] = []
+        for entry in [self.bridge_url, *self.bridge_urls.split(",")]:
+            url = entry.strip().rstrip("/")
+            if url and url not in found:
+                found.append(url)
+        return found
+
+    @field_validator("job_db_path", mode="before")
+    @classmethod
+    def normalize_job_db_path(cls, value: Path | str) -> Path:
+        return cls._normalize_path(value)
+
+    @model_validator(mode="after")
+    def validate_adaptive_bounds(self):
+        if self.adaptive_min > self.adaptive_max:
+            raise ValueError("ROUTER_ADAPTIVE_MIN must not exceed ROUTER_ADAPTIVE_MAX")
+        return self
+
 
 class HostBridgeSettings(RuntimeSettings):
     next_path: Path = Field(alias="TARGET_REPO_PATH")
@@ -87,6 +234,15 @@ class HostBridgeSettings(RuntimeSettings):
     codex_bin: str = Field(default="codex", alias="FRONTEND_ENHANCEMENT_CODEX_BIN")
     logs_root: Path = Field(default=Path("run_logs") / "codex_runs", alias="FRONTEND_ENHANCEMENT_CODEX_LOG_DIR")
     codex_timeout_seconds: float = Field(default=300.0, gt=0, alias="FRONTEND_ENHANCEMENT_HOST_TIMEOUT")
+    worktrees: int = Field(default=0, ge=0, le=32, alias="FRONTEND_ENHANCEMENT_CODEX_WORKTREES")
+    worktree_root: Path = Field(
+        default=Path("run_logs") / "codex_worktrees", alias="FRONTEND_ENHANCEMENT_CODEX_WORKTREE_DIR"
+    )
+    branch_prefix: str = Field(default="codex/run-", min_length=1, alias="FRONTEND_ENHANCEMENT_CODEX_BRANCH_PREFIX")
+    cancel_on_disconnect: bool = Field(default=False, alias="FRONTEND_ENHANCEMENT_CANCEL_ON_DISCONNECT")
+    log_max_bytes: int = Field(default=10_000_000, ge=1024, alias="FRONTEND_ENHANCEMENT_CODEX_LOG_MAX_BYTES")
+    log_backups: int = Field(default=3, ge=0, alias="FRONTEND_ENHANCEMENT_CODEX_LOG_BACKUPS")
+    json_events: bool = Field(default=False, alias="FRONTEND_ENHANCEMENT_CODEX_JSON_EVENTS")
 
     @field_validator("next_path", mode="before")
     @classmethod
@@ -98,6 +254,11 @@ class HostBridgeSettings(RuntimeSettings):
     def normalize_logs_root(cls, value: Path | str) -> Path:
         return cls._normalize_path(value)
 
+    @field_validator("worktree_root", mode="before")
+    @classmethod
+    def normalize_worktree_root(cls, value: Path | str) -> Path:
+        return cls._normalize_path(value)
+
     @field_validator("next_path")
     @classmethod
     def validate_next_path_exists(cls, value: Path) -> Path:
@@ -108,6 +269,54 @@ class HostBridgeSettings(RuntimeSettings):
         return value
 
 
+class MockResponsesSettings(RuntimeSettings):
+    mode: str = Field(default="mock", alias="MOCK_RESPONSES_MODE")
+    latency_distribution: str = Field(default="lognormal", alias="MOCK_RESPONSES_LATENCY_DISTRIBUTION")
+    latency_ms: float = Field(default=800.0, ge=0, alias="MOCK_RESPONSES_LATENCY_MS")
+    latency_jitter_ms: float = Field(default=250.0, ge=0, alias="MOCK_RESPONSES_LATENCY_JITTER_MS")
+    error_rate: float = Field(default=0.0, ge=0, le=1, alias="MOCK_RESPONSES_ERROR_RATE")
+    throttle_every: int = Field(default=0, ge=0, alias="MOCK_RESPONSES_429_EVERY")
+    throttle_burst: int = Field(default=3, ge=1, alias="MOCK_RESPONSES_429_BURST")
+    retry_after_seconds: float = Field(default=1.0, ge=0, alias="MOCK_RESPONSES_RETRY_AFTER")
+    output_tokens: int = Field(default=120, ge=1, alias="MOCK_RESPONSES_OUTPUT_TOKENS")
+    feedback_text: str = Field(
+        default="Increase the contrast of the primary call-to-action button so it stands out from the hero image.",
+        alias="MOCK_RESPONSES_FEEDBACK_TEXT",
+    )
+    seed: int | None = Field(default=None, alias="MOCK_RESPONSES_SEED")
+    cassette_dir: Path = Field(default=Path("run_logs") / "responses_cassettes", alias="MOCK_RESPONSES_CASSETTE_DIR")
+    upstream_url: str = Field(default="https://api.openai.com/v1", alias="MOCK_RESPONSES_UPSTREAM_URL")
+    replay_latency: bool = Field(default=False, alias="MOCK_RESPONSES_REPLAY_LATENCY")
+    request_timeout: float = Field(default=120.0, gt=0, alias="MOCK_RESPONSES_UPSTREAM_TIMEOUT")
+    batch_delay_seconds: float = Field(default=0.0, ge=0, alias="MOCK_RESPONSES_BATCH_DELAY")
+
+    @field_validator("mode")
+    @classmethod
+    def validate_mode(cls, value: str) -> str:
+        normalized = value.strip().lower()
+        if normalized not in {"mock", "record", "replay"}:
+            raise ValueError("MOCK_RESPONSES_MODE must be one of: mock, record, replay")
+        return normalized
+
+    @field_validator("latency_distribution")
+    @classmethod
+    def validate_latency_distribution(cls, value: str) -> str:
+        normalized = value.strip().lower()
+        if normalized not in {"fixed", "uniform", "normal", "lognormal"}:
+            raise ValueError("MOCK_RESPONSES_LATENCY_DISTRIBUTION must be one of: fixed, lognormal, normal, uniform")
+        return normalized
+
+    @field_validator("cassette_dir", mode="before")
+    @classmethod
+    def normalize_cassette_dir(cls, value: Path | str) -> Path:
+        return cls._normalize_path(value)
+
+    @field_validator("upstream_url")
+    @classmethod
+    def validate_upstream_url(cls, value: str) -> str:
+        return cls._validate_url(value, "MOCK_RESPONSES_UPSTREAM_URL").rstrip("/")
+
+
 class PipelineSettings(RuntimeSettings):
     screenshot_endpoint: str = Field(default="http://localhost:8101/capture", alias="FRONTEND_SCREENSHOTS_URL")
     feedback_endpoint: str = Field(default="http://localhost:8102/feedback", alias="UI_FEEDBACK_SERVICE_URL")
@@ -118,6 +327,24 @@ class PipelineSettings(RuntimeSettings):
     max_attempts: int = Field(default=3, ge=1, alias="PIPELINE_MAX_ATTEMPTS")
     retry_backoff_seconds: float = Field(default=2.0, ge=0.5, alias="PIPELINE_RETRY_BACKOFF")
     artifacts_root: Path = Field(default=Path("run_logs") / "pipeline_runs", alias="PIPELINE_ARTIFACT_ROOT")
+    chain_iterations: bool = Field(default=False, alias="PIPELINE_CHAIN_ITERATIONS")
+    feedback_input_mode: str = Field(default="image", alias="PIPELINE_FEEDBACK_INPUT_MODE")
+    diff_regions: bool = Field(default=False, alias="PIPELINE_DIFF_REGIONS")
+    diff_threshold: int = Field(default=24, ge=0, le=255, alias="PIPELINE_DIFF_THRESHOLD")
+    diff_padding_px: int = Field(default=48, ge=0, le=512, alias="PIPELINE_DIFF_PADDING_PX")
+    diff_max_changed_ratio: float = Field(default=0.6, gt=0, le=1, alias="PIPELINE_DIFF_MAX_CHANGED_RATIO")
+    diff_thumbnail_width: int = Field(default=320, ge=64, le=1024, alias="PIPELINE_DIFF_THUMBNAIL_WIDTH")
+    prescreen_enabled: bool = Field(default=False, alias="PIPELINE_PRESCREEN_ENABLED")
+    prescreen_min_score: float = Field(default=2.0, gt=0, alias="PIPELINE_PRESCREEN_MIN_SCORE")
+    prescreen_clean_action: str = Field(default="downgrade", alias="PIPELINE_PRESCREEN_CLEAN_ACTION")
+    prescreen_direct_findings: bool = Field(default=True, alias="PIPELINE_PRESCREEN_DIRECT_FINDINGS")
+    prescreen_grid_px: int = Field(default=8, ge=1, le=64, alias="PIPELINE_PRESCREEN_GRID_PX")
+    prescreen_oversize_ratio: float = Field(default=4.0, gt=1, alias="PIPELINE_PRESCREEN_OVERSIZE_RATIO")
+    batch_poll_seconds: float = Field(default=30.0, gt=0, alias="PIPELINE_BATCH_POLL_SECONDS")
+    batch_wait_timeout: float = Field(default=86400.0, gt=0, alias="PIPELINE_BATCH_WAIT_TIMEOUT")
+    router_jobs: bool = Field(default=False, alias="PIPELINE_ROUTER_JOBS")
+    router_job_timeout: float = Field(default=3600.0, gt=0, alias="PIPELINE_ROUTER_JOB_TIMEOUT")
+    router_stream: bool = Field(default=False, alias="PIPELINE_ROUTER_STREAM")
     sample_feedback_text: str = Field(
         default="Tighten hero spacing, raise CTA prominence, and simplify testimonial layout.",
         alias="PIPELINE_SAMPLE_FEEDBACK",
@@ -138,6 +365,22 @@ class PipelineSettings(RuntimeSettings):
     def validate_router_endpoint(cls, value: str) -> str:
         return cls._validate_url(value, "FRONTEND_ENHANCEMENT_ROUTER_URL")
 
+    @field_validator("feedback_input_mode")
+    @classmethod
+    def validate_feedback_input_mode(cls, value: str) -> str:
+        normalized = value.strip().lower()
+        if normalized not in INPUT_MODES:
+            raise ValueError("PIPELINE_FEEDBACK_INPUT_MODE must be one of: dom, hybrid, image")
+        return normalized
+
+    @field_validator("prescreen_clean_action")
+    @classmethod
+    def validate_prescreen_clean_action(cls, value: str) -> str:
+        normalized = value.strip().lower()
+        if normalized not in {"model", "downgrade", "skip"}:
+            raise ValueError("PIPELINE_PRESCREEN_CLEAN_ACTION must be one of: downgrade, model, skip")
+        return normalized
+
     @field_validator("artifacts_root", mode="before")
     @classmethod
     def normalize_artifacts_root(cls, value: Path | str) -> Path:
@@ -145,9 +388,12 @@ class PipelineSettings(RuntimeSettings):
 
 
 __all__ = [
+    "ApiCredential",
     "DEFAULT_FEEDBACK_PROMPT",
     "FeedbackSettings",
     "HostBridgeSettings",
+    "INPUT_MODES",
+    "MockResponsesSettings",
     "PipelineSettings",
     "RouterSettings",
     "RuntimeSettings",
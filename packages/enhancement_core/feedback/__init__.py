@@ -1,17 +1,60 @@
+from enhancement_core.feedback.batch import (
+    BatchResult,
+    batch_request_line,
+    collect_batch_results,
+    parse_batch_output,
+    retrieve_batch,
+    submit_batch,
+    write_batch_file,
+)
+from enhancement_core.feedback.diffing import CaptureDiff, diff_captures
+from enhancement_core.feedback.dom_summary import summarize_snapshot
 from enhancement_core.feedback.generate import (
     FeedbackError,
+    FeedbackRateLimitError,
     FeedbackResponse,
+    PreparedInput,
     generate_feedback,
     generate_feedback_from_bytes,
     generate_feedback_from_text,
+    prepare_input,
     request_feedback,
 )
+from enhancement_core.feedback.routing import TierResult
+from enhancement_core.feedback.tiling import (
+    ImageTile,
+    downscale_image,
+    estimate_capture_tokens,
+    estimate_image_tokens,
+    region_tile,
+    split_image,
+)
 
 __all__ = [
+    "BatchResult",
+    "CaptureDiff",
     "FeedbackError",
+    "FeedbackRateLimitError",
     "FeedbackResponse",
+    "ImageTile",
+    "PreparedInput",
+    "TierResult",
+    "batch_request_line",
+    "collect_batch_results",
+    "diff_captures",
+    "downscale_image",
+    "estimate_capture_tokens",
+    "estimate_image_tokens",
     "generate_feedback",
     "generate_feedback_from_bytes",
     "generate_feedback_from_text",
+    "parse_batch_output",
+    "prepare_input",
+    "region_tile",
     "request_feedback",
+    "retrieve_batch",
+    "split_image",
+    "submit_batch",
+    "summarize_snapshot",
+    "write_batch_file",
 ]
@@ -0,0 +1,190 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+from enhancement_core.config import FeedbackSettings
+from enhancement_core.feedback.generate import (
+    FeedbackError,
+    PreparedInput,
+    decode_output,
+    feedback_value,
+    load_schema,
+    prepare_input,
+    response_request,
+)
+from enhancement_core.feedback.tiling import ImageTile
+from openai import OpenAI, OpenAIError
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT: Literal["/v1/responses"] = "/v1/responses"
+TERMINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+@dataclass
+class BatchResult:
+    custom_id: str
+    feedback: str | None
+    model: str | None = None
+    response_id: str | None = None
+    total_tokens: int | None = None
+    input_tokens: int | None = None
+    cached_tokens: int | None = None
+    error: str | None = None
+
+
+def batch_request_line(
+    custom_id: str,
+    image_data: Optional[bytes],
+    user_text: Optional[str],
+    settings: FeedbackSettings,
+    *,
+    previous_response_id: str | None = None,
+    dom_snapshot: dict[str, Any] | None = None,
+    regions: list[ImageTile] | None = None,
+    prepared: PreparedInput | None = None,
+) -> dict[str, Any]:
+    """One JSONL line of a batch file: the same Responses request a synchronous call to the primary model sends."""
+    if prepared is None:
+        prepared = prepare_input(
+            image_data,
+            user_text,
+            settings,
+            chained=bool(previous_response_id),
+            dom_snapshot=dom_snapshot,
+            regions=regions,
+        )
+    body = response_request(
+        model=settings.model_name,
+        instructions=settings.prompt,
+        schema=load_schema(settings),
+        input_items=prepared.input_items,
+        max_output_tokens=settings.max_output_tokens,
+        previous_response_id=previous_response_id,
+    )
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def write_batch_file(path: Path, lines: list[dict[str, Any]]) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        for line in lines:
+            handle.write(json.dumps(line, separators=(",", ":")))
+            handle.write("\n")
+    return path
+
+
+def _output_text(body: dict[str, Any]) -> str:
+    parts = [
+        content.get("text") or ""
+        for item in body.get("output") or []
+        if isinstance(item, dict) and item.get("type") == "message"
+        for content in item.get("content") or []
+        if isinstance(content, dict) and content.get("type") == "output_text"
+    ]
+    return "".join(parts)
+
+
+def _batch_result(line: dict[str, Any]) -> BatchResult:
+    custom_id = str(line.get("custom_id") or "")
+    error = line.get("error")
+    if error:
+        message = error.get("message") if isinstance(error, dict) else str(error)
+        return BatchResult(custom_id, None, error=message or "batch request failed")
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    status_code = response.get("status_code")
+    if status_code != 200:
+        message = ((body.get("error") or {}) if isinstance(body, dict) else {}).get("message")
+        return BatchResult(custom_id, None, error=message or f"batch request returned {status_code}")
+    usage = body.get("usage") or {}
+    result = BatchResult(
+        custom_id,
+        None,
+        model=body.get("model"),
+        response_id=body.get("id"),
+        total_tokens=usage.get("total_tokens"),
+        input_tokens=usage.get("input_tokens"),
+        cached_tokens=(usage.get("input_tokens_details") or {}).get("cached_tokens"),
+    )
+    text = _output_text(body)
+    if not text:
+        result.error = "model returned empty output"
+        return result
+    try:
+        result.feedback = feedback_value(decode_output(text))
+    except FeedbackError as exc:
+        result.error = str(exc)
+    return result
+
+
+def parse_batch_output(text: str) -> list[BatchResult]:
+    """Map each line of a batch output or error file back to its custom_id."""
+    results: list[BatchResult] = []
+    for raw in text.splitlines():
+        if not raw.strip():
+            continue
+        try:
+            line = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning("skipping unparseable batch output line")
+            continue
+        if isinstance(line, dict):
+            results.append(_batch_result(line))
+    return results
+
+
+def submit_batch(client: OpenAI, path: Path, settings: FeedbackSettings, metadata: dict[str, str] | None = None) -> Any:
+    """Upload a batch file and start the batch; returns the batch object."""
+    try:
+        with path.open("rb") as handle:
+            uploaded = client.files.create(file=(path.name, handle), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=settings.batch_completion_window,
+            metadata=metadata,
+        )
+    except OpenAIError as exc:
+        logger.exception("batch submission failed")
+        raise FeedbackError("Batch submission failed") from exc
+    logger.info("submitted feedback batch", extra={"batch_id": batch.id, "input_file_id": uploaded.id})
+    return batch
+
+
+def retrieve_batch(client: OpenAI, batch_id: str) -> Any:
+    try:
+        return client.batches.retrieve(batch_id)
+    except OpenAIError as exc:
+        logger.exception("batch status lookup failed")
+        raise FeedbackError(f"Unable to retrieve batch {batch_id}") from exc
+
+
+def collect_batch_results(client: OpenAI, batch: Any) -> list[BatchResult]:
+    """Download the output and error files of a finished batch and parse them into results."""
+    results: list[BatchResult] = []
+    for file_id in (getattr(batch, "output_file_id", None), getattr(batch, "error_file_id", None)):
+        if not file_id:
+            continue
+        try:
+            content = client.files.content(file_id)
+        except OpenAIError as exc:
+            logger.exception("batch result download failed")
+            raise FeedbackError(f"Unable to download batch file {file_id}") from exc
+        results.extend(parse_batch_output(content.text))
+    return results
+
+
+__all__ = [
+    "BATCH_ENDPOINT",
+    "BatchResult",
+    "TERMINAL_BATCH_STATUSES",
+    "batch_request_line",
+    "collect_batch_results",
+    "parse_batch_output",
+    "retrieve_batch",
+    "submit_batch",
+    "write_batch_file",
+]
@@ -0,0 +1,129 @@
+import io
+import logging
+from dataclasses import dataclass
+
+from enhancement_core.feedback.tiling import ImageTile, encode_png, estimate_image_tokens
+from PIL import Image, ImageChops, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CaptureDiff:
+    regions: list[ImageTile]
+    thumbnail: bytes
+    changed_ratio: float
+
+
+def _open(data: bytes) -> Image.Image | None:
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        return None
+    return image
+
+
+def _changed_rows(mask: Image.Image) -> bytes:
+    """One byte per row of a 0/255 mask, non-zero where any pixel in the row is set.
+
+    Rows collapse in two box-filter passes of at most 128 pixels each, so a single set pixel still
+    leaves a non-zero mean after rounding.
+    """
+    width, height = mask.size
+    columns = max(1, -(-width // 128))
+    return (
+        mask.resize((columns, height), Image.Resampling.BOX)
+        .point(lambda value: 255 if value else 0)
+        .resize((1, height), Image.Resampling.BOX)
+        .tobytes()
+    )
+
+
+def _changed_bands(rows: bytes, merge_gap: int) -> list[tuple[int, int]]:
+    bands: list[tuple[int, int]] = []
+    for row, value in enumerate(rows):
+        if not value:
+            continue
+        if bands and row - bands[-1][1] <= merge_gap:
+            bands[-1] = (bands[-1][0], row + 1)
+        else:
+            bands.append((row, row + 1))
+    return bands
+
+
+def diff_captures(
+    previous: bytes,
+    current: bytes,
+    *,
+    threshold: int = 24,
+    padding: int = 48,
+    max_changed_ratio: float = 0.6,
+    thumbnail_width: int = 320,
+) -> CaptureDiff | None:
+    """Crop the regions of `current` that differ from `previous`, plus a thumbnail of the whole page.
+
+    Returns None when the captures cannot be compared region by region (different widths,
+    undecodable bytes, no visible change, or so much change that the full capture is cheaper).
+    """
+    before, after = _open(previous), _open(current)
+    if before is None or after is None:
+        return None
+    with before, after:
+        if before.width != after.width:
+            return None
+        width, height = after.size
+        common = min(before.height, height)
+        after_rgb = after.convert("RGB")
+        difference = ImageChops.difference(
+            before.convert("RGB").crop((0, 0, width, common)), after_rgb.crop((0, 0, width, common))
+        )
+        mask = difference.convert("L").point(lambda value: 255 if value > threshold else 0)
+        if height > common:
+            extended = Image.new("L", (width, height), 255)
+            extended.paste(mask, (0, 0))
+            mask = extended
+        bands = _changed_bands(_changed_rows(mask), merge_gap=padding * 2)
+        if not bands:
+            return None
+        boxes: list[tuple[int, int, int, int]] = []
+        for top, bottom in bands:
+            box = mask.crop((0, top, width, bottom)).getbbox()
+            if box is not None:
+                boxes.append(
+                    (
+                        max(0, box[0] - padding),
+                        max(0, top - padding),
+                        min(width, box[2] + padding),
+                        min(height, bottom + padding),
+                    )
+                )
+        changed_ratio = sum((right - left) * (lower - upper) for left, upper, right, lower in boxes) / (width * height)
+        if not boxes or changed_ratio > max_changed_ratio:
+            logger.debug("capture diff too large for region crops", extra={"changed_ratio": changed_ratio})
+            return None
+        regions: list[ImageTile] = []
+        for left, upper, right, lower in boxes:
+            crop = after_rgb.crop((left, upper, right, lower))
+            regions.append(
+                ImageTile(
+                    data=encode_png(crop),
+                    top=upper,
+                    width=crop.width,
+                    height=crop.height,
+                    detail="high",
+                    estimated_tokens=estimate_image_tokens(crop.width, crop.height),
+                    left=left,
+                )
+            )
+        thumb_width = min(width, thumbnail_width)
+        thumb_height = max(1, round(height * thumb_width / width))
+        thumbnail = encode_png(after_rgb.resize((thumb_width, thumb_height), Image.Resampling.LANCZOS))
+    logger.info(
+        "cropped changed regions",
+        extra={"regions": len(regions), "changed_ratio": round(changed_ratio, 3)},
+    )
+    return CaptureDiff(regions=regions, thumbnail=thumbnail, changed_ratio=changed_ratio)
+
+
+__all__ = ["CaptureDiff", "diff_captures"]
@@ -0,0 +1,85 @@
+from typing import Any
+
+from enhancement_core.feedback.prescreen import parse_color
+
+_ROLE_BY_TAG = {
+    "a": "link",
+    "button": "button",
+    "h1": "heading1",
+    "h2": "heading2",
+    "h3": "heading3",
+    "h4": "heading4",
+    "h5": "heading5",
+    "h6": "heading6",
+    "label": "label",
+    "li": "listitem",
+    "td": "cell",
+    "th": "columnheader",
+}
+
+
+def _hex(value: Any) -> str | None:
+    color = parse_color(value)
+    if color is None:
+        return None
+    return "#{:02x}{:02x}{:02x}".format(*(round(channel) for channel in color[:3]))
+
+
+def _describe(element: dict[str, Any]) -> str | None:
+    x, y, width, height = (round(float(value)) for value in element["rect"])
+    box = f"[{x},{y} {width}x{height}]"
+    tag = str(element.get("tag") or "")
+    if tag == "img":
+        alt = element.get("alt") or element.get("aria_label")
+        return f'{box} img alt="{alt}"' if alt else f"{box} img (no alt)"
+    role = element.get("role") or _ROLE_BY_TAG.get(tag, "text")
+    text = " ".join(str(element.get("text") or "").split())
+    if not text:
+        return None
+    style = [f"{round(float(element.get('font_size') or 16))}px"]
+    if int(element.get("font_weight") or 400) >= 600:
+        style.append("bold")
+    foreground, background = _hex(element.get("color")), _hex(element.get("background"))
+    if foreground and background:
+        style.append(f"{foreground} on {background}")
+    return f'{box} {role} "{text}" {" ".join(style)}'
+
+
+def _reading_order(element: dict[str, Any]) -> tuple[int, float]:
+    """Top to bottom, then left to right within a row."""
+    return round(float(element["rect"][1])), float(element["rect"][0])
+
+
+def summarize_snapshot(snapshot: dict[str, Any], max_chars: int) -> str:
+    """Render a DOM snapshot as one line per element in reading order, pruned to `max_chars`."""
+    viewport = snapshot.get("viewport") or {}
+    header = (
+        f"Rendered page structure (viewport {viewport.get('width', '?')}x{viewport.get('height', '?')}); "
+        'each line is [x,y widthxheight] role "text" font size, weight, and colors:'
+    )
+    elements = [
+        element
+        for element in snapshot.get("elements") or []
+        if isinstance(element, dict) and isinstance(element.get("rect"), list) and len(element["rect"]) == 4
+    ]
+    elements.sort(key=_reading_order)
+    lines = [header]
+    used = len(header)
+    previous: str | None = None
+    omitted = 0
+    for element in elements:
+        line = _describe(element)
+        if line is None or line == previous:
+            continue
+        if used + len(line) + 1 > max_chars:
+            omitted += 1
+            continue
+        lines.append(line)
+        used += len(line) + 1
+        previous = line
+    if omitted:
+        lines.append(f"... {omitted} more elements omitted")
+    return "\n".join(lines)
+
+
+__all__ = ["summarize_snapshot"]
@@ -1,12 +1,16 @@
 import base64
 import json
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Optional, cast
 
 from enhancement_core.config import FeedbackSettings
-from openai import OpenAI, OpenAIError
+from enhancement_core.feedback.dom_summary import summarize_snapshot
+from enhancement_core.feedback.routing import TierResult, escalation_reason, parse_triage, triage_schema
+from enhancement_core.feedback.tiling import LOW_DETAIL_TOKENS, ImageTile, downscale_image, split_image
+from openai import BadRequestError, OpenAI, OpenAIError, RateLimitError
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +19,54 @@ class FeedbackError(RuntimeError):
     pass
 
 
+class FeedbackRateLimitError(FeedbackError):
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after_seconds(exc: RateLimitError) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return None
+    return None
+
+
 @dataclass
 class FeedbackResponse:
     feedback: str
     model: str | None
     response_id: str | None
     total_tokens: int | None
+    estimated_image_tokens: int | None = None
+    input_tokens: int | None = None
+    cached_tokens: int | None = None
+    previous_response_id: str | None = None
+    tier: str | None = None
+    tiers: list[TierResult] = field(default_factory=list)
+    input_mode: str = "image"
+
+
+@dataclass
+class PreparedInput:
+    input_items: list[dict]
+    input_mode: str
+    estimated_image_tokens: int | None
+    timing: dict[str, float] = field(default_factory=dict)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
 
 
 def load_schema(settings: FeedbackSettings) -> dict:
@@ -42,71 +88,352 @@ def encode_bytes(data: bytes) -> str:
     return base64.b64encode(data).decode("utf-8")
 
 
-def build_input(settings: FeedbackSettings, image_b64: Optional[str], user_text: Optional[str]) -> list[dict]:
+def build_input(
+    settings: FeedbackSettings,
+    image_b64: Optional[str],
+    user_text: Optional[str],
+    *,
+    tiles: Optional[list[ImageTile]] = None,
+    chained: bool = False,
+    dom_text: Optional[str] = None,
+    regions: Optional[list[ImageTile]] = None,
+) -> list[dict]:
     text_source = user_text
-    if not text_source and image_b64:
+    if not text_source and (image_b64 or tiles or dom_text or regions):
         text_source = settings.default_user_text
     text = (text_source or "").strip()
-    content = []
+    content: list[dict] = []
+    if chained and settings.chained_user_text.strip():
+        content.append({"type": "input_text", "text": settings.chained_user_text.strip()})
     if text:
         content.append({"type": "input_text", "text": text})
-    if image_b64:
+    if dom_text:
+        content.append({"type": "input_text", "text": dom_text})
+    if regions:
+        content.append({"type": "input_text", "text": settings.regions_user_text.strip()})
+        if image_b64:
+            content.append({"type": "input_image", "image_url": f"data:image/png;base64,{image_b64}", "detail": "low"})
+        for position, region in enumerate(regions, start=1):
+            label = (
+                f"Changed region {position} of {len(regions)} (x {region.left}-{region.left + region.width}, "
+                f"y {region.top}-{region.top + region.height})"
+            )
+            content.append({"type": "input_text", "text": label})
+            content.append(
+                {
+                    "type": "input_image",
+                    "image_url": f"data:image/png;base64,{encode_bytes(region.data)}",
+                    "detail": region.detail,
+                }
+            )
+    elif tiles and len(tiles) > 1:
+        for position, tile in enumerate(tiles, start=1):
+            label = f"Section {position} of {len(tiles)} (pixels {tile.top}-{tile.top + tile.height} from the top)"
+            content.append({"type": "input_text", "text": label})
+            content.append(
+                {
+                    "type": "input_image",
+                    "image_url": f"data:image/png;base64,{encode_bytes(tile.data)}",
+                    "detail": tile.detail,
+                }
+            )
+    elif image_b64:
         content.append({"type": "input_image", "image_url": f"data:image/png;base64,{image_b64}"})
     if not content:
         raise FeedbackError("neither screenshot nor text provided")
     return [{"role": "user", "content": content}]
 
 
-def parse_payload(raw: str) -> str:
+def decode_output(raw: str) -> dict[str, Any]:
     try:
         parsed = json.loads(raw)
     except json.JSONDecodeError as exc:
         raise FeedbackError("model returned invalid JSON output") from exc
+    if not isinstance(parsed, dict):
+        raise FeedbackError("structured output is not an object")
+    return parsed
+
+
+def feedback_value(parsed: dict[str, Any]) -> str:
     feedback = parsed.get("feedback")
     if not isinstance(feedback, str) or not feedback.strip():
         raise FeedbackError("structured output missing feedback value")
     return feedback.strip()
 
 
+def parse_payload(raw: str) -> str:
+    return feedback_value(decode_output(raw))
+
+
+def prepare_tiles(image_data: bytes, settings: FeedbackSettings) -> list[ImageTile] | None:
+    try:
+        return split_image(image_data, settings)
+    except ValueError:
+        logger.warning("unable to decode screenshot for tiling; sending it unchanged")
+        return None
+
+
+def _rejects_previous_response(exc: BadRequestError) -> bool:
+    """Whether the API refused the chained response (expired, or stored under another key) rather than the input."""
+    return exc.param == "previous_response_id" or "previous_response_id" in exc.message
+
+
+def _create_response(responses: Any, request: dict[str, Any]) -> Any:
+    try:
+        return responses.create(**request)
+    except RateLimitError as exc:
+        retry_after = _retry_after_seconds(exc)
+        logger.warning("responses api rate limited", extra={"retry_after": retry_after})
+        raise FeedbackRateLimitError("Responses API rate limited", retry_after=retry_after) from exc
+    except BadRequestError as exc:
+        if "previous_response_id" not in request or not _rejects_previous_response(exc):
+            logger.exception("responses api call failed")
+            raise FeedbackError("Responses API call failed") from exc
+        logger.warning("previous response rejected; retrying without chaining", extra={"error": str(exc)})
+        request = {key: value for key, value in request.items() if key != "previous_response_id"}
+        return _create_response(responses, request)
+    except OpenAIError as exc:
+        logger.exception("responses api call failed")
+        raise FeedbackError("Responses API call failed") from exc
+
+
+def response_request(
+    *,
+    model: str,
+    instructions: str,
+    schema: dict,
+    input_items: list[dict],
+    max_output_tokens: int,
+    previous_response_id: str | None = None,
+) -> dict[str, Any]:
+    """Body of a Responses API call, shared by synchronous requests and batch files.
+
+    Instructions and schema lead and stay byte-stable across calls so the API can reuse its prompt cache.
+    """
+    request: dict[str, Any] = {
+        "model": model,
+        "instructions": instructions,
+        "input": input_items,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "ui_feedback",
+                "schema": schema,
+            }
+        },
+        "max_output_tokens": max_output_tokens,
+    }
+    if previous_response_id:
+        request["previous_response_id"] = previous_response_id
+    return request
+
+
+def _complete(
+    responses: Any,
+    *,
+    model: str,
+    instructions: str,
+    schema: dict,
+    input_items: list[dict],
+    max_output_tokens: int,
+    previous_response_id: str | None,
+) -> tuple[Any, dict[str, Any], float]:
+    request = response_request(
+        model=model,
+        instructions=instructions,
+        schema=schema,
+        input_items=input_items,
+        max_output_tokens=max_output_tokens,
+        previous_response_id=previous_response_id,
+    )
+    started = time.perf_counter()
+    response = _create_response(responses, request)
+    latency = time.perf_counter() - started
+    payload = getattr(response, "output_text", None)
+    if not payload:
+        raise FeedbackError("model returned empty output")
+    return response, decode_output(payload), latency
+
+
+def _usage(response: Any) -> tuple[int | None, int | None, int | None]:
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return None, None, None
+    input_details = getattr(usage, "input_tokens_details", None)
+    cached_tokens = getattr(input_details, "cached_tokens", None) if input_details else None
+    return getattr(usage, "total_tokens", None), getattr(usage, "input_tokens", None), cached_tokens
+
+
+def _tier_result(tier: str, response: Any, model: str, latency: float) -> TierResult:
+    total_tokens, input_tokens, _ = _usage(response)
+    return TierResult(
+        tier=tier,
+        model=getattr(response, "model", model),
+        latency_seconds=round(latency, 3),
+        input_tokens=input_tokens,
+        total_tokens=total_tokens,
+    )
+
+
+def _triage(
+    responses: Any, cfg: FeedbackSettings, schema: dict, input_items: list[dict], previous_response_id: str | None
+) -> tuple[Any, dict[str, Any], TierResult]:
+    """Ask the triage model first; the returned tier records why it escalated, if it did."""
+    try:
+        response, parsed, latency = _complete(
+            responses,
+            model=cfg.triage_model_name,
+            instructions=f"{cfg.prompt}\n\n{cfg.triage_prompt}",
+            schema=triage_schema(schema),
+            input_items=input_items,
+            max_output_tokens=cfg.max_output_tokens,
+            previous_response_id=previous_response_id,
+        )
+        feedback_value(parsed)
+    except FeedbackRateLimitError:
+        raise
+    except FeedbackError as exc:
+        logger.warning("triage model failed; escalating", extra={"error": str(exc)})
+        return None, {}, TierResult("triage", cfg.triage_model_name, 0.0, None, None, escalation="triage_failed")
+    tier = _tier_result("triage", response, cfg.triage_model_name, latency)
+    tier.confidence, tier.severity = parse_triage(parsed)
+    tier.escalation = escalation_reason(tier.confidence, tier.severity, cfg.triage_min_confidence)
+    return response, parsed, tier
+
+
+def prepare_input(
+    image_data: Optional[bytes],
+    user_text: Optional[str],
+    cfg: FeedbackSettings,
+    *,
+    chained: bool = False,
+    dom_snapshot: dict[str, Any] | None = None,
+    regions: list[ImageTile] | None = None,
+) -> PreparedInput:
+    """Build the model input for a capture, timing the resize, tile, and encode stages."""
+    timing: dict[str, float] = {}
+    input_mode = cfg.input_mode if dom_snapshot else "image"
+    dom_text = summarize_snapshot(dom_snapshot, cfg.dom_summary_max_chars) if input_mode != "image" else None
+    if input_mode == "dom":
+        image_data = None
+        regions = None
+    elif input_mode == "hybrid" and image_data:
+        started = time.perf_counter()
+        image_data = downscale_image(image_data, cfg.dom_image_max_width)
+        timing["resize_ms"] = _elapsed_ms(started)
+    started = time.perf_counter()
+    if regions:
+        tiles = None
+        estimated_image_tokens = sum(region.estimated_tokens for region in regions) + (
+            LOW_DETAIL_TOKENS if image_data else 0
+        )
+    else:
+        tiles = prepare_tiles(image_data, cfg) if image_data else None
+        estimated_image_tokens = sum(tile.estimated_tokens for tile in tiles) if tiles else None
+        timing["tile_ms"] = _elapsed_ms(started)
+    if tiles or regions:
+        logger.info(
+            "estimated image input tokens",
+            extra={
+                "image_tiles": len(tiles or regions or []),
+                "changed_regions": bool(regions),
+                "estimated_image_tokens": estimated_image_tokens,
+            },
+        )
+    started = time.perf_counter()
+    image_b64 = None
+    if image_data and (regions or not (tiles and len(tiles) > 1)):
+        image_b64 = encode_bytes(image_data)
+    input_items = build_input(
+        cfg,
+        image_b64,
+        user_text,
+        tiles=tiles,
+        chained=chained,
+        dom_text=dom_text,
+        regions=regions,
+    )
+    timing["encode_ms"] = _elapsed_ms(started)
+    return PreparedInput(input_items, input_mode, estimated_image_tokens, timing)
+
+
 def request_feedback(
-    image_data: Optional[bytes], user_text: Optional[str], settings: FeedbackSettings | None = None
+    image_data: Optional[bytes],
+    user_text: Optional[str],
+    settings: FeedbackSettings | None = None,
+    *,
+    previous_response_id: str | None = None,
+    client: OpenAI | None = None,
+    escalate: bool = True,
+    dom_snapshot: dict[str, Any] | None = None,
+    regions: list[ImageTile] | None = None,
+    prepared: PreparedInput | None = None,
 ) -> FeedbackResponse:
+    """Request structured feedback; callers that already ran `prepare_input` pass its result as `prepared`."""
     cfg = settings or FeedbackSettings()
     schema = load_schema(cfg)
-    image_b64 = encode_bytes(image_data) if image_data else None
-    client = OpenAI(api_key=cfg.api_key)
+    if prepared is None:
+        prepared = prepare_input(
+            image_data,
+            user_text,
+            cfg,
+            chained=bool(previous_response_id),
+            dom_snapshot=dom_snapshot,
+            regions=regions,
+        )
+    input_items, input_mode = prepared.input_items, prepared.input_mode
+    if client is None:
+        client = OpenAI(api_key=cfg.credentials()[0].api_key)
     responses = cast(Any, client.responses)
-    logger.info("requesting UI feedback via %s", cfg.model_name)
-    try:
-        response = responses.create(
+    tiers: list[TierResult] = []
+    response = None
+    parsed: dict[str, Any] = {}
+    if cfg.triage_model_name and cfg.triage_model_name != cfg.model_name:
+        logger.info("requesting UI feedback triage via %s", cfg.triage_model_name)
+        response, parsed, triage = _triage(responses, cfg, schema, input_items, previous_response_id)
+        tiers.append(triage)
+        if triage.escalation and (escalate or response is None):
+            logger.info(
+                "escalating UI feedback to primary model",
+                extra={"reason": triage.escalation, "confidence": triage.confidence, "severity": triage.severity},
+            )
+            response = None
+    if response is None:
+        logger.info("requesting UI feedback via %s", cfg.model_name)
+        response, parsed, latency = _complete(
+            responses,
             model=cfg.model_name,
             instructions=cfg.prompt,
-            input=build_input(cfg, image_b64, user_text),
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": "ui_feedback",
-                    "schema": schema,
-                }
-            },
+            schema=schema,
+            input_items=input_items,
             max_output_tokens=cfg.max_output_tokens,
+            previous_response_id=previous_response_id,
         )
-    except OpenAIError as exc:
-        logger.exception("responses api call failed")
-        raise FeedbackError("Responses API call failed") from exc
-    payload = getattr(response, "output_text", None)
-    if not payload:
-        raise FeedbackError("model returned empty output")
-    logger.info("received structured UI feedback", extra={"response_id": getattr(response, "id", None)})
-    model_used = getattr(response, "model", cfg.model_name)
-    usage = getattr(response, "usage", None)
-    total_tokens = getattr(usage, "total_tokens", None) if usage else None
-    feedback_text = parse_payload(payload)
+        tiers.append(_tier_result("primary", response, cfg.model_name, latency))
+    logger.info(
+        "received structured UI feedback",
+        extra={
+            "response_id": getattr(response, "id", None),
+            "tier": tiers[-1].tier,
+            "input_mode": input_mode,
+            "tiers": [(tier.tier, tier.latency_seconds, tier.total_tokens) for tier in tiers],
+        },
+    )
+    total_tokens, input_tokens, cached_tokens = _usage(response)
+    if len(tiers) > 1 and all(tier.total_tokens is not None for tier in tiers):
+        total_tokens = sum(tier.total_tokens or 0 for tier in tiers)
     return FeedbackResponse(
-        feedback=feedback_text,
-        model=model_used,
+        feedback=feedback_value(parsed),
+        model=getattr(response, "model", cfg.model_name),
         response_id=getattr(response, "id", None),
         total_tokens=total_tokens,
+        estimated_image_tokens=prepared.estimated_image_tokens,
+        input_tokens=input_tokens,
+        cached_tokens=cached_tokens,
+        previous_response_id=getattr(response, "previous_response_id", None) or None,
+        tier=tiers[-1].tier,
+        tiers=tiers,
+        input_mode=input_mode,
     )
 
 
@@ -138,9 +465,14 @@ def generate_feedback_from_text(user_text: str, settings: FeedbackSettings | Non
 
 __all__ = [
     "FeedbackError",
+    "FeedbackRateLimitError",
     "FeedbackResponse",
+    "PreparedInput",
+    "decode_output",
+    "feedback_value",
     "generate_feedback",
     "generate_feedback_from_bytes",
     "generate_feedback_from_text",
+    "prepare_input",
     "request_feedback",
 ]
@@ -0,0 +1,227 @@
+import re
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+CHECK_WEIGHTS = {
+    "contrast": 1.0,
+    "overlap": 1.0,
+    "missing_alt": 0.5,
+    "oversized_image": 0.5,
+    "off_grid_spacing": 1.0,
+}
+_COLOR = re.compile(r"rgba?\(\s*([\d.]+)[,\s]+([\d.]+)[,\s]+([\d.]+)(?:\s*[,/]\s*([\d.]+%?))?\s*\)")
+_WHITE = (255.0, 255.0, 255.0)
+_OFF_GRID_MIN_GAPS = 3
+_OFF_GRID_MIN_RATIO = 0.5
+_MAX_GAP = 240
+
+
+@dataclass
+class Finding:
+    check: str
+    selector: str
+    message: str
+
+    @property
+    def weight(self) -> float:
+        return CHECK_WEIGHTS.get(self.check, 1.0)
+
+
+@dataclass
+class PrescreenReport:
+    elements: int
+    findings: list[Finding] = field(default_factory=list)
+
+    @property
+    def score(self) -> float:
+        return sum(finding.weight for finding in self.findings)
+
+    def feedback_text(self, limit: int = 10) -> str:
+        lines = ["Fix these issues found by automated checks of the rendered page:"]
+        lines.extend(f"- {finding.message} ({finding.selector})" for finding in self.findings[:limit])
+        if len(self.findings) > limit:
+            lines.append(f"- ...and {len(self.findings) - limit} similar issues.")
+        return "\n".join(lines)
+
+    def summary(self) -> dict[str, Any]:
+        counts: dict[str, int] = defaultdict(int)
+        for finding in self.findings:
+            counts[finding.check] += 1
+        return {"elements": self.elements, "score": round(self.score, 2), "findings": dict(counts)}
+
+
+def parse_color(value: Any) -> tuple[float, float, float, float] | None:
+    match = _COLOR.match(str(value or "").strip())
+    if not match:
+        return None
+    red, green, blue, alpha = match.groups()
+    if alpha is None:
+        opacity = 1.0
+    elif alpha.endswith("%"):
+        opacity = float(alpha[:-1]) / 100
+    else:
+        opacity = float(alpha)
+    return float(red), float(green), float(blue), opacity
+
+
+def _blend(color: tuple[float, float, float, float], base: tuple[float, float, float]) -> tuple[float, float, float]:
+    red, green, blue, alpha = color
+    return (
+        red * alpha + base[0] * (1 - alpha),
+        green * alpha + base[1] * (1 - alpha),
+        blue * alpha + base[2] * (1 - alpha),
+    )
+
+
+def _luminance(rgb: tuple[float, float, float]) -> float:
+    def linear(channel: float) -> float:
+        value = channel / 255
+        return value / 12.92 if value <= 0.03928 else ((value + 0.055) / 1.055) ** 2.4
+
+    red, green, blue = (linear(channel) for channel in rgb)
+    return 0.2126 * red + 0.7152 * green + 0.0722 * blue
+
+
+def contrast_ratio(foreground: tuple[float, float, float], background: tuple[float, float, float]) -> float:
+    lighter, darker = sorted((_luminance(foreground), _luminance(background)), reverse=True)
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def _rect(element: dict[str, Any]) -> tuple[float, float, float, float] | None:
+    rect = element.get("rect")
+    if not isinstance(rect, list) or len(rect) != 4:
+        return None
+    x, y, width, height = (float(value) for value in rect)
+    if width <= 0 or height <= 0:
+        return None
+    return x, y, width, height
+
+
+def _wcag_aa_minimum_contrast(font_size: float, bold: bool) -> float:
+    """WCAG AA: 3:1 for large text (24px, or 18.66px bold), 4.5:1 otherwise."""
+    return 3.0 if font_size >= 24 or (bold and font_size >= 18.66) else 4.5
+
+
+def _check_contrast(element: dict[str, Any]) -> Finding | None:
+    foreground = parse_color(element.get("color"))
+    background = parse_color(element.get("background"))
+    if foreground is None or background is None:
+        return None
+    base = _blend(background, _WHITE)
+    ratio = contrast_ratio(_blend(foreground, base), base)
+    size = float(element.get("font_size") or 16)
+    bold = int(element.get("font_weight") or 400) >= 700
+    minimum = _wcag_aa_minimum_contrast(size, bold)
+    if ratio >= minimum:
+        return None
+    return Finding(
+        "contrast",
+        element.get("selector", "?"),
+        f"Text '{str(element.get('text', ''))[:40]}' has contrast {ratio:.2f}:1, below {minimum}:1",
+    )
+
+
+def _check_image(
+    element: dict[str, Any], rect: tuple[float, float, float, float], dpr: float, ratio: float
+) -> Iterator[Finding]:
+    selector = element.get("selector", "?")
+    if element.get("alt") is None and not element.get("aria_label") and element.get("role") != "presentation":
+        yield Finding("missing_alt", selector, "Image has no alt text")
+    natural = element.get("natural")
+    if isinstance(natural, list) and len(natural) == 2:
+        rendered_area = rect[2] * rect[3] * dpr * dpr
+        natural_area = float(natural[0]) * float(natural[1])
+        if rendered_area > 0 and natural_area / rendered_area > ratio:
+            yield Finding(
+                "oversized_image",
+                selector,
+                f"Image is {int(natural[0])}x{int(natural[1])}px but renders at {int(rect[2])}x{int(rect[3])}px",
+            )
+
+
+def _check_overlaps(texts: list[tuple[dict[str, Any], tuple[float, float, float, float]]]) -> list[Finding]:
+    findings: list[Finding] = []
+    ordered = sorted(texts, key=lambda item: item[1][1])
+    active: list[tuple[dict[str, Any], tuple[float, float, float, float]]] = []
+    for element, rect in ordered:
+        x, y, width, height = rect
+        active = [item for item in active if item[1][1] + item[1][3] > y]
+        for other, (ox, oy, owidth, oheight) in active:
+            overlap_w = min(x + width, ox + owidth) - max(x, ox)
+            overlap_h = min(y + height, oy + oheight) - max(y, oy)
+            if overlap_w <= 1 or overlap_h <= 1:
+                continue
+            nested = (ox <= x and oy <= y and ox + owidth >= x + width and oy + oheight >= y + height) or (
+                x <= ox and y <= oy and x + width >= ox + owidth and y + height >= oy + oheight
+            )
+            if nested:
+                continue
+            findings.append(
+                Finding(
+                    "overlap",
+                    element.get("selector", "?"),
+                    f"Text overlaps {other.get('selector', '?')} by {int(overlap_w)}x{int(overlap_h)}px",
+                )
+            )
+        active.append((element, rect))
+    return findings
+
+
+def _check_spacing(rects: list[tuple[dict[str, Any], tuple[float, float, float, float]]], grid: int) -> Finding | None:
+    if grid <= 1:
+        return None
+    columns: dict[int, list[tuple[dict[str, Any], tuple[float, float, float, float]]]] = defaultdict(list)
+    for element, rect in rects:
+        columns[round(rect[0])].append((element, rect))
+    gaps = 0
+    off_grid: list[tuple[str, int]] = []
+    for column in columns.values():
+        column.sort(key=lambda item: item[1][1])
+        for (_, above), (element, below) in zip(column, column[1:], strict=False):
+            gap = round(below[1] - (above[1] + above[3]))
+            if gap <= 0 or gap > _MAX_GAP:
+                continue
+            gaps += 1
+            remainder = gap % grid
+            if min(remainder, grid - remainder) > 1:
+                off_grid.append((element.get("selector", "?"), gap))
+    if gaps < _OFF_GRID_MIN_GAPS or len(off_grid) / gaps < _OFF_GRID_MIN_RATIO:
+        return None
+    selector, gap = off_grid[0]
+    return Finding(
+        "off_grid_spacing",
+        selector,
+        f"{len(off_grid)} of {gaps} vertical gaps are off the {grid}px spacing grid (e.g. {gap}px)",
+    )
+
+
+def prescreen(snapshot: dict[str, Any], *, grid_px: int = 8, oversize_ratio: float = 4.0) -> PrescreenReport:
+    """Run cheap layout and accessibility checks over a DOM snapshot from the screenshot service."""
+    elements = [element for element in snapshot.get("elements") or [] if isinstance(element, dict)]
+    dpr = float(snapshot.get("device_pixel_ratio") or 1.0)
+    report = PrescreenReport(elements=len(elements))
+    texts: list[tuple[dict[str, Any], tuple[float, float, float, float]]] = []
+    blocks: list[tuple[dict[str, Any], tuple[float, float, float, float]]] = []
+    for element in elements:
+        rect = _rect(element)
+        if rect is None:
+            continue
+        blocks.append((element, rect))
+        if element.get("tag") == "img":
+            report.findings.extend(_check_image(element, rect, dpr, oversize_ratio))
+            continue
+        texts.append((element, rect))
+        finding = _check_contrast(element)
+        if finding is not None:
+            report.findings.append(finding)
+    report.findings.extend(_check_overlaps(texts))
+    spacing = _check_spacing(blocks, grid_px)
+    if spacing is not None:
+        report.findings.append(spacing)
+    report.findings.sort(key=lambda finding: -finding.weight)
+    return report
+
+
+__all__ = ["CHECK_WEIGHTS", "Finding", "PrescreenReport", "contrast_ratio", "parse_color", "prescreen"]
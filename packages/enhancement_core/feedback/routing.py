@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Any
+
+SEVERITIES = ("none", "minor", "major")
+
+
+@dataclass
+class TierResult:
+    tier: str
+    model: str | None
+    latency_seconds: float
+    input_tokens: int | None
+    total_tokens: int | None
+    confidence: float | None = None
+    severity: str | None = None
+    escalation: str | None = None
+
+
+def triage_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """Extend the feedback schema with the confidence and severity fields the triage tier must return."""
+    properties = dict(schema.get("properties") or {})
+    properties["confidence"] = {
+        "type": "number",
+        "description": "Confidence from 0 to 1 that this is the most valuable next change for the page.",
+    }
+    properties["severity"] = {
+        "type": "string",
+        "enum": list(SEVERITIES),
+        "description": "Severity of the worst issue found; none when the page has no significant issues.",
+    }
+    required = list(dict.fromkeys([*(schema.get("required") or []), "confidence", "severity"]))
+    return {**schema, "properties": properties, "required": required}
+
+
+def parse_triage(parsed: dict[str, Any]) -> tuple[float | None, str | None]:
+    confidence = parsed.get("confidence")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        confidence = None
+    else:
+        confidence = min(1.0, max(0.0, float(confidence)))
+    severity = parsed.get("severity")
+    if severity not in SEVERITIES:
+        severity = None
+    return confidence, severity
+
+
+def escalation_reason(confidence: float | None, severity: str | None, min_confidence: float) -> str | None:
+    """Return why the triage answer should go to the primary model, or None to keep it.
+
+    A clean bill of health from the small model is the answer most worth a second opinion.
+    """
+    if confidence is None or confidence < min_confidence:
+        return "low_confidence"
+    if severity is None or severity == "none":
+        return "no_significant_issues"
+    return None
+
+
+__all__ = ["SEVERITIES", "TierResult", "escalation_reason", "parse_triage", "triage_schema"]
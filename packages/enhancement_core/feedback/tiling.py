@@ -0,0 +1,169 @@
+import io
+import logging
+import math
+from dataclasses import dataclass
+
+from enhancement_core.config import FeedbackSettings
+from PIL import Image, ImageChops, ImageStat, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+LOW_DETAIL_TOKENS = 85
+HIGH_DETAIL_TILE_TOKENS = 170
+_MAX_LONG_SIDE = 2048
+_MAX_SHORT_SIDE = 768
+_PATCH_SIZE = 512
+_FINGERPRINT_SIZE = (32, 32)
+
+
+@dataclass
+class ImageTile:
+    data: bytes
+    top: int
+    width: int
+    height: int
+    detail: str
+    estimated_tokens: int
+    left: int = 0
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Responses API vision cost of one image.
+
+    A flat base per image plus a cost per 512px square once it is scaled to fit 2048x2048 with its short
+    side at most 768px.
+    """
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+    if width <= 0 or height <= 0:
+        return LOW_DETAIL_TOKENS
+    scale = min(1.0, _MAX_LONG_SIDE / max(width, height))
+    scaled_w, scaled_h = width * scale, height * scale
+    scale = min(1.0, _MAX_SHORT_SIDE / min(scaled_w, scaled_h))
+    scaled_w, scaled_h = scaled_w * scale, scaled_h * scale
+    patches = math.ceil(scaled_w / _PATCH_SIZE) * math.ceil(scaled_h / _PATCH_SIZE)
+    return LOW_DETAIL_TOKENS + HIGH_DETAIL_TILE_TOKENS * patches
+
+
+def _tile_offsets(height: int, tile_height: int, overlap: int) -> list[int]:
+    if height <= tile_height:
+        return [0]
+    stride = max(1, tile_height - overlap)
+    offsets = list(range(0, height - tile_height, stride))
+    offsets.append(height - tile_height)
+    return offsets
+
+
+def _fingerprint(image: Image.Image) -> Image.Image:
+    return image.convert("L").resize(_FINGERPRINT_SIZE, Image.Resampling.BILINEAR)
+
+
+def _is_duplicate(fingerprint: Image.Image, kept: list[Image.Image], threshold: float) -> bool:
+    for other in kept:
+        difference = ImageChops.difference(fingerprint, other)
+        if ImageStat.Stat(difference).mean[0] <= threshold:
+            return True
+    return False
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def estimate_capture_tokens(data: bytes, settings: FeedbackSettings) -> int:
+    """Upper-bound image token cost for a capture, read from its header without decoding pixels."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        return estimate_image_tokens(_MAX_LONG_SIDE, _MAX_LONG_SIDE)
+    if not settings.tiling_enabled or height <= settings.tile_height:
+        return estimate_image_tokens(width, height)
+    offsets = _tile_offsets(height, settings.tile_height, settings.tile_overlap)
+    return len(offsets) * estimate_image_tokens(width, settings.tile_height)
+
+
+def region_tile(data: bytes, top: int, left: int) -> ImageTile:
+    """Wrap a pre-cropped region of a capture as a high-detail tile; raises ValueError when undecodable."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ValueError("region is not a decodable image") from exc
+    return ImageTile(data, top, width, height, "high", estimate_image_tokens(width, height), left=left)
+
+
+def downscale_image(data: bytes, max_width: int) -> bytes:
+    """Shrink a capture to `max_width` keeping its aspect ratio; undecodable or narrow images pass through."""
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, OSError):
+        return data
+    with source:
+        if source.width <= max_width:
+            return data
+        height = max(1, round(source.height * max_width / source.width))
+        return encode_png(source.convert("RGB").resize((max_width, height), Image.Resampling.LANCZOS))
+
+
+def split_image(data: bytes, settings: FeedbackSettings) -> list[ImageTile]:
+    """Split a tall capture into overlapping tiles sized for the vision encoder.
+
+    Captures that already fit within a single tile are returned untouched. Raises ValueError
+    when the bytes cannot be decoded as an image.
+    """
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ValueError("screenshot is not a decodable image") from exc
+    with source:
+        width, height = source.size
+        if not settings.tiling_enabled or height <= settings.tile_height:
+            detail = "high"
+            return [ImageTile(data, 0, width, height, detail, estimate_image_tokens(width, height, detail))]
+        image = source.convert("RGB")
+    tiles: list[ImageTile] = []
+    kept: list[Image.Image] = []
+    skipped = 0
+    high_detail = 0
+    for top in _tile_offsets(height, settings.tile_height, settings.tile_overlap):
+        crop = image.crop((0, top, width, min(height, top + settings.tile_height)))
+        fingerprint = _fingerprint(crop)
+        if _is_duplicate(fingerprint, kept, settings.tile_dedup_threshold):
+            skipped += 1
+            continue
+        kept.append(fingerprint)
+        busy = ImageStat.Stat(fingerprint).stddev[0] >= settings.tile_low_detail_stddev
+        detail = "high" if busy and high_detail < settings.tile_max_high_detail else "low"
+        if detail == "high":
+            high_detail += 1
+        tiles.append(
+            ImageTile(
+                data=encode_png(crop),
+                top=top,
+                width=crop.width,
+                height=crop.height,
+                detail=detail,
+                estimated_tokens=estimate_image_tokens(crop.width, crop.height, detail),
+            )
+        )
+    logger.debug(
+        "split screenshot into tiles",
+        extra={"tiles": len(tiles), "duplicates_skipped": skipped, "source_height": height},
+    )
+    return tiles
+
+
+__all__ = [
+    "ImageTile",
+    "downscale_image",
+    "encode_png",
+    "estimate_capture_tokens",
+    "estimate_image_tokens",
+    "region_tile",
+    "split_image",
+]
@@ -1,3 +1,4 @@
+from enhancement_core.orchestration.crawl import collect_crawl, enqueue_crawl, poll_crawl, trigger_crawl
 from enhancement_core.orchestration.pipeline import (
     PipelineError,
     run_pipeline,
@@ -5,4 +6,13 @@ from enhancement_core.orchestration.pipeline import (
     trigger_pipeline,
 )
 
-__all__ = ["PipelineError", "run_pipeline", "run_pipeline_iterations", "trigger_pipeline"]
+__all__ = [
+    "PipelineError",
+    "collect_crawl",
+    "enqueue_crawl",
+    "poll_crawl",
+    "run_pipeline",
+    "run_pipeline_iterations",
+    "trigger_crawl",
+    "trigger_pipeline",
+]
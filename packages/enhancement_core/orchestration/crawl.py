@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import httpx
+from enhancement_core.config import PipelineSettings
+from enhancement_core.feedback.batch import TERMINAL_BATCH_STATUSES
+from enhancement_core.orchestration.pipeline import (
+    PipelineError,
+    call_screenshot,
+    prepare_run_dir,
+    store_image,
+    write_json,
+)
+
+logger = logging.getLogger(__name__)
+
+CRAWL_MANIFEST = "crawl.json"
+
+
+def _batches_endpoint(settings: PipelineSettings) -> str:
+    return f"{settings.feedback_endpoint.rsplit('/', 1)[0]}/batches"
+
+
+def _route_slug(index: int, route: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-").lower() or "root"
+    return f"{index:03d}-{name}"[:64]
+
+
+async def _feedback_batch_request(
+    client: httpx.AsyncClient, method: str, url: str, body: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    try:
+        response = await client.request(method, url, json=body)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        raise PipelineError(f"feedback batch error: {exc.response.text}") from exc
+    except httpx.RequestError as exc:
+        raise PipelineError(f"ui feedback service unreachable: {exc}") from exc
+    return response.json()
+
+
+async def trigger_crawl(
+    routes: list[str], settings: PipelineSettings | None = None, *, artifacts_dir: Path | None = None
+) -> dict[str, Any]:
+    """Capture each route and queue them as one offline feedback batch; results are collected later."""
+    if not routes:
+        raise ValueError("at least one route is required")
+    cfg = settings or PipelineSettings()
+    crawl_dir = prepare_run_dir((artifacts_dir or cfg.artifacts_root) / "crawls", False)
+    print(f"🕸️  Crawl starting - artifacts will be saved to: {crawl_dir}")
+    entries: list[dict[str, Any]] = []
+    items: list[dict[str, Any]] = []
+    async with httpx.AsyncClient(timeout=cfg.request_timeout) as client:
+        for index, route in enumerate(routes, start=1):
+            screenshot = await call_screenshot(client, cfg, route=route)
+            custom_id = _route_slug(index, route)
+            image_path = crawl_dir / f"{custom_id}.png"
+            store_image(image_path, screenshot["image_b64"])
+            item: dict[str, Any] = {"custom_id": custom_id, "screenshot_b64": screenshot["image_b64"]}
+            snapshot = screenshot.get("dom_snapshot")
+            if cfg.feedback_input_mode != "image" and isinstance(snapshot, dict):
+                item["dom_snapshot"] = snapshot
+                item["input_mode"] = cfg.feedback_input_mode
+            items.append(item)
+            entries.append({"custom_id": custom_id, "route": route, "screenshot": str(image_path)})
+        print(f"📦 Queueing {len(items)} captures as one feedback batch...")
+        record = await _feedback_batch_request(
+            client,
+            "POST",
+            _batches_endpoint(cfg),
+            {"payload": {"items": items, "metadata": {"crawl": crawl_dir.name}}},
+        )
+    manifest = {
+        "batch_id": record["batch_id"],
+        "status": record.get("status"),
+        "submitted_at": datetime.now(timezone.utc).isoformat(),
+        "routes": entries,
+    }
+    write_json(crawl_dir / CRAWL_MANIFEST, manifest)
+    logger.info("crawl queued", extra={"batch_id": record["batch_id"], "routes": len(entries)})
+    return {"crawl_dir": str(crawl_dir), **manifest}
+
+
+async def poll_crawl(
+    crawl_dir: Path, settings: PipelineSettings | None = None, *, wait: bool = False
+) -> dict[str, Any]:
+    """Check a queued crawl's batch and merge per-route feedback into its manifest once the batch finishes."""
+    cfg = settings or PipelineSettings()
+    manifest_path = crawl_dir / CRAWL_MANIFEST
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError) as exc:
+        raise PipelineError(f"unable to read crawl manifest {manifest_path}") from exc
+    url = f"{_batches_endpoint(cfg)}/{manifest['batch_id']}"
+    deadline = time.monotonic() + cfg.batch_wait_timeout
+    async with httpx.AsyncClient(timeout=cfg.request_timeout) as client:
+        while True:
+            record = await _feedback_batch_request(client, "GET", url)
+            if record.get("status") in TERMINAL_BATCH_STATUSES or not wait:
+                break
+            if time.monotonic() + cfg.batch_poll_seconds > deadline:
+                raise PipelineError(f"batch {manifest['batch_id']} still {record.get('status')} after waiting")
+            print(f"⏳ Batch {record.get('status')}; checking again in {cfg.batch_poll_seconds:g}s...")
+            await asyncio.sleep(cfg.batch_poll_seconds)
+    manifest["status"] = record.get("status")
+    manifest["request_counts"] = record.get("request_counts")
+    results = {result["custom_id"]: result for result in record.get("results") or []}
+    for entry in manifest["routes"]:
+        result = results.get(entry["custom_id"])
+        if result is not None:
+            for key in ("feedback", "error", "model", "response_id", "total_tokens"):
+                entry[key] = result.get(key)
+    write_json(manifest_path, manifest)
+    return {"crawl_dir": str(crawl_dir), **manifest}
+
+
+def enqueue_crawl(
+    routes: list[str], settings: PipelineSettings | None = None, *, artifacts_dir: Path | None = None
+) -> dict[str, Any]:
+    return asyncio.run(trigger_crawl(routes, settings, artifacts_dir=artifacts_dir))
+
+
+def collect_crawl(crawl_dir: Path, settings: PipelineSettings | None = None, *, wait: bool = False) -> dict[str, Any]:
+    return asyncio.run(poll_crawl(crawl_dir, settings, wait=wait))
+
+
+__all__ = ["CRAWL_MANIFEST", "collect_crawl", "enqueue_crawl", "poll_crawl", "trigger_crawl"]
@@ -1,8 +1,10 @@
 import asyncio
 import base64
 import binascii
+import hashlib
 import json
 import logging
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
@@ -10,6 +12,8 @@ from typing import Any
 import httpx
 from enhancement_core.codex.options import CodexOptions
 from enhancement_core.config import PipelineSettings
+from enhancement_core.feedback.diffing import diff_captures
+from enhancement_core.feedback.prescreen import PrescreenReport, prescreen
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +22,7 @@ class PipelineError(RuntimeError):
     pass
 
 
-def _prepare_run_dir(root: Path, demo: bool) -> Path:
+def prepare_run_dir(root: Path, demo: bool) -> Path:
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
     folder = f"{timestamp}-demo" if demo else timestamp
     path = root / folder
@@ -29,7 +33,7 @@ def _prepare_run_dir(root: Path, demo: bool) -> Path:
     return path
 
 
-def _write_json(path: Path, payload: Any) -> None:
+def write_json(path: Path, payload: Any) -> None:
     try:
         path.write_text(json.dumps(payload, indent=2))
     except OSError as exc:
@@ -46,7 +50,7 @@ def _sanitize_screenshot_payload(payload: dict[str, Any]) -> dict[str, Any]:
     return sanitized
 
 
-def _store_image(path: Path, image_b64: str) -> None:
+def store_image(path: Path, image_b64: str) -> None:
     try:
         data = base64.b64decode(image_b64)
     except binascii.Error as exc:
@@ -57,11 +61,21 @@ def _store_image(path: Path, image_b64: str) -> None:
         raise PipelineError(f"unable to write screenshot artifact {path}") from exc
 
 
-async def _call_screenshot(client: httpx.AsyncClient, settings: PipelineSettings) -> dict[str, Any]:
-    print("📸 Capturing screenshot...")
+async def call_screenshot(
+    client: httpx.AsyncClient, settings: PipelineSettings, route: str | None = None
+) -> dict[str, Any]:
+    print(f"📸 Capturing screenshot{f' of {route}' if route else ''}...")
     logger.debug("requesting screenshot from %s", settings.screenshot_endpoint)
+    params: dict[str, str] = {}
+    if settings.prescreen_enabled or settings.feedback_input_mode != "image":
+        params["include_dom"] = "true"
+    if route:
+        params["path"] = route
     try:
-        response = await client.post(settings.screenshot_endpoint)
+        if params:
+            response = await client.post(settings.screenshot_endpoint, params=params)
+        else:
+            response = await client.post(settings.screenshot_endpoint)
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
         raise PipelineError(f"screenshot service error: {exc.response.text}") from exc
@@ -73,13 +87,62 @@ async def _call_screenshot(client: httpx.AsyncClient, settings: PipelineSettings
     return payload
 
 
+async def _changed_regions(
+    settings: PipelineSettings, screenshot_payload: dict[str, Any], previous_capture: bytes | None
+) -> dict[str, Any] | None:
+    """Body fields that replace the full capture with a thumbnail plus crops of what changed since last time."""
+    if not settings.diff_regions or not previous_capture:
+        return None
+    try:
+        current = base64.b64decode(screenshot_payload["image_b64"])
+    except binascii.Error:
+        return None
+    diff = await asyncio.to_thread(
+        diff_captures,
+        previous_capture,
+        current,
+        threshold=settings.diff_threshold,
+        padding=settings.diff_padding_px,
+        max_changed_ratio=settings.diff_max_changed_ratio,
+        thumbnail_width=settings.diff_thumbnail_width,
+    )
+    if diff is None:
+        return None
+    print(f"✂️  Sending {len(diff.regions)} changed regions ({diff.changed_ratio:.0%} of the page)")
+    return {
+        "screenshot_b64": base64.b64encode(diff.thumbnail).decode("utf-8"),
+        "regions": [
+            {"image_b64": base64.b64encode(region.data).decode("utf-8"), "top": region.top, "left": region.left}
+            for region in diff.regions
+        ],
+        "changed_ratio": round(diff.changed_ratio, 4),
+    }
+
+
 async def _call_feedback(
-    client: httpx.AsyncClient, settings: PipelineSettings, screenshot_payload: dict[str, Any]
+    client: httpx.AsyncClient,
+    settings: PipelineSettings,
+    screenshot_payload: dict[str, Any],
+    previous_response_id: str | None = None,
+    escalate: bool = True,
+    previous_capture: bytes | None = None,
 ) -> dict[str, Any]:
     print("🧠 Analyzing screenshot for feedback...")
     logger.debug("requesting ui feedback from %s", settings.feedback_endpoint)
+    changed = await _changed_regions(settings, screenshot_payload, previous_capture)
     try:
-        body = {"screenshot_b64": screenshot_payload["image_b64"]}
+        body: dict[str, Any] = {"screenshot_b64": screenshot_payload["image_b64"]}
+        if changed is not None:
+            body["screenshot_b64"] = changed["screenshot_b64"]
+            body["regions"] = changed["regions"]
+        if previous_response_id:
+            body["previous_response_id"] = previous_response_id
+        if not escalate:
+            body["escalate"] = False
+        snapshot = screenshot_payload.get("dom_snapshot")
+        if settings.feedback_input_mode != "image" and isinstance(snapshot, dict):
+            body["dom_snapshot"] = snapshot
+            body["input_mode"] = settings.feedback_input_mode
         response = await client.post(settings.feedback_endpoint, json={"payload": body})
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
@@ -90,29 +153,152 @@ async def _call_feedback(
     feedback = payload.get("feedback")
     if not isinstance(feedback, str) or not feedback.strip():
         raise PipelineError("ui feedback response missing feedback")
+    if changed is not None:
+        payload["changed_regions"] = {"regions": len(changed["regions"]), "changed_ratio": changed["changed_ratio"]}
     return payload
 
 
+def _jobs_endpoint(settings: PipelineSettings) -> str:
+    return f"{settings.router_endpoint.rsplit('/', 1)[0]}/jobs"
+
+
+async def _await_router_job(client: httpx.AsyncClient, settings: PipelineSettings, job_id: str) -> dict[str, Any]:
+    """Long-poll a router job until it finishes.
+
+    Each poll returns well inside the client timeout, and a dropped connection just polls again because the
+    job keeps running on the router.
+    """
+    url = f"{_jobs_endpoint(settings)}/{job_id}"
+    wait = max(1.0, min(30.0, settings.request_timeout / 2))
+    deadline = time.monotonic() + settings.router_job_timeout
+    while True:
+        try:
+            response = await client.get(url, params={"wait": wait})
+            response.raise_for_status()
+            job = response.json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+        except httpx.HTTPStatusError as exc:
+            raise PipelineError(f"router job error: {exc.response.text}") from exc
+        except httpx.RequestError as exc:
+            logger.warning("router job poll failed, retrying: %s", exc)
+            await asyncio.sleep(settings.retry_backoff_seconds)
+        if time.monotonic() > deadline:
+            raise PipelineError(f"router job {job_id} unfinished after {settings.router_job_timeout:g}s")
+
+
+async def _stream_router(client: httpx.AsyncClient, endpoint: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """Read the router's NDJSON stream, reporting each item as it lands, and rebuild the batch response."""
+    results: list[dict[str, Any]] = []
+    summary: dict[str, Any] | None = None
+    try:
+        async with client.stream("POST", endpoint, json=payload, params={"stream": "true"}) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise PipelineError(f"router error: {response.text}")
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "summary":
+                    summary = event
+                    continue
+                result = event["result"]
+                results.append(result)
+                print(f"📨 Router item {result.get('index', len(results) - 1)} finished: {result.get('status')}")
+    except httpx.RequestError as exc:
+        raise PipelineError(f"router service unreachable: {exc}") from exc
+    except (ValueError, KeyError) as exc:
+        raise PipelineError(f"router stream sent a malformed line: {exc}") from exc
+    if summary is None:
+        raise PipelineError("router stream ended before its summary line")
+    return {"status": summary["status"], "results": sorted(results, key=lambda result: result.get("index", 0))}
+
+
+def _idempotency_key(run_dir: Path, feedback_payload: dict[str, Any]) -> str:
+    """Same key for the same feedback across a run's attempts, so the router never applies it twice."""
+    digest = hashlib.sha256(feedback_payload["feedback"].encode("utf-8")).hexdigest()[:16]
+    return f"{run_dir.name}-{digest}"
+
+
 async def _call_router(
     client: httpx.AsyncClient,
     settings: PipelineSettings,
     feedback_payload: dict[str, Any],
     codex_options: CodexOptions | None = None,
+    idempotency_key: str | None = None,
 ) -> dict[str, Any]:
     feedback = feedback_payload["feedback"]
     print("🚀 Applying feedback with Codex...")
-    logger.debug("dispatching feedback to %s", settings.router_endpoint)
+    endpoint = _jobs_endpoint(settings) if settings.router_jobs else settings.router_endpoint
+    logger.debug("dispatching feedback to %s", endpoint)
     payload: dict[str, Any] = {"payload": {"feedback": feedback}}
     if codex_options:
         payload["payload"]["codex_options"] = codex_options.model_dump(exclude_none=True)
+    if idempotency_key:
+        payload["payload"]["idempotency_key"] = idempotency_key
+    if settings.router_stream and not settings.router_jobs:
+        return await _stream_router(client, endpoint, payload)
     try:
-        response = await client.post(settings.router_endpoint, json=payload)
+        response = await client.post(endpoint, json=payload)
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
         raise PipelineError(f"router error: {exc.response.text}") from exc
     except httpx.RequestError as exc:
         raise PipelineError(f"router service unreachable: {exc}") from exc
-    return response.json()
+    if not settings.router_jobs:
+        return response.json()
+    job = await _await_router_job(client, settings, response.json()["jobs"][0]["job_id"])
+    return {
+        "status": "submitted" if job["status"] == "succeeded" else "partial-error",
+        "job_id": job["job_id"],
+        "results": [job["result"]],
+    }
+
+
+def _prescreen(settings: PipelineSettings, screenshot_payload: dict[str, Any]) -> tuple[str, PrescreenReport | None]:
+    """Decide how to source feedback: "model", "downgrade", "skip", or "direct" (pre-screen findings)."""
+    snapshot = screenshot_payload.get("dom_snapshot")
+    if not settings.prescreen_enabled or not isinstance(snapshot, dict):
+        return "model", None
+    report = prescreen(snapshot, grid_px=settings.prescreen_grid_px, oversize_ratio=settings.prescreen_oversize_ratio)
+    if report.score >= settings.prescreen_min_score:
+        action = "direct" if settings.prescreen_direct_findings else "model"
+    else:
+        action = settings.prescreen_clean_action
+    logger.info("pre-screen complete", extra={"action": action, **report.summary()})
+    return action, report
+
+
+async def _gather_feedback(
+    client: httpx.AsyncClient,
+    settings: PipelineSettings,
+    screenshot_payload: dict[str, Any],
+    previous_response_id: str | None,
+    previous_capture: bytes | None = None,
+) -> dict[str, Any]:
+    action, report = _prescreen(settings, screenshot_payload)
+    if report is None:
+        return await _call_feedback(
+            client, settings, screenshot_payload, previous_response_id, previous_capture=previous_capture
+        )
+    if action == "direct":
+        print(f"🔎 Pre-screen found {len(report.findings)} issues; sending them to Codex directly")
+        feedback_payload: dict[str, Any] = {"feedback": report.feedback_text(), "source": "prescreen"}
+    elif action == "skip":
+        print("🔎 Pre-screen found no significant issues; skipping feedback")
+        feedback_payload = {"feedback": None, "source": "prescreen"}
+    else:
+        feedback_payload = await _call_feedback(
+            client,
+            settings,
+            screenshot_payload,
+            previous_response_id,
+            escalate=action != "downgrade",
+            previous_capture=previous_capture,
+        )
+    feedback_payload["prescreen"] = {"action": action, **report.summary()}
+    return feedback_payload
 
 
 def _store_attempt_artifacts(
@@ -124,12 +310,12 @@ def _store_attempt_artifacts(
     print(f"💾 Saving artifacts to {attempt_dir}")
     # Sanitize screenshot payload to avoid logging full base64 string
     sanitized_screenshot = _sanitize_screenshot_payload(screenshot_payload)
-    _write_json(attempt_dir / "screenshot.json", sanitized_screenshot)
-    _write_json(attempt_dir / "feedback.json", feedback_payload)
-    _write_json(attempt_dir / "router.json", router_payload)
+    write_json(attempt_dir / "screenshot.json", sanitized_screenshot)
+    write_json(attempt_dir / "feedback.json", feedback_payload)
+    write_json(attempt_dir / "router.json", router_payload)
     image_b64 = screenshot_payload.get("image_b64")
     if isinstance(image_b64, str):
-        _store_image(attempt_dir / "screenshot.png", image_b64)
+        store_image(attempt_dir / "screenshot.png", image_b64)
 
 
 async def trigger_pipeline(
@@ -138,10 +324,18 @@ async def trigger_pipeline(
     demo: bool = False,
     artifacts_dir: Path | None = None,
     codex_options: CodexOptions | None = None,
+    previous_response_id: str | None = None,
+    previous_capture: Path | None = None,
 ) -> dict[str, Any]:
     cfg = settings or PipelineSettings()
     root = artifacts_dir or cfg.artifacts_root
-    run_dir = _prepare_run_dir(root, demo)
+    previous_bytes: bytes | None = None
+    if previous_capture is not None:
+        try:
+            previous_bytes = previous_capture.read_bytes()
+        except OSError:
+            logger.warning("previous capture %s unreadable; sending the full screenshot", previous_capture)
+    run_dir = prepare_run_dir(root, demo)
     print(f"📁 Pipeline starting - artifacts will be saved to: {run_dir}")
     async with httpx.AsyncClient(timeout=cfg.request_timeout) as client:
         last_error: PipelineError | None = None
@@ -154,14 +348,22 @@ async def trigger_pipeline(
                     raise PipelineError(f"unable to prepare attempt directory {attempt_dir}") from exc
             print(f"🎯 Starting attempt {attempt}/{cfg.max_attempts}")
             try:
-                screenshot_payload = await _call_screenshot(client, cfg)
-                feedback_payload = await _call_feedback(client, cfg, screenshot_payload)
-                router_payload = await _call_router(client, cfg, feedback_payload, codex_options)
+                screenshot_payload = await call_screenshot(client, cfg)
+                feedback_payload = await _gather_feedback(
+                    client, cfg, screenshot_payload, previous_response_id, previous_bytes
+                )
+                if feedback_payload.get("feedback"):
+                    router_payload = await _call_router(
+                        client, cfg, feedback_payload, codex_options, _idempotency_key(run_dir, feedback_payload)
+                    )
+                else:
+                    router_payload = {"status": "skipped", "reason": "pre-screen found no significant issues"}
                 _store_attempt_artifacts(attempt_dir, screenshot_payload, feedback_payload, router_payload)
                 print(f"✅ Attempt {attempt} completed successfully!")
                 return {
                     "artifacts_dir": str(run_dir),
                     "attempt": attempt,
+                    "screenshot_path": str(attempt_dir / "screenshot.png"),
                     "screenshot": _sanitize_screenshot_payload(screenshot_payload),
                     "feedback": feedback_payload,
                     "router": router_payload,
@@ -183,14 +385,43 @@ def run_pipeline(
     demo: bool = False,
     artifacts_dir: Path | None = None,
     codex_options: CodexOptions | None = None,
+    previous_response_id: str | None = None,
+    previous_capture: Path | None = None,
 ) -> dict[str, Any]:
     try:
-        return asyncio.run(trigger_pipeline(settings, demo=demo, artifacts_dir=artifacts_dir, codex_options=codex_options))
+        return asyncio.run(
+            trigger_pipeline(
+                settings,
+                demo=demo,
+                artifacts_dir=artifacts_dir,
+                codex_options=codex_options,
+                previous_response_id=previous_response_id,
+                previous_capture=previous_capture,
+            )
+        )
     except PipelineError as exc:
         logger.error("pipeline failed: %s", str(exc))
         raise
 
 
+def _token_usage(feedback_payload: Any) -> dict[str, Any] | None:
+    if not isinstance(feedback_payload, dict):
+        return None
+    input_tokens = feedback_payload.get("input_tokens")
+    cached_tokens = feedback_payload.get("cached_tokens") or 0
+    if not isinstance(input_tokens, int):
+        return None
+    usage = {
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "uncached_input_tokens": input_tokens - cached_tokens,
+        "chained": bool(feedback_payload.get("previous_response_id")),
+    }
+    if feedback_payload.get("input_mode"):
+        usage["input_mode"] = feedback_payload["input_mode"]
+    return usage
+
+
 def run_pipeline_iterations(
     iterations: int,
     settings: PipelineSettings | None = None,
@@ -198,14 +429,26 @@ def run_pipeline_iterations(
     demo: bool = False,
     artifacts_dir: Path | None = None,
     codex_options: CodexOptions | None = None,
+    chain: bool | None = None,
 ) -> list[dict[str, Any]]:
     if iterations < 1:
         raise ValueError("iterations must be at least 1")
+    cfg = settings or PipelineSettings()
+    chain_enabled = chain if chain is not None else cfg.chain_iterations
     results: list[dict[str, Any]] = []
+    previous_response_id: str | None = None
+    previous_capture: Path | None = None
     for iteration in range(1, iterations + 1):
         logger.debug("starting pipeline iteration %d/%d", iteration, iterations)
         try:
-            result = run_pipeline(settings, demo=demo, artifacts_dir=artifacts_dir, codex_options=codex_options)
+            result = run_pipeline(
+                settings,
+                demo=demo,
+                artifacts_dir=artifacts_dir,
+                codex_options=codex_options,
+                previous_response_id=previous_response_id if chain_enabled else None,
+                previous_capture=previous_capture if cfg.diff_regions else None,
+            )
         except PipelineError as exc:
             logger.error("pipeline iteration %d/%d failed: %s", iteration, iterations, str(exc))
             raise
@@ -213,10 +456,27 @@ def run_pipeline_iterations(
         if "screenshot" in result and isinstance(result["screenshot"], dict):
             result["screenshot"] = _sanitize_screenshot_payload(result["screenshot"])
         result["iteration"] = iteration
+        feedback_payload = result.get("feedback")
+        usage = _token_usage(feedback_payload)
+        if usage is not None:
+            result["token_usage"] = usage
+        if isinstance(feedback_payload, dict):
+            previous_response_id = feedback_payload.get("response_id") or previous_response_id
+        if result.get("screenshot_path"):
+            previous_capture = Path(result["screenshot_path"])
         results.append(result)
         print(f"iteration {iteration} done! ✨")
         logger.debug("completed pipeline iteration %d/%d", iteration, iterations)
     return results
 
 
-__all__ = ["PipelineError", "run_pipeline", "run_pipeline_iterations", "trigger_pipeline"]
+__all__ = [
+    "PipelineError",
+    "call_screenshot",
+    "prepare_run_dir",
+    "run_pipeline",
+    "run_pipeline_iterations",
+    "store_image",
+    "trigger_pipeline",
+    "write_json",
+]
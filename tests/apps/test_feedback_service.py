@@ -0,0 +1,402 @@
+import asyncio
+import base64
+import importlib
+import io
+import json
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import httpx
+import pytest
+from enhancement_core.config import FeedbackSettings, MockResponsesSettings
+from enhancement_core.feedback import FeedbackRateLimitError, FeedbackResponse, prepare_input
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from PIL import Image
+
+from apps.feedback_service.app import app
+from apps.feedback_service.dependencies import (
+    get_feedback_settings,
+    get_key_pool,
+    get_preprocessor,
+    get_rate_limiter,
+)
+from apps.feedback_service.fetch_cache import ScreenshotCache
+from apps.feedback_service.key_pool import ApiKeyPool, parse_reset
+from apps.feedback_service.limiter import RateLimitTimeout, ResponsesRateLimiter
+from apps.feedback_service.preprocess import TIMING_STAGES, PreprocessJob, PreprocessPool, PreprocessUnavailable
+from apps.feedback_service.singleflight import SingleFlight, request_key
+from apps.mock_responses.app import app as mock_app
+from apps.mock_responses.dependencies import get_mock_settings, get_simulator
+from apps.mock_responses.simulator import ResponsesSimulator
+
+app_module = importlib.import_module("apps.feedback_service.app")
+
+
+@pytest.fixture(autouse=True)
+def reset_overrides(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    app.dependency_overrides.clear()
+    yield
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def feedback_settings(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps({"type": "object"}))
+    return FeedbackSettings(schema_path=schema, OPENAI_API_KEY="sk-test")
+
+
+def setup_test_client(settings: FeedbackSettings, limiter: ResponsesRateLimiter) -> TestClient:
+    app.dependency_overrides[get_feedback_settings] = lambda: settings
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    return TestClient(app)
+
+
+async def test_limiter_rejects_requests_past_deadline():
+    limiter = ResponsesRateLimiter(requests_per_minute=60, tokens_per_minute=1000, queue_timeout=0.1)
+    await limiter.acquire(1000)
+    with pytest.raises(RateLimitTimeout) as exc_info:
+        await limiter.acquire(500)
+    assert exc_info.value.retry_after > 0.1
+    snapshot = limiter.snapshot()
+    assert snapshot["admitted"] == 1
+    assert snapshot["rejected"] == 1
+    assert snapshot["queue_depth"] == 0
+
+
+async def test_limiter_pause_delays_admission():
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    limiter.pause(0.2)
+    waited = await asyncio.wait_for(limiter.acquire(10), timeout=2)
+    assert waited >= 0.15
+
+
+def test_feedback_requeues_after_upstream_throttle(monkeypatch, feedback_settings):
+    calls: list[str | None] = []
+
+    def fake_request_feedback(
+        image_bytes,
+        text,
+        settings,
+        previous_response_id=None,
+        client=None,
+        escalate=True,
+        dom_snapshot=None,
+        regions=None,
+        prepared=None,
+    ):
+        calls.append(text)
+        if len(calls) == 1:
+            raise FeedbackRateLimitError("throttled", retry_after=0.05)
+        return FeedbackResponse(feedback="Ship it", model="gpt-test", response_id="resp-1", total_tokens=10)
+
+    monkeypatch.setattr(app_module, "request_feedback", fake_request_feedback)
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    with setup_test_client(feedback_settings, limiter) as client:
+        response = client.post("/feedback", json={"payload": {"text": "Tighten hero"}})
+        health = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["feedback"] == "Ship it"
+    assert calls == ["Tighten hero", "Tighten hero"]
+    assert health.json()["rate_limiter"]["throttled"] == 1
+
+
+async def test_sdk_rate_limits_reach_the_limiter(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps({"type": "object", "properties": {"feedback": {"type": "string"}}}))
+    settings = FeedbackSettings(schema_path=schema, OPENAI_API_KEY="sk-test")
+    mock_settings = MockResponsesSettings(
+        MOCK_RESPONSES_LATENCY_DISTRIBUTION="fixed",
+        MOCK_RESPONSES_LATENCY_MS=0,
+        MOCK_RESPONSES_429_EVERY=2,
+        MOCK_RESPONSES_429_BURST=1,
+        MOCK_RESPONSES_RETRY_AFTER=0.05,
+    )
+    simulator = ResponsesSimulator(mock_settings)
+    simulator.request_count = 2
+    mock_app.dependency_overrides[get_simulator] = lambda: simulator
+    mock_app.dependency_overrides[get_mock_settings] = lambda: mock_settings
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    pool = ApiKeyPool(settings.credentials(), timeout=5)
+    try:
+        with TestClient(mock_app) as upstream:
+            slot = pool.slots[0]
+            slot.client = slot.client.with_options(base_url="http://testserver/v1", http_client=upstream)
+            response, _ = await app_module.call_with_limits(
+                prepare_input(None, "Tighten hero", settings), "Tighten hero", settings, limiter, pool
+            )
+    finally:
+        mock_app.dependency_overrides.clear()
+        pool.close()
+    assert response.feedback
+    assert simulator.request_count == 4
+    assert limiter.snapshot()["throttled"] == 1
+    assert pool.snapshot()[0]["throttle_count"] == 1
+
+
+async def test_feedback_fails_over_to_another_api_key(monkeypatch, tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text("{}")
+    settings = FeedbackSettings(schema_path=schema, OPENAI_API_KEY="sk-first", OPENAI_API_KEYS="sk-second:org-2")
+    used: list[str] = []
+
+    def fake_request_feedback(
+        image_bytes,
+        text,
+        settings,
+        previous_response_id=None,
+        client=None,
+        escalate=True,
+        dom_snapshot=None,
+        regions=None,
+        prepared=None,
+    ):
+        used.append(client.api_key)
+        if len(used) == 1:
+            raise FeedbackRateLimitError("throttled", retry_after=30)
+        return FeedbackResponse(feedback="Ship it", model="gpt-test", response_id="resp-1", total_tokens=10)
+
+    monkeypatch.setattr(app_module, "request_feedback", fake_request_feedback)
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    pool = ApiKeyPool(settings.credentials(), timeout=5)
+    response, _ = await app_module.call_with_limits(
+        prepare_input(None, "Tighten hero", settings), "Tighten hero", settings, limiter, pool
+    )
+    pool.close()
+    assert response.feedback == "Ship it"
+    assert used == ["sk-first", "sk-second"]
+    assert limiter.snapshot()["throttled"] == 0
+    assert limiter.snapshot()["admitted"] == 1
+    snapshot = pool.snapshot()
+    assert [entry["throttled"] for entry in snapshot] == [True, False]
+    assert [entry["in_flight"] for entry in snapshot] == [0, 0]
+
+
+def test_key_pool_prefers_key_with_most_remaining_tokens():
+    pool = ApiKeyPool(FeedbackSettings(OPENAI_API_KEY="sk-aaaa", OPENAI_API_KEYS="sk-bbbb").credentials(), timeout=5)
+    first, second = pool.slots
+    first.observe(
+        httpx.Response(
+            200,
+            headers={"x-ratelimit-remaining-tokens": "100", "x-ratelimit-reset-tokens": "6m0s"},
+        )
+    )
+    second.observe(
+        httpx.Response(
+            200,
+            headers={"x-ratelimit-remaining-tokens": "90000", "x-ratelimit-reset-tokens": "1s"},
+        )
+    )
+    assert pool.acquire() is second
+    pool.close()
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("250ms") == 0.25
+    assert parse_reset(None) is None
+
+
+async def test_fetch_url_revalidates_cached_screenshots(feedback_settings):
+    seen: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"png-bytes", headers={"etag": '"v1"'})
+
+    cache = ScreenshotCache(max_entries=4, max_bytes=1024)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await app_module.fetch_url(client, "http://shots/a.png", cache, feedback_settings)
+        second = await app_module.fetch_url(client, "http://shots/a.png", cache, feedback_settings)
+    assert first == second == b"png-bytes"
+    assert seen == [None, '"v1"']
+    assert cache.snapshot() == {"entries": 1, "bytes": 9, "hits": 1, "misses": 1}
+
+
+async def test_fetch_url_serves_revalidated_entry_evicted_in_flight(feedback_settings):
+    cache = ScreenshotCache(max_entries=4, max_bytes=1024)
+    cache.store("http://shots/a.png", b"png-bytes", '"v1"', None)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        cache.discard("http://shots/a.png")
+        return httpx.Response(304)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        body = await app_module.fetch_url(client, "http://shots/a.png", cache, feedback_settings)
+    assert body == b"png-bytes"
+    assert cache.snapshot()["hits"] == 1
+
+
+async def test_fetch_url_retries_unconditionally_after_unmatched_304(feedback_settings):
+    seen: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("if-none-match"))
+        if len(seen) == 1:
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"png-bytes", headers={"etag": '"v2"'})
+
+    cache = ScreenshotCache(max_entries=4, max_bytes=1024)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        body = await app_module.fetch_url(client, "http://shots/a.png", cache, feedback_settings)
+    assert body == b"png-bytes"
+    assert seen == [None, None]
+    assert cache.snapshot()["misses"] == 1
+
+
+async def test_fetch_url_rejects_oversized_downloads(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text("{}")
+    settings = FeedbackSettings(schema_path=schema, OPENAI_API_KEY="sk-test", UI_FEEDBACK_FETCH_MAX_BYTES=2048)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"x" * 4096)
+
+    cache = ScreenshotCache(max_entries=4, max_bytes=1 << 20)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(HTTPException) as exc_info:
+            await app_module.fetch_url(client, "http://shots/huge.png", cache, settings)
+    assert exc_info.value.status_code == 424
+    assert cache.snapshot()["entries"] == 0
+
+
+async def test_singleflight_shares_one_call_between_duplicates():
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls: list[int] = []
+
+    async def factory():
+        calls.append(1)
+        started.set()
+        await release.wait()
+        return "feedback"
+
+    singleflight = SingleFlight()
+    key = request_key(b"image", "text", "prompt", "model", None)
+    leader = asyncio.create_task(singleflight.do(key, factory))
+    await started.wait()
+    follower = asyncio.create_task(singleflight.do(key, factory))
+    other = asyncio.create_task(singleflight.do(request_key(b"image", "other", "prompt", "model", None), factory))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+    assert await follower == ("feedback", True)
+    assert await other == ("feedback", False)
+    assert len(calls) == 2
+    assert singleflight.snapshot() == {"in_flight": 0, "saved_calls": 1}
+
+
+def test_batch_endpoints_round_trip_through_mock_responses(monkeypatch, tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps({"type": "object", "properties": {"feedback": {"type": "string"}}}))
+    settings = FeedbackSettings(
+        schema_path=schema, OPENAI_API_KEY="sk-test", UI_FEEDBACK_BATCH_DIR=tmp_path / "batches"
+    )
+    mock_settings = MockResponsesSettings(
+        MOCK_RESPONSES_LATENCY_DISTRIBUTION="fixed", MOCK_RESPONSES_LATENCY_MS=0, MOCK_RESPONSES_FEEDBACK_TEXT="Fix nav"
+    )
+    monkeypatch.setattr("apps.mock_responses.dependencies.get_mock_settings", lambda: mock_settings)
+    pool = ApiKeyPool(settings.credentials(), timeout=5)
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    items = [{"custom_id": "home", "text": "Review the home page"}, {"custom_id": "pricing", "text": "Review pricing"}]
+    with TestClient(mock_app) as upstream:
+        for slot in pool.slots:
+            slot.client = OpenAI(api_key="sk-test", base_url="http://testserver/v1", http_client=upstream)
+        app.dependency_overrides[get_key_pool] = lambda: pool
+        with setup_test_client(settings, limiter) as client:
+            queued = client.post("/batches", json={"payload": {"items": items}})
+            batch_id = queued.json()["batch_id"]
+            polled = client.get(f"/batches/{batch_id}")
+            unknown = client.get("/batches/batch_missing")
+            duplicate = client.post("/batches", json={"payload": {"items": [items[0], items[0]]}})
+    pool.close()
+    assert queued.status_code == 202
+    assert (tmp_path / "batches" / f"{batch_id}.json").exists()
+    body = polled.json()
+    assert body["status"] == "completed"
+    assert [(result["custom_id"], result["feedback"]) for result in body["results"]] == [
+        ("home", "Fix nav"),
+        ("pricing", "Fix nav"),
+    ]
+    assert limiter.snapshot()["admitted"] == 0
+    assert unknown.status_code == 404
+    assert duplicate.status_code == 422
+
+
+def encoded_image(width: int, height: int, image_format: str = "PNG") -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format=image_format)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def test_feedback_preprocesses_captures_in_worker_pool(monkeypatch, feedback_settings):
+    seen: list = []
+
+    def fake_request_feedback(image_bytes, text, settings, prepared=None, **_):
+        seen.append((image_bytes, prepared))
+        return FeedbackResponse(feedback="Ship it", model="gpt-test", response_id="resp-1", total_tokens=10)
+
+    monkeypatch.setattr(app_module, "request_feedback", fake_request_feedback)
+    preprocessor = PreprocessPool(workers=1, max_pending=4)
+    app.dependency_overrides[get_preprocessor] = lambda: preprocessor
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=1000000, queue_timeout=5)
+    with setup_test_client(feedback_settings, limiter) as client:
+        response = client.post("/feedback", json={"payload": {"screenshot_b64": encoded_image(3000, 400)}})
+        rejected = client.post("/feedback", json={"payload": {"screenshot_b64": encoded_image(64, 64, "GIF")}})
+        health = client.get("/health")
+    preprocessor.close()
+    assert response.status_code == 200
+    timing = response.json()["timing"]
+    assert set(timing) == {*TIMING_STAGES, "model_ms"}
+    assert timing["decode_ms"] > 0
+    image_bytes, prepared = seen[0]
+    assert image_bytes is None
+    widths = [
+        Image.open(io.BytesIO(base64.b64decode(item["image_url"].split(",", 1)[1]))).width
+        for message in prepared.input_items
+        for item in message["content"]
+        if item["type"] == "input_image"
+    ]
+    assert widths and max(widths) <= feedback_settings.max_image_width
+    assert rejected.status_code == 400
+    assert "GIF" in rejected.json()["detail"]["message"]
+    assert health.json()["preprocess"]["completed"] == 1
+
+
+async def test_preprocess_pool_restarts_a_broken_pool_once(feedback_settings):
+    class BrokenExecutor:
+        shutdowns = 0
+
+        def submit(self, fn, *args):
+            future: Future = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shutdowns += 1
+
+    broken = BrokenExecutor()
+    replacement = object()
+    preprocessor = PreprocessPool(workers=0, max_pending=4)
+    preprocessor.workers = 1
+    preprocessor._executor = broken
+    preprocessor._start = lambda: replacement
+    job = PreprocessJob(settings=feedback_settings, text=None, image_bytes=b"png")
+    results = await asyncio.gather(preprocessor.run(job), preprocessor.run(job), return_exceptions=True)
+    assert all(isinstance(result, PreprocessUnavailable) for result in results)
+    assert broken.shutdowns == 1
+    assert preprocessor._executor is replacement
+
+
+def test_feedback_sheds_load_when_preprocess_queue_is_full(feedback_settings):
+    preprocessor = PreprocessPool(workers=0, max_pending=1)
+    preprocessor.pending = 1
+    app.dependency_overrides[get_preprocessor] = lambda: preprocessor
+    limiter = ResponsesRateLimiter(requests_per_minute=600, tokens_per_minute=100000, queue_timeout=5)
+    with setup_test_client(feedback_settings, limiter) as client:
+        response = client.post("/feedback", json={"payload": {"screenshot_b64": encoded_image(32, 32)}})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert preprocessor.snapshot()["rejected"] == 1
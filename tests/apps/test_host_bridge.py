@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 import pytest
@@ -5,7 +6,7 @@ from enhancement_core.codex.runner import CodexRunnerError
 from enhancement_core.config import HostBridgeSettings
 from fastapi.testclient import TestClient
 
-from apps.host_bridge.app import app
+from apps.host_bridge.app import HostPayload, app, apply_feedback
 from apps.host_bridge.dependencies import get_host_settings, get_runner
 
 
@@ -19,18 +20,22 @@ def reset_overrides():
 def make_settings(tmp_path):
     repo = tmp_path / "repo"
     repo.mkdir()
-    return HostBridgeSettings(next_path=repo)
+    return HostBridgeSettings(TARGET_REPO_PATH=repo)
 
 
 def test_apply_feedback_returns_runner_payload(tmp_path):
     runner_calls: list[dict] = []
 
+    settings = make_settings(tmp_path)
+
     class DummyRunner:
-        def run(self, feedback: str, codex_options=None):
+        def __init__(self):
+            self.settings = settings
+
+        async def run_async(self, feedback: str, codex_options=None, run_id=None):
             runner_calls.append({"feedback": feedback, "options": codex_options})
             return {"run_id": "abc", "stdout": "ok"}
 
-    settings = make_settings(tmp_path)
     app.dependency_overrides[get_host_settings] = lambda: settings
     app.dependency_overrides[get_runner] = lambda: DummyRunner()
     with TestClient(app) as client:
@@ -42,11 +47,15 @@ def test_apply_feedback_returns_runner_payload(tmp_path):
 
 
 def test_apply_feedback_surfaces_runner_errors(tmp_path):
+    settings = make_settings(tmp_path)
+
     class FailingRunner:
-        def run(self, feedback: str, codex_options=None):
+        def __init__(self):
+            self.settings = settings
+
+        async def run_async(self, feedback: str, codex_options=None, run_id=None):
             raise CodexRunnerError("failed", run_id="r1", exit_code=2, stderr="boom", log_path="/tmp/log")
 
-    settings = make_settings(tmp_path)
     app.dependency_overrides[get_host_settings] = lambda: settings
     app.dependency_overrides[get_runner] = lambda: FailingRunner()
     with TestClient(app) as client:
@@ -57,6 +66,82 @@ def test_apply_feedback_surfaces_runner_errors(tmp_path):
     assert detail["exit_code"] == 2
 
 
+def test_cancelled_handler_lets_run_finish_without_cancel_on_disconnect(tmp_path):
+    settings = make_settings(tmp_path)
+    assert settings.cancel_on_disconnect is False
+    finished: list[str] = []
+
+    class SlowRunner:
+        def __init__(self):
+            self.settings = settings
+            self.started = asyncio.Event()
+            self.release = asyncio.Event()
+
+        async def run_async(self, feedback: str, codex_options=None, run_id=None):
+            self.started.set()
+            await self.release.wait()
+            finished.append(feedback)
+            return {"run_id": "abc"}
+
+    async def scenario():
+        runner = SlowRunner()
+        handler = asyncio.ensure_future(apply_feedback(HostPayload(feedback="Keep going"), request=None, runner=runner))
+        await runner.started.wait()
+        handler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handler
+        runner.release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert finished == ["Keep going"]
+
+
+def test_cancel_run_stops_live_runs_only(tmp_path):
+    cancelled: list[str] = []
+
+    class LiveRunner:
+        def cancel(self, run_id: str) -> bool:
+            cancelled.append(run_id)
+            return run_id == "live"
+
+    app.dependency_overrides[get_runner] = lambda: LiveRunner()
+    with TestClient(app) as client:
+        accepted = client.delete("/runs/live")
+        missing = client.delete("/runs/gone")
+    assert accepted.status_code == 202
+    assert accepted.json() == {"run_id": "live", "status": "cancelling"}
+    assert missing.status_code == 404
+    assert cancelled == ["live", "gone"]
+
+
+def test_run_log_returns_output_from_offset(tmp_path):
+    class TailingRunner:
+        def tail(self, run_id: str, stream: str, offset: int, limit: int):
+            if run_id != "live":
+                return None
+            data = "planning\nediting\n"[offset : offset + limit]
+            return {
+                "run_id": run_id,
+                "stream": stream,
+                "offset": offset,
+                "next_offset": offset + len(data),
+                "data": data,
+            }
+
+    app.dependency_overrides[get_runner] = lambda: TailingRunner()
+    with TestClient(app) as client:
+        chunk = client.get("/runs/live/log", params={"offset": 9, "stream": "stderr"})
+        missing = client.get("/runs/gone/log")
+        invalid = client.get("/runs/live/log", params={"offset": -1})
+    assert chunk.status_code == 200
+    assert chunk.json()["data"] == "editing\n"
+    assert chunk.json()["stream"] == "stderr"
+    assert missing.status_code == 404
+    assert invalid.status_code == 422
+
+
 def test_health_returns_repo_path(tmp_path):
     settings = make_settings(tmp_path)
     app.dependency_overrides[get_host_settings] = lambda: settings
@@ -0,0 +1,126 @@
+import gzip
+import json
+import time
+
+import httpx
+import pytest
+from enhancement_core.config import MockResponsesSettings
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from openai.types.responses import Response as ResponsesModel
+
+from apps.mock_responses.app import app
+from apps.mock_responses.dependencies import get_mock_settings, get_upstream_client
+
+REQUEST_BODY = {
+    "model": "gpt-test",
+    "instructions": "Review the page",
+    "input": [{"role": "user", "content": [{"type": "input_text", "text": "Hello"}]}],
+    "text": {
+        "format": {
+            "type": "json_schema",
+            "name": "ui_feedback",
+            "schema": {"type": "object", "properties": {"feedback": {"type": "string"}}, "required": ["feedback"]},
+        }
+    },
+    "max_output_tokens": 500,
+}
+
+
+class DummyUpstream:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def post(self, url: str, content=None, headers=None):
+        self.calls.append({"url": url, "headers": headers})
+        request = httpx.Request("POST", url)
+        body = gzip.compress(b'{"id":"resp_real","output":[],"usage":{"total_tokens":7}}')
+        headers = {"content-type": "application/json", "content-encoding": "gzip", "content-length": str(len(body))}
+        return httpx.Response(200, content=body, headers=headers, request=request)
+
+
+@pytest.fixture(autouse=True)
+def reset_overrides():
+    app.dependency_overrides.clear()
+    get_mock_settings.cache_clear()
+    yield
+    app.dependency_overrides.clear()
+    get_mock_settings.cache_clear()
+
+
+def make_settings(tmp_path, **overrides) -> MockResponsesSettings:
+    values = {
+        "MOCK_RESPONSES_LATENCY_DISTRIBUTION": "fixed",
+        "MOCK_RESPONSES_LATENCY_MS": 0,
+        "MOCK_RESPONSES_SEED": 7,
+        "MOCK_RESPONSES_CASSETTE_DIR": tmp_path / "cassettes",
+    }
+    values.update(overrides)
+    return MockResponsesSettings(**values)
+
+
+def setup_test_client(monkeypatch, settings: MockResponsesSettings) -> TestClient:
+    monkeypatch.setattr("apps.mock_responses.dependencies.get_mock_settings", lambda: settings)
+    app.dependency_overrides[get_mock_settings] = lambda: settings
+    return TestClient(app)
+
+
+def test_mock_mode_returns_schema_valid_output(tmp_path, monkeypatch):
+    settings = make_settings(tmp_path)
+    with setup_test_client(monkeypatch, settings) as client:
+        response = client.post("/v1/responses", json=REQUEST_BODY)
+    assert response.status_code == 200
+    parsed = ResponsesModel.model_validate(response.json())
+    assert json.loads(parsed.output_text) == {"feedback": settings.feedback_text}
+    assert parsed.usage is not None and parsed.usage.output_tokens == settings.output_tokens
+
+
+def test_mock_mode_injects_rate_limit_bursts(tmp_path, monkeypatch):
+    settings = make_settings(tmp_path, MOCK_RESPONSES_429_EVERY=2, MOCK_RESPONSES_429_BURST=1)
+    with setup_test_client(monkeypatch, settings) as client:
+        statuses = [client.post("/v1/responses", json=REQUEST_BODY) for _ in range(5)]
+    assert [item.status_code for item in statuses] == [200, 200, 429, 200, 429]
+    assert statuses[2].headers["retry-after"] == "1"
+    assert statuses[2].json()["error"]["code"] == "rate_limit_exceeded"
+
+
+def test_record_then_replay_is_byte_for_byte(tmp_path, monkeypatch):
+    upstream = DummyUpstream()
+    recording = make_settings(tmp_path, MOCK_RESPONSES_MODE="record")
+    app.dependency_overrides[get_upstream_client] = lambda: upstream
+    with setup_test_client(monkeypatch, recording) as client:
+        recorded = client.post("/v1/responses", json=REQUEST_BODY, headers={"authorization": "Bearer sk-real"})
+    assert upstream.calls[0]["headers"]["authorization"] == "Bearer sk-real"
+    assert recorded.json()["id"] == "resp_real"
+    assert "content-encoding" not in recorded.headers
+    replaying = make_settings(tmp_path, MOCK_RESPONSES_MODE="replay")
+    reordered = json.loads(json.dumps(REQUEST_BODY, sort_keys=True))
+    with setup_test_client(monkeypatch, replaying) as client:
+        replayed = client.post("/v1/responses", json=reordered)
+        missing = client.post("/v1/responses", json={**REQUEST_BODY, "model": "other"})
+    assert replayed.status_code == 200
+    assert replayed.content == recorded.content
+    assert missing.status_code == 404
+
+
+def test_batch_runs_uploaded_requests_after_delay(tmp_path, monkeypatch):
+    settings = make_settings(tmp_path, MOCK_RESPONSES_BATCH_DELAY=0.2)
+    lines = [
+        {"custom_id": f"page-{index}", "method": "POST", "url": "/v1/responses", "body": REQUEST_BODY}
+        for index in range(2)
+    ]
+    content = "".join(json.dumps(line) + "\n" for line in lines).encode()
+    with setup_test_client(monkeypatch, settings) as client:
+        sdk = OpenAI(api_key="sk-test", base_url="http://testserver/v1", http_client=client)
+        uploaded = sdk.files.create(file=("crawl.jsonl", content), purpose="batch")
+        batch = sdk.batches.create(input_file_id=uploaded.id, endpoint="/v1/responses", completion_window="24h")
+        assert sdk.batches.retrieve(batch.id).status == "in_progress"
+        time.sleep(0.25)
+        finished = sdk.batches.retrieve(batch.id)
+        output = sdk.files.content(finished.output_file_id).text
+    assert finished.status == "completed"
+    assert finished.request_counts is not None and finished.request_counts.completed == 2
+    results = [json.loads(line) for line in output.splitlines()]
+    assert [item["custom_id"] for item in results] == ["page-0", "page-1"]
+    body = results[0]["response"]["body"]
+    assert json.loads(body["output"][0]["content"][0]["text"]) == {"feedback": settings.feedback_text}
@@ -1,12 +1,29 @@
+import asyncio
 import json
+import sqlite3
 
 import httpx
 import pytest
 from enhancement_core.config import RouterSettings
 from fastapi.testclient import TestClient
 
+from apps.router_service.aimd import AimdLimit
 from apps.router_service.app import app
-from apps.router_service.dependencies import get_http_client, get_router_settings
+from apps.router_service.bridge import submit_feedback
+from apps.router_service.bridge_pool import BridgePool
+from apps.router_service.coalesce import Coalescer
+from apps.router_service.dependencies import (
+    get_bridge_pool,
+    get_coalescer,
+    get_http_client,
+    get_job_queue,
+    get_router_settings,
+    get_scheduler,
+    job_handler,
+)
+from apps.router_service.jobs import JobQueue, JobStore
+from apps.router_service.retry import Hedger, RetryPolicy
+from apps.router_service.scheduler import Scheduler
 
 
 class FakeResponse:
@@ -36,10 +53,13 @@ class DummyAsyncClient:
 
 
 @pytest.fixture(autouse=True)
-def reset_overrides():
+def reset_overrides(monkeypatch, tmp_path):
+    monkeypatch.setenv("ROUTER_JOB_DB", str(tmp_path / "lifespan-jobs.sqlite3"))
+    get_router_settings.cache_clear()
     app.dependency_overrides.clear()
     yield
     app.dependency_overrides.clear()
+    get_router_settings.cache_clear()
 
 
 def setup_test_client(dummy_client: DummyAsyncClient, settings: RouterSettings) -> TestClient:
@@ -80,3 +100,340 @@ def test_apply_feedback_reports_partial_failures():
     body = response.json()
     assert body["status"] == "partial-error"
     assert body["results"][1]["status"] == "error"
+
+
+def test_jobs_are_accepted_immediately_and_long_polled(tmp_path):
+    client = DummyAsyncClient([FakeResponse({"status": "ok", "run": 1}), FakeResponse({"detail": "bad"}, 502)])
+    settings = RouterSettings(
+        FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge",
+        ROUTER_MAX_CONCURRENCY=1,
+        ROUTER_JOB_DB=tmp_path / "jobs.sqlite3",
+    )
+    handler = job_handler(client, BridgePool(settings.bridges(), 3, 30), Scheduler(2, 8))
+    queue = JobQueue(JobStore(settings.job_db_path), handler, settings.max_concurrency)
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    with setup_test_client(client, settings) as test_client:
+        payload = [{"feedback": "First", "codex_options": {"reasoning_effort": "low"}}, {"feedback": "Second"}]
+        accepted = test_client.post("/jobs", json={"payload": payload})
+        first, second = accepted.json()["jobs"]
+        finished = []
+        for job in (first, second):
+            body = test_client.get(f"/jobs/{job['job_id']}").json()
+            while body["status"] not in ("succeeded", "failed"):
+                body = test_client.get(f"/jobs/{job['job_id']}", params={"wait": 5}).json()
+            finished.append(body)
+        missing = test_client.get("/jobs/unknown")
+    queue.store.close()
+    assert accepted.status_code == 202
+    assert [job["status"] for job in accepted.json()["jobs"]] == ["queued", "queued"]
+    assert [job["status"] for job in finished] == ["succeeded", "failed"]
+    assert finished[0]["result"]["result"] == {"status": "ok", "run": 1}
+    assert finished[1]["result"]["error"]["status_code"] == 502
+    assert client.calls[0]["json"] == {"feedback": "First", "codex_options": {"reasoning_effort": "low"}}
+    assert missing.status_code == 404
+
+
+def test_jobs_reuse_the_job_an_idempotency_key_already_queued(tmp_path):
+    client = DummyAsyncClient([FakeResponse({"status": "ok", "run": 1})])
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge", ROUTER_JOB_DB=tmp_path / "jobs.sqlite3")
+    handler = job_handler(client, BridgePool(settings.bridges(), 3, 30), Scheduler(2, 8))
+    queue = JobQueue(JobStore(settings.job_db_path), handler, settings.max_concurrency)
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    with setup_test_client(client, settings) as test_client:
+        headers = {"Idempotency-Key": "run-1"}
+        first = test_client.post("/jobs", json={"payload": {"feedback": "Tighten hero"}}, headers=headers)
+        job_id = first.json()["jobs"][0]["job_id"]
+        body = test_client.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+        while body["status"] not in ("succeeded", "failed"):
+            body = test_client.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+        retried = test_client.post("/jobs", json={"payload": {"feedback": "Tighten  hero"}}, headers=headers)
+        conflict = test_client.post("/jobs", json={"payload": {"feedback": "Other change"}}, headers=headers)
+    queue.store.close()
+    assert retried.json()["jobs"] == [{"job_id": job_id, "index": 0, "status": "succeeded"}]
+    assert len(client.calls) == 1
+    assert conflict.status_code == 409
+
+
+def test_job_store_adds_idempotency_columns_to_an_older_database(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, batch_id TEXT NOT NULL, position INTEGER NOT NULL, "
+            "status TEXT NOT NULL, feedback TEXT NOT NULL, codex_options TEXT, result TEXT, created_at TEXT NOT NULL, "
+            "started_at TEXT, finished_at TEXT)"
+        )
+    store = JobStore(path)
+    first = store.enqueue([("Tighten hero", None)], [("run-1", "digest")])
+    again = store.enqueue([("Tighten hero", None)], [("run-1", "digest")])
+    store.close()
+    assert [job.job_id for job in again] == [job.job_id for job in first]
+
+
+def test_queued_jobs_survive_a_restart_and_stream_events(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = JobStore(path)
+    interrupted, waiting = store.enqueue([("Was running", None), ("Still queued", None)])
+    store.claim()
+    store.close()
+
+    client = DummyAsyncClient([FakeResponse({"status": "ok"})])
+    settings = RouterSettings(
+        FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge", ROUTER_MAX_CONCURRENCY=2, ROUTER_JOB_DB=path
+    )
+    handler = job_handler(client, BridgePool(settings.bridges(), 3, 30), Scheduler(2, 8))
+    queue = JobQueue(JobStore(path), handler, settings.max_concurrency)
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    with setup_test_client(client, settings) as test_client:
+        with test_client.stream("GET", f"/jobs/{waiting.job_id}/events") as response:
+            events = [line.removeprefix("event: ") for line in response.iter_lines() if line.startswith("event: ")]
+        failed = test_client.get(f"/jobs/{interrupted.job_id}").json()
+    queue.store.close()
+    assert queue.interrupted == 1
+    assert failed["status"] == "failed"
+    assert "restarted" in failed["result"]["error"]["message"]
+    assert events[0] == "queued" and events[-1] == "succeeded"
+    assert client.calls == [{"url": "http://bridge/apply-feedback", "json": {"feedback": "Still queued"}}]
+
+
+async def test_scheduler_prefers_interactive_work_and_rotates_callers():
+    scheduler = Scheduler(concurrency=1, max_queue=10, interactive_weight=2)
+    order: list[str] = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("holder"):
+            await release.wait()
+
+    async def run(name: str, caller: str, priority: str):
+        async with scheduler.slot(caller, priority):
+            order.append(name)
+
+    tasks = [asyncio.create_task(hold())]
+    queued = [("x1", "x", "interactive"), ("x2", "x", "interactive"), ("x3", "x", "interactive")]
+    queued += [("y1", "y", "interactive"), ("b1", "b", "batch"), ("b2", "b", "batch"), ("gone", "z", "batch")]
+    for name, caller, priority in queued:
+        tasks.append(asyncio.create_task(run(name, caller, priority)))
+        await asyncio.sleep(0)
+    tasks[-1].cancel()
+    await asyncio.sleep(0)
+    assert scheduler.snapshot()["queue_depth"] == {"interactive": 4, "batch": 2}
+    release.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert order == ["x1", "y1", "b1", "x2", "x3", "b2"]
+    snapshot = scheduler.snapshot()
+    assert snapshot["in_flight"] == 0
+    assert snapshot["wait"]["batch"]["granted"] == 2
+    assert snapshot["wait"]["interactive"]["max_wait_ms"] > 0
+
+
+def test_apply_feedback_rejects_when_router_queue_is_full():
+    client = DummyAsyncClient([])
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge")
+    scheduler = Scheduler(concurrency=1, max_queue=0)
+    app.dependency_overrides[get_scheduler] = lambda: scheduler
+    with setup_test_client(client, settings) as test_client:
+        payload = [{"feedback": "First"}, {"feedback": "Second"}]
+        response = test_client.post("/apply-feedback", json={"payload": payload})
+        health = test_client.get("/health")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert client.calls == []
+    assert health.json()["scheduler"]["rejected"] == 1
+
+
+def test_bridge_pool_balances_load_and_trips_circuit_breaker():
+    pool = BridgePool(["http://a", "http://b"], failure_threshold=2, cooldown=30)
+    first, second = pool.acquire(), pool.acquire()
+    assert (first.url, second.url) == ("http://a", "http://b")
+    pool.release(first, 2.0, 200)
+    pool.release(second, 0.5, 200)
+
+    fast = pool.acquire()
+    assert fast.url == "http://b"
+    pool.release(fast, 0.5, 502)
+    for status_code in (None, 503):
+        pool.release(pool.acquire(), 0.1, status_code)
+    assert [bridge["circuit"] for bridge in pool.snapshot()] == ["closed", "open"]
+    fallback = pool.acquire()
+    assert fallback.url == "http://a"
+    pool.release(fallback, 2.0, 200)
+
+    second.open_until = 1.0
+    trial, other = pool.acquire(), pool.acquire()
+    assert (trial.url, other.url) == ("http://b", "http://a")
+    pool.release(trial, 0.4, 200)
+    pool.release(other, 2.0, 200)
+    assert [bridge["circuit"] for bridge in pool.snapshot()] == ["closed", "closed"]
+
+    second.healthy = False
+    assert pool.acquire().url == "http://a"
+
+
+async def test_bridge_pool_health_checks_eject_failing_bridges():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "down":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"status": "ok"})
+
+    pool = BridgePool(["http://up", "http://down"], failure_threshold=3, cooldown=30)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await pool.check(client, timeout=1)
+    assert [bridge["healthy"] for bridge in pool.snapshot()] == [True, False]
+    assert pool.acquire().url == "http://up"
+    assert pool.acquire().url == "http://up"
+
+
+def test_apply_feedback_records_which_bridge_handled_each_item():
+    client = DummyAsyncClient([FakeResponse({"status": "ok"}), FakeResponse({"status": "ok"})])
+    settings = RouterSettings(
+        FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge-a", FRONTEND_ENHANCEMENT_BRIDGE_URLS="http://bridge-b/"
+    )
+    pool = BridgePool(settings.bridges(), failure_threshold=3, cooldown=30)
+    pool.bridges[0].healthy = False
+    app.dependency_overrides[get_bridge_pool] = lambda: pool
+    with setup_test_client(client, settings) as test_client:
+        response = test_client.post("/apply-feedback", json={"payload": [{"feedback": "One"}, {"feedback": "Two"}]})
+        health = test_client.get("/health")
+    assert [result["bridge"] for result in response.json()["results"]] == ["http://bridge-b"] * 2
+    assert [call["url"] for call in client.calls] == ["http://bridge-b/apply-feedback"] * 2
+    assert [bridge["handled"] for bridge in health.json()["bridges"]] == [0, 2]
+
+
+def test_aimd_limit_grows_on_healthy_calls_and_backs_off_on_faults():
+    limit = AimdLimit(initial=2, minimum=1, maximum=3, latency_target=10)
+    for _ in range(2):
+        limit.observe(0.0, 1.0, fault=False, in_flight=2)
+    assert limit.current == 3
+    for _ in range(4):
+        limit.observe(0.0, 1.0, fault=False, in_flight=3)
+    assert limit.current == 3
+    limit.observe(0.0, 30.0, fault=False, in_flight=3)
+    limit.observe(0.0, 1.0, fault=True, in_flight=3)
+    assert limit.current == 1
+    limit.observe(0.0, 1.0, fault=True, in_flight=1)
+    assert limit.snapshot()["decreases"] == 1
+
+
+def test_health_reports_adaptive_concurrency_limit(monkeypatch):
+    monkeypatch.setenv("ROUTER_ADAPTIVE_CONCURRENCY", "true")
+    monkeypatch.setenv("ROUTER_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("ROUTER_ADAPTIVE_MAX", "8")
+    client = DummyAsyncClient([FakeResponse({"status": "ok"}), FakeResponse({"error": "down"}, status_code=503)])
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge")
+    with setup_test_client(client, settings) as test_client:
+        before = test_client.get("/health").json()["scheduler"]
+        test_client.post("/apply-feedback", json={"payload": [{"feedback": "One"}, {"feedback": "Two"}]})
+        after = test_client.get("/health").json()["scheduler"]
+    assert before["concurrency"] == before["adaptive"]["limit"] == 4
+    assert after["adaptive"]["decreases"] == 1
+    assert after["concurrency"] == 2
+
+
+def test_apply_feedback_streams_results_as_they_finish():
+    class SlowFirstClient(DummyAsyncClient):
+        async def post(self, url: str, json=None):
+            if json["feedback"] == "Slow":
+                await asyncio.sleep(0.2)
+            return await super().post(url, json=json)
+
+    client = SlowFirstClient([FakeResponse({"status": "ok", "run": 1}), FakeResponse({"error": "boom"}, 502)])
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge", ROUTER_MAX_CONCURRENCY=2)
+    with setup_test_client(client, settings) as test_client:
+        payload = [{"feedback": "Slow"}, {"feedback": "Fast"}]
+        response = test_client.post("/apply-feedback", params={"stream": "true"}, json={"payload": payload})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [line["type"] for line in lines] == ["result", "result", "summary"]
+    assert [line["result"]["index"] for line in lines[:2]] == [1, 0]
+    assert lines[-1] == {"type": "summary", "status": "partial-error", "total": 2, "errors": 1}
+
+
+def test_apply_feedback_replays_idempotent_items_and_collapses_duplicates():
+    responses = [FakeResponse({"status": "ok", "run": 1}), FakeResponse({"status": "ok", "run": 2})]
+    client = DummyAsyncClient(responses)
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge")
+    with setup_test_client(client, settings) as test_client:
+        batch = [{"feedback": "Raise  the CTA"}, {"feedback": "Raise the CTA "}, {"feedback": "Trim copy"}]
+        first = test_client.post("/apply-feedback", headers={"Idempotency-Key": "run-1"}, json={"payload": batch})
+        retry = test_client.post(
+            "/apply-feedback", json={"payload": {"feedback": "Raise the CTA", "idempotency_key": "run-1:0"}}
+        )
+        reused = test_client.post(
+            "/apply-feedback", json={"payload": {"feedback": "Something else", "idempotency_key": "run-1:0"}}
+        )
+        health = test_client.get("/health")
+    results = first.json()["results"]
+    assert [call["json"]["feedback"] for call in client.calls] == ["Raise  the CTA", "Trim copy"]
+    assert results[1] == {**results[0], "index": 1, "duplicate_of": 0}
+    assert retry.json()["results"] == [{**results[0], "replayed": True}]
+    assert reused.json()["results"][0]["status"] == "error"
+    assert health.json()["idempotency"]["replayed"] == 1
+
+
+def test_apply_feedback_coalesces_small_items_into_one_codex_run():
+    responses = [FakeResponse({"status": "ok", "run": "long"}), FakeResponse({"status": "ok", "run": "merged"})]
+    client = DummyAsyncClient(responses)
+    settings = RouterSettings(FRONTEND_ENHANCEMENT_BRIDGE_URL="http://bridge")
+    coalescer = Coalescer(window=0.05, max_chars=40, max_items=4)
+    app.dependency_overrides[get_coalescer] = lambda: coalescer
+    long_item = "Rework the pricing table so every plan lists the same features in the same order."
+    with setup_test_client(client, settings) as test_client:
+        payload = [{"feedback": "Bolder CTA"}, {"feedback": long_item}, {"feedback": "Trim footer\nlinks"}]
+        response = test_client.post("/apply-feedback", json={"payload": payload})
+    assert [call["json"]["feedback"] for call in client.calls] == [
+        long_item,
+        "Apply the following 2 independent feedback items in order. Keep each change scoped to its own item.\n\n"
+        "1. Bolder CTA\n2. Trim footer\n   links",
+    ]
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["result"]["run"] for result in results] == ["merged", "long", "merged"]
+    assert [result.get("coalesced") for result in results] == [
+        {"items": 2, "task": 1},
+        None,
+        {"items": 2, "task": 2},
+    ]
+    assert coalescer.snapshot()["merged_items"] == 2
+
+
+async def test_submit_feedback_retries_connection_failures_only():
+    class FlakyClient(DummyAsyncClient):
+        async def post(self, url: str, json=None):
+            self.calls.append({"url": url, "json": json})
+            request = httpx.Request("POST", url)
+            if url.startswith("http://a/"):
+                raise httpx.ConnectError("refused", request=request)
+            if json["feedback"] == "Slow":
+                raise httpx.ReadTimeout("timed out", request=request)
+            return FakeResponse({"status": "ok"})
+
+    client = FlakyClient([])
+    pool = BridgePool(["http://a", "http://b"], failure_threshold=5, cooldown=30)
+    retry = RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.001)
+    scheduler = Scheduler(2, 8)
+    ok = await submit_feedback(0, "Fast", None, client, pool, scheduler.slot("c"), retry)
+    assert (ok["status"], ok["bridge"], ok["attempts"]) == ("ok", "http://b", 2)
+
+    client.calls.clear()
+    timed_out = await submit_feedback(1, "Slow", None, client, pool, scheduler.slot("c"), retry)
+    assert (timed_out["status"], timed_out["attempts"]) == ("error", 2)
+    assert [call["url"] for call in client.calls] == ["http://a/apply-feedback", "http://b/apply-feedback"]
+
+
+async def test_hedger_sends_backup_request_after_slow_percentile():
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 21:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"call": calls})
+
+    hedger = Hedger(percentile=90, min_samples=20)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        for _ in range(20):
+            await hedger.get(client, "http://bridge/health")
+        response = await hedger.get(client, "http://bridge/health")
+    assert response.json() == {"call": 22}
+    assert hedger.snapshot()["hedged"] == 1
@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+import pytest
+from enhancement_core.codex import CodexRunner, CodexRunnerError
+from enhancement_core.codex.events import EventTracker
+from enhancement_core.codex.logs import RotatingLog
+from enhancement_core.config import HostBridgeSettings
+
+
+@pytest.fixture
+def runner(tmp_path):
+    repo = tmp_path / "site"
+    repo.mkdir()
+    codex = tmp_path / "codex"
+    codex.write_text("#!/bin/sh\nexec sleep 30\n")
+    codex.chmod(0o755)
+    settings = HostBridgeSettings(
+        TARGET_REPO_PATH=repo,
+        FRONTEND_ENHANCEMENT_CODEX_BIN=str(codex),
+        FRONTEND_ENHANCEMENT_CODEX_LOG_DIR=tmp_path / "logs",
+    )
+    return CodexRunner(settings)
+
+
+async def started(runner: CodexRunner, run_id: str):
+    while run_id not in runner.live or runner.live[run_id].process is None:
+        await asyncio.sleep(0.01)
+    return runner.live[run_id].process
+
+
+def test_run_async_cancel_kills_the_codex_process(runner, tmp_path):
+    async def scenario():
+        run = asyncio.create_task(runner.run_async("Slow change", run_id="slow"))
+        process = await started(runner, "slow")
+        assert [live["run_id"] for live in runner.live_runs()] == ["slow"]
+        assert runner.cancel("slow")
+        assert not runner.cancel("unknown")
+        with pytest.raises(CodexRunnerError, match="cancelled") as excinfo:
+            await asyncio.wait_for(run, 5)
+        return process, excinfo.value
+
+    process, error = asyncio.run(scenario())
+    assert process.returncode is not None
+    assert error.run_id == "slow"
+    assert runner.live == {}
+    metadata = json.loads((tmp_path / "logs" / error.log_path / "metadata.json").read_text())
+    assert metadata["cancelled"] is True
+
+
+def test_run_async_stops_codex_when_its_caller_goes_away(runner):
+    async def scenario():
+        run = asyncio.create_task(runner.run_async("Slow change", run_id="abandoned"))
+        process = await started(runner, "abandoned")
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(run, 5)
+        return process
+
+    process = asyncio.run(scenario())
+    assert process.returncode is not None
+    assert runner.live == {}
+
+
+def test_rotating_log_keeps_stream_offsets_across_rotations(tmp_path):
+    log = RotatingLog(tmp_path / "stdout.log", max_bytes=10, backups=1)
+    for line in (b"one\n", b"two\n", b"three\n", b"four\n", b"five\n"):
+        log.write(line)
+    log.close()
+    assert log.written == 24 and log.rotations == 2
+    assert log.read(0, 100) == (8, b"three\nfour\nfive\n")
+    assert log.read(14, 100) == (14, b"four\nfive\n")
+    assert log.read(14, 3) == (14, b"fou")
+    assert log.read(24, 100) == (24, b"")
+    assert (tmp_path / "stdout.log.1").read_bytes() == b"three\n"
+    assert (tmp_path / "stdout.log").read_bytes() == b"four\nfive\n"
+
+
+def test_run_streams_output_to_logs_that_can_be_tailed(runner, tmp_path):
+    codex = tmp_path / "codex"
+    codex.write_text("#!/bin/sh\necho planning\necho editing\necho warn >&2\nprintf done\n")
+    result = runner.run("Quick change")
+    assert result["stdout"] == "planning\nediting\ndone"
+    assert result["stderr"] == "warn\n"
+    chunk = runner.tail(result["run_id"], "stdout", 9, 1024)
+    assert chunk["data"] == "editing\ndone" and chunk["next_offset"] == 21 and chunk["running"] is False
+    assert runner.tail("unknown", "stdout", 0, 1024) is None
+    log_dir = tmp_path / "logs" / result["log_path"]
+    assert (log_dir / "stdout.log").read_text() == "planning\nediting\ndone"
+    metadata = json.loads((log_dir / "metadata.json").read_text())
+    assert metadata["output"]["stderr"] == {"bytes": 5, "rotations": 0}
+
+
+EVENTS = [
+    {"type": "thread.started", "thread_id": "t1"},
+    {"type": "turn.started"},
+    {"type": "item.completed", "item": {"id": "i0", "type": "reasoning", "text": "Find the hero"}},
+    {"type": "item.started", "item": {"id": "i1", "type": "command_execution", "command": "rg hero"}},
+    {
+        "type": "item.completed",
+        "item": {"id": "i1", "type": "command_execution", "command": "rg hero", "exit_code": 0, "status": "completed"},
+    },
+    {"type": "item.completed", "item": {"id": "i2", "type": "file_change", "changes": [{"path": "hero.css"}]}},
+    {"type": "item.completed", "item": {"id": "i3", "type": "agent_message", "text": "Raised the contrast."}},
+    {"type": "turn.completed", "usage": {"input_tokens": 1200, "cached_input_tokens": 800, "output_tokens": 90}},
+]
+
+
+def test_event_tracker_splits_time_into_phases():
+    tracker = EventTracker(started=0.0)
+    tracker.feed(b"not an event\n", now=0.5)
+    for at, event in zip([1.0, 1.1, 3.1, 3.6, 5.6, 6.0, 6.5, 6.6], EVENTS, strict=True):
+        tracker.feed(json.dumps(event).encode() + b"\n", now=at)
+    assert tracker.summary() == {
+        "duration_ms": 6600,
+        "phases_ms": {
+            "startup": 1000,
+            "other": 200,
+            "planning": 2500,
+            "tools": 2000,
+            "editing": 400,
+            "responding": 500,
+        },
+        "tool_calls": 1,
+        "files": ["hero.css"],
+        "tokens": {"input_tokens": 1200, "cached_input_tokens": 800, "output_tokens": 90},
+        "errors": 0,
+    }
+    details = tracker.describe()
+    assert details["tool_call_log"] == [
+        {"type": "command_execution", "status": "completed", "command": "rg hero", "exit_code": 0, "duration_ms": 2000}
+    ]
+    assert details["final_message"] == "Raised the contrast."
+
+
+def test_json_event_mode_records_metrics(tmp_path):
+    repo = tmp_path / "site"
+    repo.mkdir()
+    codex = tmp_path / "codex"
+    lines = "\n".join(json.dumps(event) for event in EVENTS)
+    codex.write_text(f"#!/bin/sh\n[ \"$5\" = --json ] || exit 3\ncat <<'JSON'\n{lines}\nJSON\n")
+    codex.chmod(0o755)
+    settings = HostBridgeSettings(
+        TARGET_REPO_PATH=repo,
+        FRONTEND_ENHANCEMENT_CODEX_BIN=str(codex),
+        FRONTEND_ENHANCEMENT_CODEX_LOG_DIR=tmp_path / "logs",
+        FRONTEND_ENHANCEMENT_CODEX_JSON_EVENTS=True,
+    )
+    result = CodexRunner(settings).run("Raise the contrast")
+    assert result["events"]["tool_calls"] == 1
+    assert result["events"]["files"] == ["hero.css"]
+    assert result["events"]["tokens"]["output_tokens"] == 90
+    metadata = json.loads((tmp_path / "logs" / result["log_path"] / "metadata.json").read_text())
+    assert metadata["events"]["events"] == len(EVENTS)
+    assert metadata["events"]["final_message"] == "Raised the contrast."
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from enhancement_core.codex import CodexRunner, WorktreePool
+from enhancement_core.config import HostBridgeSettings
+
+
+def git(repo, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "site"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    (path / "index.html").write_text("<h1>Hello</h1>\n")
+    git(path, "add", "-A")
+    git(path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init")
+    return path
+
+
+def test_worktree_pool_merges_runs_in_order_and_reports_conflicts(repo, tmp_path):
+    pool = WorktreePool(repo, tmp_path / "worktrees", size=2, branch_prefix="codex/run-")
+    with pool.lease() as first, pool.lease() as second:
+        assert first.path != second.path
+        (first.path / "hero.css").write_text("h1 { color: red; }\n")
+        (second.path / "footer.html").write_text("<footer></footer>\n")
+        assert pool.merge(first, "a", "run a").strategy == "fast-forward"
+        assert pool.merge(second, "b", "run b").strategy == "three-way"
+    assert (repo / "hero.css").exists() and (repo / "footer.html").exists()
+    assert "codex/run-a" not in git(repo, "branch")
+
+    with pool.lease() as kept, pool.lease() as clashing:
+        (kept.path / "index.html").write_text("<h1>Welcome</h1>\n")
+        (clashing.path / "index.html").write_text("<h1>Hi there</h1>\n")
+        assert pool.merge(kept, "c", "run c").status == "merged"
+        outcome = pool.merge(clashing, "d", "run d")
+    assert (outcome.status, outcome.branch, outcome.conflicts) == ("conflict", "codex/run-d", ["index.html"])
+    assert (repo / "index.html").read_text() == "<h1>Welcome</h1>\n"
+    assert git(repo, "status", "--porcelain") == ""
+
+    with pool.lease() as idle:
+        assert pool.merge(idle, "e", "run e").status == "unchanged"
+    assert pool.snapshot()["free"] == 2
+
+
+def test_worktree_pool_waits_for_earlier_runs_before_merging(repo, tmp_path):
+    pool = WorktreePool(repo, tmp_path / "worktrees", size=2, branch_prefix="codex/run-")
+    order: list[str] = []
+
+    def later_run() -> None:
+        with pool.lease() as later:
+            (later.path / "later.txt").write_text("later\n")
+            order.append(pool.merge(later, "later", "later").status)
+
+    with pool.lease():
+        merging = threading.Thread(target=later_run)
+        merging.start()
+        merging.join(timeout=0.5)
+        assert merging.is_alive()
+        order.append("earlier finished")
+    merging.join(timeout=5)
+    assert order == ["earlier finished", "merged"]
+
+
+def test_codex_runner_applies_each_run_through_a_worktree(repo, tmp_path):
+    site = repo / "examples" / "landing"
+    site.mkdir(parents=True)
+    (site / "index.html").write_text("<main></main>\n")
+    git(repo, "add", "-A")
+    git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "add site")
+    codex = tmp_path / "codex"
+    codex.write_text('#!/bin/sh\nwhile [ "$1" != "--cd" ]; do shift; done\necho "/* codex */" > "$2/tweak.css"\n')
+    codex.chmod(0o755)
+    settings = HostBridgeSettings(
+        TARGET_REPO_PATH=site,
+        FRONTEND_ENHANCEMENT_CODEX_BIN=str(codex),
+        FRONTEND_ENHANCEMENT_CODEX_LOG_DIR=tmp_path / "logs",
+        FRONTEND_ENHANCEMENT_CODEX_WORKTREES=1,
+        FRONTEND_ENHANCEMENT_CODEX_WORKTREE_DIR=tmp_path / "worktrees",
+    )
+    runner = CodexRunner(settings)
+    result = runner.run("Add a tweak")
+    assert result["merge"]["status"] == "merged"
+    assert (site / "tweak.css").read_text() == "/* codex */\n"
+    metadata = json.loads((tmp_path / "logs" / result["log_path"] / "metadata.json").read_text())
+    assert metadata["merge"]["commit"] == git(repo, "rev-parse", "HEAD")
+
+
+async def test_codex_runner_queues_runs_for_a_busy_worktree_on_the_event_loop(repo, tmp_path):
+    codex = tmp_path / "codex"
+    codex.write_text('#!/bin/sh\nwhile [ "$1" != "--cd" ]; do shift; done\nmktemp "$2/tweak-XXXXXX.css" >/dev/null\n')
+    codex.chmod(0o755)
+    settings = HostBridgeSettings(
+        TARGET_REPO_PATH=repo,
+        FRONTEND_ENHANCEMENT_CODEX_BIN=str(codex),
+        FRONTEND_ENHANCEMENT_CODEX_LOG_DIR=tmp_path / "logs",
+        FRONTEND_ENHANCEMENT_CODEX_WORKTREES=1,
+        FRONTEND_ENHANCEMENT_CODEX_WORKTREE_DIR=tmp_path / "worktrees",
+    )
+    runner = CodexRunner(settings)
+
+    class SharedThreads(ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):
+            raise AssertionError("worktree git work must not wait on the shared default executor")
+
+    asyncio.get_running_loop().set_default_executor(SharedThreads(max_workers=1))
+    runs = asyncio.gather(*(runner.run_async(f"Tweak {number}") for number in range(3)))
+    results = await asyncio.wait_for(runs, 30)
+    assert [result["merge"]["status"] for result in results] == ["merged"] * 3
+    assert len(list(repo.glob("tweak-*.css"))) == 3
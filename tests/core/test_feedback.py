@@ -1,10 +1,15 @@
+import base64
+import io
 import json
 from types import SimpleNamespace
 
+import httpx
 import pytest
 from enhancement_core.config import FeedbackSettings
 from enhancement_core.feedback import generate as feedback_module
 from enhancement_core.feedback.generate import FeedbackError, build_input, parse_payload, request_feedback
+from openai import BadRequestError
+from PIL import Image
 
 
 @pytest.fixture
@@ -69,3 +74,179 @@ def test_request_feedback_parses_response(monkeypatch, feedback_settings):
 def test_parse_payload_requires_feedback_field():
     with pytest.raises(FeedbackError):
         parse_payload(json.dumps({}))
+
+
+def test_request_feedback_chains_previous_response(monkeypatch, feedback_settings):
+    sent: list[dict] = []
+
+    class DummyResponses:
+        def create(self, **kwargs):
+            sent.append(kwargs)
+            usage = SimpleNamespace(
+                total_tokens=300, input_tokens=250, input_tokens_details=SimpleNamespace(cached_tokens=200)
+            )
+            return SimpleNamespace(
+                output_text=json.dumps({"feedback": "Next change"}),
+                id="resp-2",
+                model="gpt-test",
+                previous_response_id="resp-1",
+                usage=usage,
+            )
+
+    class DummyClient:
+        def __init__(self, api_key):
+            self.responses = DummyResponses()
+
+    monkeypatch.setattr(feedback_module, "OpenAI", DummyClient)
+    response = request_feedback(None, "Review again", feedback_settings, previous_response_id="resp-1")
+    assert sent[0]["previous_response_id"] == "resp-1"
+    assert sent[0]["input"][0]["content"][0]["text"] == feedback_settings.chained_user_text
+    assert response.cached_tokens == 200
+    assert response.input_tokens == 250
+    assert response.previous_response_id == "resp-1"
+
+
+@pytest.mark.parametrize(
+    ("param", "retried"),
+    [("previous_response_id", True), ("text.format.schema", False)],
+)
+def test_request_feedback_drops_chaining_only_when_it_was_rejected(monkeypatch, feedback_settings, param, retried):
+    sent: list[dict] = []
+
+    class DummyResponses:
+        def create(self, **kwargs):
+            sent.append(kwargs)
+            if "previous_response_id" in kwargs:
+                response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+                raise BadRequestError(f"Invalid '{param}'.", response=response, body={"param": param})
+            return SimpleNamespace(
+                output_text=json.dumps({"feedback": "Fresh thread"}),
+                id="resp-2",
+                model="gpt-test",
+                usage=SimpleNamespace(total_tokens=100, input_tokens=80, input_tokens_details=None),
+            )
+
+    class DummyClient:
+        def __init__(self, api_key):
+            self.responses = DummyResponses()
+
+    monkeypatch.setattr(feedback_module, "OpenAI", DummyClient)
+    if retried:
+        assert request_feedback(None, "Review again", feedback_settings, previous_response_id="resp-1").feedback
+        assert [kwargs.get("previous_response_id") for kwargs in sent] == ["resp-1", None]
+    else:
+        with pytest.raises(FeedbackError):
+            request_feedback(None, "Review again", feedback_settings, previous_response_id="resp-1")
+        assert len(sent) == 1
+
+
+def _triage_client(outputs: dict[str, dict], sent: list[dict]):
+    class DummyResponses:
+        def create(self, **kwargs):
+            sent.append(kwargs)
+            return SimpleNamespace(
+                output_text=json.dumps(outputs[kwargs["model"]]),
+                id=f"resp-{kwargs['model']}",
+                model=kwargs["model"],
+                usage=SimpleNamespace(total_tokens=100, input_tokens=80, input_tokens_details=None),
+            )
+
+    return SimpleNamespace(responses=DummyResponses())
+
+
+def test_request_feedback_keeps_confident_triage_answer(schema_file):
+    settings = FeedbackSettings(
+        schema_path=schema_file, OPENAI_API_KEY="sk-test", UI_FEEDBACK_TRIAGE_MODEL_NAME="gpt-mini"
+    )
+    sent: list[dict] = []
+    outputs = {"gpt-mini": {"feedback": "Increase CTA contrast", "confidence": 0.9, "severity": "major"}}
+    response = request_feedback(None, "Review", settings, client=_triage_client(outputs, sent))
+    assert [call["model"] for call in sent] == ["gpt-mini"]
+    assert set(sent[0]["text"]["format"]["schema"]["required"]) == {"feedback", "confidence", "severity"}
+    assert response.feedback == "Increase CTA contrast"
+    assert response.tier == "triage"
+    assert response.tiers[0].confidence == 0.9
+    assert response.tiers[0].escalation is None
+
+
+@pytest.mark.parametrize(
+    ("confidence", "severity", "reason"),
+    [(0.3, "major", "low_confidence"), (0.95, "none", "no_significant_issues")],
+)
+def test_request_feedback_escalates_uncertain_triage(schema_file, confidence, severity, reason):
+    settings = FeedbackSettings(
+        schema_path=schema_file, OPENAI_API_KEY="sk-test", UI_FEEDBACK_TRIAGE_MODEL_NAME="gpt-mini"
+    )
+    sent: list[dict] = []
+    outputs = {
+        "gpt-mini": {"feedback": "Looks fine", "confidence": confidence, "severity": severity},
+        settings.model_name: {"feedback": "Rework the pricing grid"},
+    }
+    response = request_feedback(None, "Review", settings, client=_triage_client(outputs, sent))
+    assert [call["model"] for call in sent] == ["gpt-mini", settings.model_name]
+    assert sent[1]["instructions"] == settings.prompt
+    assert response.feedback == "Rework the pricing grid"
+    assert response.tier == "primary"
+    assert [tier.tier for tier in response.tiers] == ["triage", "primary"]
+    assert response.tiers[0].escalation == reason
+    assert response.total_tokens == 200
+
+
+def _png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+DOM_SNAPSHOT = {
+    "viewport": {"width": 1280, "height": 720},
+    "elements": [
+        {
+            "selector": "p",
+            "tag": "p",
+            "rect": [0, 80, 400, 24],
+            "text": "Start  free",
+            "color": "rgb(0, 0, 0)",
+            "background": "rgb(255, 255, 255)",
+            "font_size": 16,
+            "font_weight": 400,
+        },
+        {
+            "selector": "h1",
+            "tag": "h1",
+            "rect": [0, 0, 600, 48],
+            "text": "Launch faster",
+            "color": "rgb(17, 17, 17)",
+            "background": "rgb(255, 255, 255)",
+            "font_size": 40,
+            "font_weight": 700,
+        },
+        {"selector": "img", "tag": "img", "rect": [0, 120, 300, 200], "alt": None, "natural": [600, 400]},
+    ],
+}
+
+
+@pytest.mark.parametrize(("mode", "image_width"), [("dom", None), ("hybrid", 640), ("image", 1600)])
+def test_request_feedback_input_modes(schema_file, mode, image_width):
+    settings = FeedbackSettings(schema_path=schema_file, OPENAI_API_KEY="sk-test", UI_FEEDBACK_INPUT_MODE=mode)
+    sent: list[dict] = []
+    client = _triage_client({settings.model_name: {"feedback": "Ship it"}}, sent)
+    response = request_feedback(_png(1600, 900), None, settings, client=client, dom_snapshot=DOM_SNAPSHOT)
+    content = sent[0]["input"][0]["content"]
+    texts = [part["text"] for part in content if part["type"] == "input_text"]
+    images = [part["image_url"] for part in content if part["type"] == "input_image"]
+    assert response.input_mode == mode
+    if mode == "image":
+        assert not any("Rendered page structure" in text for text in texts)
+    else:
+        summary = next(text for text in texts if text.startswith("Rendered page structure"))
+        lines = summary.splitlines()
+        assert lines[1] == '[0,0 600x48] heading1 "Launch faster" 40px bold #111111 on #ffffff'
+        assert lines[2].endswith('text "Start free" 16px #000000 on #ffffff')
+        assert lines[3] == "[0,120 300x200] img (no alt)"
+    if image_width is None:
+        assert images == []
+    else:
+        data = base64.b64decode(images[0].split(",", 1)[1])
+        with Image.open(io.BytesIO(data)) as sent_image:
+            assert sent_image.width == image_width
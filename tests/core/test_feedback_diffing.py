@@ -0,0 +1,59 @@
+import io
+import json
+
+from enhancement_core.config import FeedbackSettings
+from enhancement_core.feedback.diffing import diff_captures
+from enhancement_core.feedback.generate import build_input
+from PIL import Image, ImageDraw
+
+
+def capture(boxes: list[tuple[int, int, int, int]], size: tuple[int, int] = (400, 2000)) -> bytes:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill=(30, 60, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_diff_captures_crops_padded_changed_regions():
+    before = capture([(0, 0, 400, 100)])
+    after = capture([(0, 0, 400, 100), (100, 500, 150, 520), (300, 1500, 320, 1600)])
+    diff = diff_captures(before, after, padding=10, thumbnail_width=100)
+    assert diff is not None
+    assert [(region.left, region.top, region.width, region.height) for region in diff.regions] == [
+        (90, 490, 71, 41),
+        (290, 1490, 41, 121),
+    ]
+    assert diff.changed_ratio < 0.02
+    with Image.open(io.BytesIO(diff.thumbnail)) as thumbnail:
+        assert thumbnail.size == (100, 500)
+
+
+def test_diff_captures_falls_back_to_full_capture():
+    base = capture([(0, 0, 400, 100)])
+    assert diff_captures(base, base) is None
+    assert diff_captures(base, capture([], size=(300, 2000))) is None
+    assert diff_captures(base, capture([(0, 0, 400, 1900)]), max_changed_ratio=0.5) is None
+    assert diff_captures(b"not an image", base) is None
+
+
+def test_build_input_labels_changed_regions(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps({"type": "object"}))
+    settings = FeedbackSettings(schema_path=schema, OPENAI_API_KEY="sk-test")
+    diff = diff_captures(capture([]), capture([(100, 500, 150, 520)]), padding=10)
+    content = build_input(settings, "dGh1bWI=", None, regions=diff.regions)[0]["content"]
+    assert content[1]["text"] == settings.regions_user_text
+    assert content[2]["detail"] == "low"
+    assert content[3]["text"] == "Changed region 1 of 1 (x 90-161, y 490-531)"
+    assert content[4]["detail"] == "high"
+
+
+def test_diff_captures_detects_single_pixel_changes():
+    before = capture([], size=(1280, 400))
+    after = capture([(640, 200, 640, 200)], size=(1280, 400))
+    diff = diff_captures(before, after, padding=4)
+    assert diff is not None
+    assert [(region.left, region.top) for region in diff.regions] == [(636, 196)]
@@ -0,0 +1,66 @@
+import io
+import json
+
+import pytest
+from enhancement_core.config import FeedbackSettings
+from enhancement_core.feedback.generate import build_input
+from enhancement_core.feedback.tiling import LOW_DETAIL_TOKENS, estimate_image_tokens, split_image
+from PIL import Image, ImageDraw
+
+
+@pytest.fixture
+def feedback_settings(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps({"type": "object"}))
+    return FeedbackSettings(
+        schema_path=schema,
+        OPENAI_API_KEY="sk-test",
+        UI_FEEDBACK_TILE_HEIGHT=400,
+        UI_FEEDBACK_TILE_OVERLAP=40,
+    )
+
+
+def make_png(size: tuple[int, int], stripes: bool = True) -> bytes:
+    image = Image.new("RGB", size, "white")
+    if stripes:
+        draw = ImageDraw.Draw(image)
+        for top in range(0, size[1], 50):
+            draw.rectangle((0, top, size[0], top + 20), fill=(top % 255, 40, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_estimate_image_tokens_matches_vision_pricing():
+    assert estimate_image_tokens(1024, 1024, "low") == LOW_DETAIL_TOKENS
+    assert estimate_image_tokens(1024, 1024) == 85 + 170 * 4
+    assert estimate_image_tokens(2048, 4096) == 85 + 170 * 6
+
+
+def test_split_image_keeps_short_captures_whole(feedback_settings):
+    data = make_png((200, 300))
+    tiles = split_image(data, feedback_settings)
+    assert len(tiles) == 1
+    assert tiles[0].data == data
+
+
+def test_split_image_tiles_tall_captures_with_overlap(feedback_settings):
+    tiles = split_image(make_png((200, 1000)), feedback_settings)
+    assert [tile.top for tile in tiles] == [0, 360, 600]
+    assert all(tile.height == 400 for tile in tiles)
+    assert all(tile.detail == "high" for tile in tiles)
+
+
+def test_split_image_drops_duplicate_and_blank_detail(feedback_settings):
+    tiles = split_image(make_png((200, 1200), stripes=False), feedback_settings)
+    assert len(tiles) == 1
+    assert tiles[0].detail == "low"
+
+
+def test_build_input_labels_each_tile(feedback_settings):
+    tiles = split_image(make_png((200, 1000)), feedback_settings)
+    content = build_input(feedback_settings, None, "Review", tiles=tiles)[0]["content"]
+    images = [item for item in content if item["type"] == "input_image"]
+    assert len(images) == 3
+    assert images[0]["detail"] == "high"
+    assert content[1]["text"].startswith("Section 1 of 3")
@@ -0,0 +1,57 @@
+from enhancement_core.feedback.prescreen import contrast_ratio, parse_color, prescreen
+
+
+def text_element(selector: str, rect: list[float], color: str = "rgb(0, 0, 0)", **extra) -> dict:
+    return {
+        "selector": selector,
+        "tag": "p",
+        "rect": rect,
+        "text": selector,
+        "color": color,
+        "background": "rgb(255, 255, 255)",
+        "font_size": 16,
+        "font_weight": 400,
+        **extra,
+    }
+
+
+def test_contrast_ratio_matches_wcag_reference_values():
+    assert round(contrast_ratio((0, 0, 0), (255, 255, 255)), 1) == 21.0
+    assert round(contrast_ratio((119, 119, 119), (255, 255, 255)), 2) == 4.48
+    assert parse_color("rgba(10, 20, 30, 0.5)") == (10.0, 20.0, 30.0, 0.5)
+    assert parse_color("color(srgb 1 0 0)") is None
+
+
+def test_prescreen_reports_clean_page_below_threshold():
+    snapshot = {
+        "elements": [
+            text_element("h1", [0, 0, 600, 40]),
+            text_element("p:nth-of-type(1)", [0, 56, 600, 24]),
+            text_element("p:nth-of-type(2)", [0, 96, 600, 24]),
+            text_element("a", [10, 60, 80, 16]),
+            {"selector": "img.hero", "tag": "img", "rect": [0, 136, 600, 300], "alt": "", "natural": [1200, 600]},
+        ]
+    }
+    report = prescreen(snapshot)
+    assert report.findings == []
+    assert report.score == 0
+
+
+def test_prescreen_flags_contrast_overlap_images_and_spacing():
+    snapshot = {
+        "device_pixel_ratio": 1,
+        "elements": [
+            text_element("h1", [0, 0, 600, 40], color="rgb(200, 200, 200)"),
+            text_element("p.lead", [0, 53, 600, 24]),
+            text_element("p.body", [0, 90, 600, 24]),
+            text_element("p.note", [0, 127, 600, 24]),
+            text_element("span.badge", [500, 95, 120, 15]),
+            {"selector": "img.logo", "tag": "img", "rect": [0, 200, 100, 50], "natural": [2000, 1000]},
+        ],
+    }
+    report = prescreen(snapshot)
+    checks = sorted(finding.check for finding in report.findings)
+    assert checks == ["contrast", "missing_alt", "off_grid_spacing", "overlap", "oversized_image"]
+    assert report.score == 4.0
+    assert report.summary()["findings"]["overlap"] == 1
+    assert "img.logo" in report.feedback_text()
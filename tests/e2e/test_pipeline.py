@@ -1,11 +1,12 @@
 import base64
+import contextlib
 import json
 from pathlib import Path
 
 import httpx
 import pytest
 from enhancement_core.config import PipelineSettings
-from enhancement_core.orchestration import pipeline
+from enhancement_core.orchestration import crawl, pipeline
 from typer.testing import CliRunner
 
 from apps.orchestrator_cli import cli as cli_module
@@ -41,7 +42,7 @@ class FakeAsyncClient:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
-    async def post(self, url: str, json=None):
+    async def post(self, url: str, json=None, params=None):
         self.calls.append({"url": url, "json": json})
         request = httpx.Request("POST", url)
         if url.endswith("/capture"):
@@ -72,6 +73,101 @@ async def test_trigger_pipeline_creates_artifacts(tmp_path, monkeypatch):
     assert result["feedback"]["feedback"] == "Tighten copy"
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("text_color", "router_feedback"), [("rgb(220, 220, 220)", True), ("rgb(0, 0, 0)", False)])
+async def test_trigger_pipeline_prescreen_bypasses_feedback_model(tmp_path, monkeypatch, text_color, router_feedback):
+    calls: list[dict] = []
+    elements = [
+        {
+            "selector": f"p:nth-of-type({index})",
+            "tag": "p",
+            "rect": [0, index * 40, 400, 24],
+            "text": "Copy",
+            "color": text_color,
+            "background": "rgb(255, 255, 255)",
+            "font_size": 16,
+            "font_weight": 400,
+        }
+        for index in range(3)
+    ]
+
+    class PrescreenClient(FakeAsyncClient):
+        async def post(self, url: str, json=None, params=None):
+            calls.append({"url": url, "json": json, "params": params})
+            if url.endswith("/capture"):
+                image = base64.b64encode(b"demo").decode()
+                return FakeResponse(
+                    httpx.Request("POST", url), {"image_b64": image, "dom_snapshot": {"elements": elements}}
+                )
+            return await super().post(url, json=json)
+
+    monkeypatch.setattr(pipeline.httpx, "AsyncClient", PrescreenClient)
+    settings = PipelineSettings(
+        FRONTEND_SCREENSHOTS_URL="http://svc:8101/capture",
+        UI_FEEDBACK_SERVICE_URL="http://svc:8102/feedback",
+        FRONTEND_ENHANCEMENT_ROUTER_URL="http://svc:8103/apply-feedback",
+        PIPELINE_ARTIFACT_ROOT=tmp_path,
+        PIPELINE_MAX_ATTEMPTS=1,
+        PIPELINE_PRESCREEN_ENABLED=True,
+        PIPELINE_PRESCREEN_CLEAN_ACTION="skip",
+    )
+    result = await pipeline.trigger_pipeline(settings, artifacts_dir=tmp_path)
+    assert calls[0]["params"] == {"include_dom": "true"}
+    assert not any(call["url"].endswith("/feedback") for call in calls)
+    assert result["feedback"]["source"] == "prescreen"
+    if router_feedback:
+        assert result["feedback"]["prescreen"]["action"] == "direct"
+        assert "contrast" in calls[-1]["json"]["payload"]["feedback"]
+    else:
+        assert result["feedback"]["prescreen"]["action"] == "skip"
+        assert result["router"]["status"] == "skipped"
+        assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_crawl_queues_routes_and_collects_feedback_later(tmp_path, monkeypatch):
+    calls: list[dict] = []
+    batch = {"batch_id": "batch_1", "status": "in_progress", "results": None}
+
+    class CrawlClient(FakeAsyncClient):
+        async def post(self, url: str, json=None, params=None):
+            calls.append({"url": url, "params": params})
+            return await super().post(url, json=json)
+
+        async def request(self, method: str, url: str, json=None):
+            calls.append({"url": url, "json": json})
+            return FakeResponse(httpx.Request(method, url), dict(batch))
+
+    monkeypatch.setattr(pipeline.httpx, "AsyncClient", CrawlClient)
+    settings = PipelineSettings(
+        FRONTEND_SCREENSHOTS_URL="http://svc:8101/capture",
+        UI_FEEDBACK_SERVICE_URL="http://svc:8102/feedback",
+        PIPELINE_ARTIFACT_ROOT=tmp_path,
+    )
+    queued = await crawl.trigger_crawl(["/", "/pricing"], settings)
+    crawl_dir = Path(queued["crawl_dir"])
+    assert [call["params"] for call in calls[:2]] == [{"path": "/"}, {"path": "/pricing"}]
+    assert calls[2]["url"] == "http://svc:8102/batches"
+    assert [item["custom_id"] for item in calls[2]["json"]["payload"]["items"]] == ["001-root", "002-pricing"]
+    assert (crawl_dir / "002-pricing.png").exists()
+    pending = await crawl.poll_crawl(crawl_dir, settings)
+    assert pending["status"] == "in_progress"
+    batch["status"] = "completed"
+    batch["results"] = [
+        {"custom_id": "001-root", "feedback": "Tighten hero", "error": None},
+        {"custom_id": "002-pricing", "feedback": None, "error": "model returned empty output"},
+    ]
+    collected = await crawl.poll_crawl(crawl_dir, settings, wait=True)
+    assert calls[-1]["url"] == "http://svc:8102/batches/batch_1"
+    assert [(entry["route"], entry["feedback"]) for entry in collected["routes"]] == [
+        ("/", "Tighten hero"),
+        ("/pricing", None),
+    ]
+    manifest = json.loads((crawl_dir / crawl.CRAWL_MANIFEST).read_text())
+    assert manifest["status"] == "completed"
+    assert manifest["routes"][1]["error"] == "model returned empty output"
+
+
 def test_cli_pipeline_run_outputs_payload(monkeypatch):
     sample = {"status": "ok", "artifacts_dir": "runs/1"}
     monkeypatch.setattr(cli_impl, "run_pipeline", lambda *args, **kwargs: sample)
@@ -90,7 +186,15 @@ def test_cli_pipeline_run_outputs_payload(monkeypatch):
 def test_cli_pipeline_run_supports_iterations(monkeypatch):
     call_count = {"value": 0}
 
-    def fake_run_pipeline(settings, *, demo=False, artifacts_dir=None, codex_options=None):
+    def fake_run_pipeline(
+        settings,
+        *,
+        demo=False,
+        artifacts_dir=None,
+        codex_options=None,
+        previous_response_id=None,
+        previous_capture=None,
+    ):
         call_count["value"] += 1
         idx = call_count["value"]
         return {"status": f"ok-{idx}", "artifacts_dir": f"runs/{idx}"}
@@ -115,7 +219,15 @@ def test_cli_pipeline_run_supports_iterations(monkeypatch):
 def test_cli_pipeline_run_accepts_codex_model(monkeypatch):
     captured: dict[str, object] = {}
 
-    def fake_run_pipeline(settings, *, demo=False, artifacts_dir=None, codex_options=None):
+    def fake_run_pipeline(
+        settings,
+        *,
+        demo=False,
+        artifacts_dir=None,
+        codex_options=None,
+        previous_response_id=None,
+        previous_capture=None,
+    ):
         captured["codex_options"] = codex_options
         return {"status": "ok", "artifacts_dir": "runs/1"}
 
@@ -137,3 +249,77 @@ def test_cli_pipeline_run_accepts_codex_model(monkeypatch):
     )
     assert result.exit_code == 0
     assert captured["codex_options"].model == "gpt-4.1-mini"
+
+
+@pytest.mark.asyncio
+async def test_trigger_pipeline_polls_router_jobs(tmp_path, monkeypatch):
+    polls: list[dict] = []
+    submitted: list[dict] = []
+
+    class JobClient(FakeAsyncClient):
+        async def post(self, url: str, json=None, params=None):
+            if url.endswith("/jobs"):
+                submitted.append(json)
+                return FakeResponse(httpx.Request("POST", url), {"jobs": [{"job_id": "job-1", "status": "queued"}]})
+            return await super().post(url, json=json)
+
+        async def get(self, url: str, params=None):
+            polls.append({"url": url, "params": params})
+            status = "running" if len(polls) == 1 else "succeeded"
+            job = {"job_id": "job-1", "status": status, "result": {"index": 0, "status": "ok", "result": {"run": 1}}}
+            return FakeResponse(httpx.Request("GET", url), job)
+
+    monkeypatch.setattr(pipeline.httpx, "AsyncClient", JobClient)
+    settings = PipelineSettings(
+        FRONTEND_SCREENSHOTS_URL="http://svc:8101/capture",
+        UI_FEEDBACK_SERVICE_URL="http://svc:8102/feedback",
+        FRONTEND_ENHANCEMENT_ROUTER_URL="http://svc:8103/apply-feedback",
+        PIPELINE_ARTIFACT_ROOT=tmp_path,
+        PIPELINE_MAX_ATTEMPTS=1,
+        PIPELINE_ROUTER_JOBS=True,
+    )
+    result = await pipeline.trigger_pipeline(settings, artifacts_dir=tmp_path)
+    assert [poll["url"] for poll in polls] == ["http://svc:8103/jobs/job-1"] * 2
+    assert polls[0]["params"]["wait"] > 0
+    assert submitted[0]["payload"]["idempotency_key"]
+    assert result["router"] == {
+        "status": "submitted",
+        "job_id": "job-1",
+        "results": [{"index": 0, "status": "ok", "result": {"run": 1}}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_trigger_pipeline_consumes_streamed_router_results(tmp_path, monkeypatch):
+    streamed: list[dict] = []
+
+    class StreamResponse:
+        status_code = 200
+
+        async def aiter_lines(self):
+            yield json.dumps({"type": "result", "result": {"index": 0, "status": "ok", "result": {"run": 1}}})
+            yield ""
+            yield json.dumps({"type": "summary", "status": "submitted", "total": 1, "errors": 0})
+
+    class StreamClient(FakeAsyncClient):
+        @contextlib.asynccontextmanager
+        async def stream(self, method: str, url: str, json=None, params=None):
+            streamed.append({"method": method, "url": url, "json": json, "params": params})
+            yield StreamResponse()
+
+    monkeypatch.setattr(pipeline.httpx, "AsyncClient", StreamClient)
+    settings = PipelineSettings(
+        FRONTEND_SCREENSHOTS_URL="http://svc:8101/capture",
+        UI_FEEDBACK_SERVICE_URL="http://svc:8102/feedback",
+        FRONTEND_ENHANCEMENT_ROUTER_URL="http://svc:8103/apply-feedback",
+        PIPELINE_ARTIFACT_ROOT=tmp_path,
+        PIPELINE_MAX_ATTEMPTS=1,
+        PIPELINE_ROUTER_STREAM=True,
+    )
+    result = await pipeline.trigger_pipeline(settings, artifacts_dir=tmp_path)
+    assert [(call["method"], call["url"], call["params"]) for call in streamed] == [
+        ("POST", "http://svc:8103/apply-feedback", {"stream": "true"})
+    ]
+    assert streamed[0]["json"]["payload"]["feedback"] == "Tighten copy"
+    assert streamed[0]["json"]["payload"]["idempotency_key"].startswith(Path(result["artifacts_dir"]).name)
+    assert result["router"] == {"status": "submitted", "results": [{"index": 0, "status": "ok", "result": {"run": 1}}]}
@@ -7,7 +7,15 @@ from enhancement_core.orchestration import pipeline
 def test_run_pipeline_iterations_repeats_runs(monkeypatch):
     calls: list[dict] = []
 
-    def fake_run_pipeline(settings, *, demo=False, artifacts_dir=None, codex_options=None):
+    def fake_run_pipeline(
+        settings,
+        *,
+        demo=False,
+        artifacts_dir=None,
+        codex_options=None,
+        previous_response_id=None,
+        previous_capture=None,
+    ):
         calls.append({
             "settings": settings,
             "demo": demo,
@@ -32,3 +40,66 @@ def test_run_pipeline_iterations_rejects_invalid_counts():
     settings = PipelineSettings(PIPELINE_ARTIFACT_ROOT="run_logs/pipeline_runs")
     with pytest.raises(ValueError):
         pipeline.run_pipeline_iterations(0, settings)
+
+
+def test_run_pipeline_iterations_chains_feedback_responses(monkeypatch):
+    previous_ids: list[str | None] = []
+
+    def fake_run_pipeline(
+        settings,
+        *,
+        demo=False,
+        artifacts_dir=None,
+        codex_options=None,
+        previous_response_id=None,
+        previous_capture=None,
+    ):
+        previous_ids.append(previous_response_id)
+        index = len(previous_ids)
+        feedback = {
+            "feedback": "Tighten copy",
+            "response_id": f"resp-{index}",
+            "previous_response_id": previous_response_id,
+            "input_tokens": 1000,
+            "cached_tokens": 0 if index == 1 else 800,
+        }
+        return {"artifacts_dir": f"runs/{index}", "feedback": feedback}
+
+    monkeypatch.setattr(pipeline, "run_pipeline", fake_run_pipeline)
+    settings = PipelineSettings(PIPELINE_ARTIFACT_ROOT="run_logs/pipeline_runs", PIPELINE_CHAIN_ITERATIONS=True)
+    results = pipeline.run_pipeline_iterations(3, settings)
+    assert previous_ids == [None, "resp-1", "resp-2"]
+    assert results[0]["token_usage"]["chained"] is False
+    assert results[2]["token_usage"] == {
+        "input_tokens": 1000,
+        "cached_tokens": 800,
+        "uncached_input_tokens": 200,
+        "chained": True,
+    }
+    pipeline.run_pipeline_iterations(2, settings, chain=False)
+    assert previous_ids[3:] == [None, None]
+
+
+def test_run_pipeline_iterations_diffs_against_previous_capture(monkeypatch):
+    captures: list = []
+
+    def fake_run_pipeline(
+        settings,
+        *,
+        demo=False,
+        artifacts_dir=None,
+        codex_options=None,
+        previous_response_id=None,
+        previous_capture=None,
+    ):
+        captures.append(previous_capture)
+        return {"artifacts_dir": f"runs/{len(captures)}", "screenshot_path": f"runs/{len(captures)}/screenshot.png"}
+
+    monkeypatch.setattr(pipeline, "run_pipeline", fake_run_pipeline)
+    settings = PipelineSettings(PIPELINE_ARTIFACT_ROOT="run_logs/pipeline_runs", PIPELINE_DIFF_REGIONS=True)
+    pipeline.run_pipeline_iterations(3, settings)
+    assert [str(item) if item else None for item in captures] == [
+        None,
+        "runs/1/screenshot.png",
+        "runs/2/screenshot.png",
+    ]